@@ -0,0 +1,209 @@
+# analise_emocoes.py - Armazenamento colunar (NumPy) das emoções para o painel emocional
+
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Cada evento é uma linha de um array estruturado; os textos repetidos (emoção, tópico, tipo
+# de interação, sentimento) viram códigos inteiros de um vocabulário por usuário, e o texto
+# livre do prompt fica numa tabela à parte, referenciada pelo índice. As contagens por dia e
+# por semana são mantidas a cada evento, então o painel não precisa percorrer o histórico.
+DTYPE_EVENTO = np.dtype([
+    ("ts", "<i8"),          # Segundos desde 1970 (horário local, como o timestamp gravado)
+    ("emocao", "<u2"),
+    ("topico", "<u2"),
+    ("tipo", "<u2"),
+    ("sentimento", "<u2"),
+    ("prompt", "<u4"),      # Índice na tabela de prompts (ColunasEmocoes._prompts)
+    ("dia_semana", "u1"),   # 0 = segunda-feira
+    ("periodo", "u1"),      # Índice em PERIODOS
+])
+DIAS_SEMANA = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+PERIODOS = ["manhã", "tarde", "noite"]
+NAO_DISPONIVEL = "Não disponível"
+CAPACIDADE_INICIAL = 256
+_EPOCA = datetime(1970, 1, 1)
+
+
+def _periodo(hora):
+    return 0 if 5 <= hora < 12 else 1 if 12 <= hora < 18 else 2
+
+
+def normalizar_evento(timestamp, dados):
+    """
+    (datetime, emoção, tópico, tipo, sentimento, prompt) de um registro salvo, nos dois
+    formatos já usados: dicionário ou só a emoção em texto. Retorna None se o timestamp não for ISO.
+    """
+    try:
+        momento = datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return None
+    if momento.tzinfo is not None:
+        momento = momento.replace(tzinfo=None)
+    if isinstance(dados, dict):
+        emocao = str(dados.get("emocao", "desconhecida")).lower()
+        if emocao == "desconhecida":
+            for chave in ("sentimento_mensagem_usuario", "sentimento"):
+                if isinstance(dados.get(chave), str):
+                    emocao = dados[chave].lower()
+                    break
+        sentimento = dados.get("sentimento_mensagem_usuario", dados.get("sentimento", NAO_DISPONIVEL))
+        return (momento, emocao, str(dados.get("topico_interacao", NAO_DISPONIVEL)),
+                str(dados.get("tipo_interacao", NAO_DISPONIVEL)), str(sentimento),
+                str(dados.get("prompt_original", NAO_DISPONIVEL)))
+    return momento, str(dados).lower(), NAO_DISPONIVEL, NAO_DISPONIVEL, NAO_DISPONIVEL, NAO_DISPONIVEL
+
+
+class _Vocabulario:
+    def __init__(self):
+        self.termos = []
+        self._codigos = {}
+
+    def codigo(self, termo):
+        if termo not in self._codigos:
+            self._codigos[termo] = len(self.termos)
+            self.termos.append(termo)
+        return self._codigos[termo]
+
+    def decodificar(self, codigos):
+        return np.asarray(self.termos, dtype=object)[codigos] if len(codigos) else np.array([], dtype=object)
+
+
+class ColunasEmocoes:
+    """
+    Emoções de um usuário em colunas, carregadas por mês sob demanda através de
+    `carregar_particao(mes) -> {timestamp: registro}` (só os meses que `listar_meses()`
+    retorna). Meses já carregados ficam em memória e recebem os eventos novos por
+    `adicionar`, sem reler nada. `carregar_particao` retorna None para um mês sem
+    arquivo e levanta exceção se a leitura falhar: o mês fica sem carregar e a
+    exceção chega a quem leu, para que a próxima leitura tente de novo.
+    """
+
+    def __init__(self, carregar_particao, listar_meses):
+        self._carregar_particao = carregar_particao
+        self._listar_meses = listar_meses
+        self._lock = threading.Lock()
+        self.emocoes, self.topicos, self.tipos = _Vocabulario(), _Vocabulario(), _Vocabulario()
+        self.sentimentos = _Vocabulario()
+        self._prompts = []  # Textos livres: um por evento, sem vocabulário
+        self._meses = {}  # "AAAA-MM" -> {"eventos": array com folga, "n": int}
+        self._diario = {}  # ordinal do dia -> contagens por código de emoção
+        self._semanal = {}  # ordinal da segunda-feira da semana -> contagens por código de emoção
+
+    # --- Escrita ---
+
+    def _acrescentar(self, mes, linhas):
+        bloco = self._meses[mes]
+        necessario = bloco["n"] + len(linhas)
+        if necessario > len(bloco["eventos"]):
+            maior = np.zeros(max(necessario, 2 * len(bloco["eventos"])), dtype=DTYPE_EVENTO)
+            maior[:bloco["n"]] = bloco["eventos"][:bloco["n"]]
+            bloco["eventos"] = maior
+        bloco["eventos"][bloco["n"]:necessario] = linhas
+        bloco["n"] = necessario
+        for linha in linhas:
+            dia = _EPOCA.toordinal() + int(linha["ts"]) // 86400
+            for agregado, chave in ((self._diario, dia), (self._semanal, dia - int(linha["dia_semana"]))):
+                contagens = agregado.get(chave)
+                if contagens is None or len(contagens) <= linha["emocao"]:
+                    contagens = np.pad(contagens if contagens is not None else np.zeros(0, dtype=np.int64),
+                                       (0, len(self.emocoes.termos) - (0 if contagens is None else len(contagens))))
+                    agregado[chave] = contagens
+                contagens[linha["emocao"]] += 1
+
+    def _linha(self, timestamp, dados):
+        evento = normalizar_evento(timestamp, dados)
+        if evento is None:
+            return None
+        momento, emocao, topico, tipo, sentimento, prompt = evento
+        self._prompts.append(prompt)
+        return (int((momento - _EPOCA).total_seconds()), self.emocoes.codigo(emocao), self.topicos.codigo(topico),
+                self.tipos.codigo(tipo), self.sentimentos.codigo(sentimento), len(self._prompts) - 1,
+                momento.weekday(), _periodo(momento.hour))
+
+    def _carregar_mes(self, mes):
+        # Lido antes de criar o bloco: se a leitura falhar, o mês não entra em self._meses
+        # (um bloco vazio receberia os eventos novos e ficaria truncado para sempre).
+        registros = self._carregar_particao(mes) or {}
+        linhas = [linha for linha in (self._linha(ts, dados) for ts, dados in registros.items()) if linha]
+        self._meses[mes] = {"eventos": np.zeros(max(len(linhas), CAPACIDADE_INICIAL), dtype=DTYPE_EVENTO), "n": 0}
+        if linhas:
+            self._acrescentar(mes, np.array(linhas, dtype=DTYPE_EVENTO))
+
+    def adicionar(self, timestamp, dados):
+        """Registra um evento novo. Meses ainda não carregados o recebem ao serem lidos."""
+        mes = str(timestamp)[:7]
+        with self._lock:
+            if mes not in self._meses:
+                return
+            linha = self._linha(timestamp, dados)
+            if linha:
+                self._acrescentar(mes, np.array([linha], dtype=DTYPE_EVENTO))
+
+    # --- Leitura ---
+
+    def _garantir(self, meses):
+        """Carrega os meses pedidos que existem; retorna os que estão em memória."""
+        existentes = set(self._listar_meses())
+        with self._lock:
+            for mes in meses:
+                if mes not in self._meses and mes in existentes:
+                    self._carregar_mes(mes)
+            return [mes for mes in meses if mes in self._meses]
+
+    def eventos(self, meses):
+        """Array estruturado (DTYPE_EVENTO) dos eventos dos meses, em ordem de tempo."""
+        meses = self._garantir(meses)
+        with self._lock:
+            partes = [self._meses[m]["eventos"][:self._meses[m]["n"]] for m in meses]
+        eventos = np.concatenate(partes) if partes else np.zeros(0, dtype=DTYPE_EVENTO)
+        return eventos[np.argsort(eventos["ts"], kind="stable")]
+
+    def dataframe(self, meses):
+        """DataFrame dos eventos dos meses (uma linha por emoção), montado coluna a coluna."""
+        eventos = self.eventos(meses)
+        with self._lock:
+            return pd.DataFrame({
+                "timestamp": pd.to_datetime(eventos["ts"], unit="s"),
+                "emocao": self.emocoes.decodificar(eventos["emocao"]),
+                "topico_interacao": self.topicos.decodificar(eventos["topico"]),
+                "tipo_interacao": self.tipos.decodificar(eventos["tipo"]),
+                "sentimento_mensagem_usuario": self.sentimentos.decodificar(eventos["sentimento"]),
+                "dia_da_semana": np.asarray(DIAS_SEMANA, dtype=object)[eventos["dia_semana"]],
+                "periodo_do_dia": np.asarray(PERIODOS, dtype=object)[eventos["periodo"]],
+                "prompt_original": np.asarray(self._prompts, dtype=object)[eventos["prompt"]]
+                if len(eventos) else np.array([], dtype=object),
+            })
+
+    def _agregado(self, agregado, inicio, fim):
+        dias = sorted(d for d in agregado if inicio <= d <= fim)
+        matriz = np.zeros((len(dias), len(self.emocoes.termos)), dtype=np.int64)
+        for i, dia in enumerate(dias):
+            matriz[i, :len(agregado[dia])] = agregado[dia]
+        return pd.DataFrame(matriz, index=pd.to_datetime([datetime.fromordinal(d) for d in dias]),
+                            columns=list(self.emocoes.termos))
+
+    def contagens_diarias(self, inicio, fim):
+        """Contagens por dia (linhas) e emoção (colunas) entre as datas `inicio` e `fim`."""
+        self._garantir(_meses_entre(inicio, fim))
+        with self._lock:
+            return self._agregado(self._diario, inicio.toordinal(), fim.toordinal())
+
+    def contagens_semanais(self, inicio, fim):
+        """Contagens por semana (indexadas pela segunda-feira) e emoção entre `inicio` e `fim`."""
+        self._garantir(_meses_entre(inicio, fim))
+        with self._lock:
+            return self._agregado(self._semanal, inicio.toordinal() - inicio.weekday(), fim.toordinal())
+
+    def contagens(self, inicio, fim):
+        """Total de cada emoção entre `inicio` e `fim`, a partir das contagens diárias."""
+        return self.contagens_diarias(inicio, fim).sum(axis=0).sort_values(ascending=False)
+
+
+def _meses_entre(inicio, fim):
+    meses, atual = [], inicio.replace(day=1)
+    while atual <= fim:
+        meses.append(atual.strftime("%Y-%m"))
+        atual = (atual + timedelta(days=32)).replace(day=1)
+    return meses
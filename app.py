@@ -3,12 +3,9 @@
 # ==============================================================================
 import logging
 import streamlit as st
-import copy
 from openai import OpenAI
 import json
-from difflib import SequenceMatcher
-import fitz  # PyMuPDF
-import docx
+import hashlib
 from dotenv import load_dotenv
 import os
 import datetime
@@ -23,18 +20,27 @@ from utils import carregar_preferencias, salvar_preferencias
 from utils import carregar_preferencias, salvar_preferencias, analisar_imagem_com_rekognition
 import joblib
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from sentence_transformers import SentenceTransformer
 import requests
 import io
 from fpdf.enums import XPos, YPos
 from openai import RateLimitError
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from supabase import create_client, Client
 from pathlib import Path
 from utils import encrypt_file_content_general, decrypt_file_content_general
-from utils import carregar_dados_do_github, salvar_dados_no_github, decrypt_file_content_general, encrypt_file_content_general
-from utils import salvar_emocoes, carregar_emocoes
+from utils import carregar_dados_do_github, salvar_dados_no_github, decrypt_file_content_general, encrypt_file_content_general, serializar_json
+from utils import obter_armazenamento_dados
+from utils import obter_estado_emocional, registrar_emocao
+from detector_idioma import detectar_idioma
+from cache_respostas import CacheRespostasSemantico
+from base_conhecimento import BaseConhecimento
+from indice_lexical import IndiceLexical, CAMINHO_MEMORIA
+from armazenamento import carregar_json_local, salvar_json_local
+from indice_documentos import IndiceDocumento, LIMITE_CONTEXTO_INTEGRAL, LIMITE_CODIGO_INTEGRAL, texto_do_arquivo
+from extracao_documentos import extrair_texto, extrair_textos
+from fila_persistencia import FilaPersistencia
 from datetime import datetime
 
 
@@ -63,25 +69,12 @@ if st.session_state.get("username") != ADMIN_USERNAME:
 else:
     st.session_state["show_feedback_form"] = True
 
-emocoes_dict = {}  # Inicializa como dicionário vazio para evitar erros caso não carregue
 ultima_emocao = None
 if st.session_state.username:
-    emocoes_dict_carregadas = carregar_emocoes(st.session_state.username)
-    if emocoes_dict_carregadas:
-        emocoes_dict = emocoes_dict_carregadas
-        try:
-            latest_timestamp = max(emocoes_dict.keys(),
-                                   key=lambda k: datetime.fromisoformat(k))
-            latest_entry = emocoes_dict[latest_timestamp]
-            # --- INÍCIO DA MODIFICAÇÃO NECESSÁRIA ---
-            if isinstance(latest_entry, dict):
-                ultima_emocao = latest_entry.get("emocao", "neutro").lower()
-            else:  # Formato antigo (apenas string)
-                ultima_emocao = str(latest_entry).lower()
-            # --- FIM DA MODIFICAÇÃO NECESSÁRIA ---
-        except Exception as e:
-            print(f"Erro ao obter a última emoção carregada: {e}")
-            ultima_emocao = None
+    # Resumo mantido em memória a cada emoção registrada (não percorre o histórico)
+    estado_emocional = obter_estado_emocional(st.session_state.username)
+    if estado_emocional:
+        ultima_emocao = estado_emocional["ultima_emocao"]
 # ==============================================================================
 # === 3. CONEXÃO INTELIGENTE DE API (LOCAL E NUVEM)
 # ==============================================================================
@@ -112,16 +105,18 @@ if not api_key:
 modelo = OpenAI(api_key=api_key)
 
 
-def chamar_openai_com_retries(modelo_openai, mensagens, modelo="gpt-5-nano", max_tentativas=3, pausa_segundos=5):
+def chamar_openai_com_retries(modelo_openai, mensagens, modelo="gpt-5-nano", max_tentativas=3, pausa_segundos=5, stream=False):
     """
     Faz a chamada à API da OpenAI com tentativas automáticas em caso de RateLimitError.
+    Com `stream=True`, retorna o iterador de chunks da API (as tentativas cobrem apenas a abertura do stream).
     """
     for tentativa in range(1, max_tentativas + 1):
         try:
             st.info(f"⏳ Um instante... (consulta {tentativa}) em andamento")
             resposta = modelo_openai.chat.completions.create(
                 model=modelo,
-                messages=mensagens
+                messages=mensagens,
+                stream=stream
             )
             return resposta  # sucesso!
         except RateLimitError:
@@ -135,6 +130,31 @@ def chamar_openai_com_retries(modelo_openai, mensagens, modelo="gpt-5-nano", max
     st.error("❌ Tentativas esgotadas. Aguardando você tentar novamente mais tarde.")
     return None
 
+
+AVISO_STREAM_INTERROMPIDO = "\n\n⚠️ *A resposta foi interrompida por um erro e pode estar incompleta. Tente novamente.*"
+
+
+def gerar_tokens_do_stream(resposta_stream, metricas, inicio, estado_stream):
+    """
+    Itera sobre o stream da OpenAI devolvendo apenas os trechos de texto (para st.write_stream).
+    Registra em `metricas["tempo_primeiro_token"]` quanto tempo (s) se passou desde `inicio`
+    até o primeiro token chegar. Se o stream falhar no meio, guarda o erro em
+    `estado_stream["erro"]` e termina com um aviso, sem perder o texto já exibido.
+    """
+    try:
+        for chunk in resposta_stream:
+            if not chunk.choices:
+                continue
+            trecho = chunk.choices[0].delta.content
+            if trecho:
+                if "tempo_primeiro_token" not in metricas:
+                    metricas["tempo_primeiro_token"] = round(time.perf_counter() - inicio, 3)
+                yield trecho
+    except Exception as e:
+        logging.error(f"Stream da OpenAI interrompido: {e}")
+        estado_stream["erro"] = e
+        yield AVISO_STREAM_INTERROMPIDO
+
 # ==============================================================================
 # === 4. CONFIGURAÇÃO DE LOGS
 # ==============================================================================
@@ -167,25 +187,42 @@ def carregar_modelo_embedding():
         return None
 
 
-def inicializar_memoria_dinamica():
-    """Carrega os vetores e a base de conhecimento no estado da sessão, se ainda não estiverem lá."""
-    if 'vetores_perguntas' not in st.session_state:
-        print("Inicializando memória dinâmica na sessão...")
-        try:
-            st.session_state.vetores_perguntas = np.load(
-                'vetores_perguntas_v2.npy')
-            st.session_state.base_de_conhecimento = joblib.load(
-                'dados_conhecimento_v2.joblib')
-            print("Memória dinâmica carregada com sucesso.")
-        except Exception as e:
-            print(f"Erro ao carregar arquivos de memória (.npy, .joblib): {e}")
-            st.session_state.vetores_perguntas = None
-            st.session_state.base_de_conhecimento = None
+@st.cache_resource
+def carregar_base_conhecimento():
+    """
+    Carrega a base de conhecimento local uma única vez por processo.
+    Todas as sessões compartilham a mesma instância (somente leitura); curadorias
+    publicam uma nova versão que passa a valer imediatamente para todos.
+    """
+    print("Carregando base de conhecimento compartilhada...")
+    return BaseConhecimento()
+
+
+@st.cache_resource
+def carregar_cache_respostas():
+    """Cria o cache semântico de respostas, único e compartilhado por todas as sessões."""
+    return CacheRespostasSemantico()
+
+
+@st.cache_resource
+def carregar_indice_lexical():
+    """Índice de trigramas das perguntas de memoria_jarvis.json, compartilhado por todas as sessões."""
+    return IndiceLexical()
+
+
+@st.cache_resource
+def carregar_fila_persistencia():
+    """Fila única de gravações adiadas no armazenamento de dados (os chats não bloqueiam a interface)."""
+    armazenamento = obter_armazenamento_dados()
+    return FilaPersistencia(armazenamento.put, armazenamento.delete, armazenamento.aplicar_lote)
 
 
 # --- CARREGAR O MODELO E INICIALIZAR A MEMÓRIA ---
 modelo_embedding = carregar_modelo_embedding()
-inicializar_memoria_dinamica()  # Garante que a memória está pronta na sessão
+cache_respostas = carregar_cache_respostas()
+base_conhecimento = carregar_base_conhecimento()  # Compartilhada entre todas as sessões
+indice_lexical = carregar_indice_lexical()  # Reconstruído quando memoria_jarvis.json muda
+fila_persistencia = carregar_fila_persistencia()
 
 # Exibe a mensagem de status no painel lateral
 if modelo_embedding:
@@ -198,15 +235,23 @@ else:
 # <--- FUNÇÃO OTIMIZADA: Substitui detectar_emocao, detectar_tom_usuario e classificar_categoria
 
 
+# Palavras que, sozinhas, já indicam a necessidade de busca na web (sem chamar a IA).
+PALAVRAS_CHAVE_BUSCA_WEB = ["link", "vídeo", "site", "inscrição", "cadastro", "url"]
+
+
 def analisar_metadados_prompt(prompt_usuario):
     """
     Analisa o prompt do usuário com uma única chamada à IA para extrair múltiplos metadados.
-    Retorna um dicionário com emoção, sentimento, categoria e tipo de interação.
+    Retorna um dicionário com emoção, sentimento, categoria, tipo de interação,
+    idioma (ISO 639-1) e se a pergunta precisa de busca na web.
+    Em caso de erro, "idioma" e "precisa_busca_web" ficam ausentes para que as
+    funções dedicadas sejam usadas como plano B.
     """
     if not prompt_usuario or not prompt_usuario.strip():
         return {
             "emocao": "neutro", "sentimento_usuario": "n/a",
-            "categoria": "geral", "tipo_interacao": "conversa_geral"
+            "categoria": "geral", "tipo_interacao": "conversa_geral",
+            "idioma": "pt", "precisa_busca_web": False
         }
 
     prompt_analise = f"""
@@ -215,6 +260,10 @@ def analisar_metadados_prompt(prompt_usuario):
     2. "sentimento_usuario": O tom ou estado de espírito em poucas palavras (ex: 'apressado', 'curioso', 'frustrado').
     3. "categoria": Uma categoria simples para o tópico (ex: 'geografia', 'programação', 'sentimentos').
     4. "tipo_interacao": Classifique como 'pergunta', 'comando', 'desabafo_apoio' ou 'conversa_geral'.
+    5. "idioma": O código de idioma ISO 639-1 de duas letras do texto (ex: 'pt', 'en', 'es').
+    6. "precisa_busca_web": true se a pergunta requer informações em tempo real ou muito recentes
+       (ex: cotações, resultados de jogos, notícias, clima); false se for geral, criativa,
+       sobre a memória interna ou não depender do tempo (ex: "Quem descobriu o Brasil?", "Crie uma lista de compras").
 
     Texto do usuário: "{prompt_usuario}"
 
@@ -228,7 +277,7 @@ def analisar_metadados_prompt(prompt_usuario):
             messages=[{"role": "user", "content": prompt_analise}],            
             response_format={"type": "json_object"}
         )
-        return json.loads(resposta_modelo.choices[0].message.content)
+        metadados = json.loads(resposta_modelo.choices[0].message.content)
     except Exception as e:
         print(f"Erro ao analisar metadados do prompt: {e}")
         # Retorna um dicionário padrão em caso de erro
@@ -237,6 +286,25 @@ def analisar_metadados_prompt(prompt_usuario):
             "categoria": "geral", "tipo_interacao": "conversa_geral"
         }
 
+    # Valida os campos de roteamento; se vierem malformados, ficam ausentes (plano B).
+    idioma = str(metadados.get("idioma", "")).strip().lower()
+    if len(idioma) == 2 and idioma.isalpha():
+        metadados["idioma"] = idioma
+    else:
+        metadados.pop("idioma", None)
+
+    busca_web = metadados.get("precisa_busca_web")
+    if isinstance(busca_web, str):
+        busca_web = busca_web.strip().lower() in ("true", "sim", "yes", "1")
+    if any(p in prompt_usuario.lower() for p in PALAVRAS_CHAVE_BUSCA_WEB):
+        busca_web = True
+    if isinstance(busca_web, bool):
+        metadados["precisa_busca_web"] = busca_web
+    else:
+        metadados.pop("precisa_busca_web", None)
+
+    return metadados
+
 
 def limpar_pdf_da_memoria():
     """Remove os dados do PDF do st.session_state para o botão de download desaparecer."""
@@ -356,41 +424,55 @@ def write_with_mixed_styles(text, pdf, font_family):
 
 def extrair_texto_documento(uploaded_file):
     """Extrai o texto de arquivos PDF, DOCX, TXT, Excel, e várias linguagens de programação e scripts de banco de dados."""
-    nome_arquivo = uploaded_file.name
+    return extrair_texto(uploaded_file.name, uploaded_file.getvalue())
 
-    if nome_arquivo.endswith(('.xlsx', '.xls')):
-        try:
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-            return df.to_csv(index=False)
-        except Exception as e:
-            return f"Erro ao ler o arquivo Excel: {e}"
-    elif nome_arquivo.endswith(".pdf"):
-        texto = ""
-        with fitz.open(stream=uploaded_file.read(), filetype="pdf") as doc:
-            for page in doc:
-                texto += page.get_text()
-        return texto
-    elif nome_arquivo.endswith(".docx"):
-        doc = docx.Document(uploaded_file)
-        return "\n".join([p.text for p in doc.paragraphs])
-    elif nome_arquivo.endswith(".txt"):
-        return uploaded_file.read().decode("utf-8")
-    # --- Modificação ABRANGENTE para arquivos de programação e script ---
-    elif nome_arquivo.endswith((
-        '.py', '.js', '.ts', '.html', '.htm', '.css', '.php', '.java', '.kt',
-        '.c', '.cpp', '.h', '.cs', '.rb', '.go', '.swift', '.sql', '.json',
-        '.xml', '.yaml', '.yml', '.md', '.sh', '.bat', '.ps1', '.R', '.pl', '.lua'
-    )):
-        try:
-            # Tenta UTF-8 primeiro, que é o mais comum para código
-            return uploaded_file.read().decode("utf-8")
-        except UnicodeDecodeError:
-            # Se UTF-8 falhar, tenta Latin-1 (ou outra codificação comum no seu contexto)
-            return uploaded_file.read().decode("latin-1")
-        except Exception as e:
-            return f"Erro ao ler o arquivo de código/script: {e}"
-    # --- FIM da modificação ---
-    return "Formato de arquivo não suportado."
+
+def obter_indice_documento(chat_id, contexto_arquivo):
+    """
+    Índice de trechos dos arquivos do chat, guardado na sessão e refeito só
+    quando o conteúdo dos arquivos muda (ex: chat recarregado do armazenamento).
+    """
+    indices = st.session_state.setdefault("_indices_documentos", {})
+    hash_contexto = hashlib.sha256(contexto_arquivo.encode("utf-8")).hexdigest()
+    if chat_id not in indices or indices[chat_id][0] != hash_contexto:
+        indices[chat_id] = (hash_contexto, IndiceDocumento(contexto_arquivo, modelo_embedding))
+    return indices[chat_id][1]
+
+
+def contexto_documento_para_pergunta(chat_id, contexto_arquivo, pergunta):
+    """
+    Texto dos arquivos a enviar à IA junto com a pergunta e se ele está completo.
+    Documentos pequenos (ou sem o modelo de embedding) vão inteiros; os grandes
+    só com os trechos mais relevantes para a pergunta.
+    """
+    if len(contexto_arquivo) <= LIMITE_CONTEXTO_INTEGRAL or not modelo_embedding:
+        return contexto_arquivo, True
+    try:
+        return obter_indice_documento(chat_id, contexto_arquivo).montar_contexto(pergunta), False
+    except Exception as e:
+        logging.error(f"Erro ao buscar trechos do documento: {e}")
+        return contexto_arquivo[:LIMITE_CONTEXTO_INTEGRAL], False
+
+
+def codigo_para_comando(chat_id, contexto_arquivo, nome_arquivo, pergunta):
+    """
+    Código-fonte de `nome_arquivo` para /explicar, /refatorar e /depurar e se ele está completo.
+    Vai inteiro enquanto couber em LIMITE_CODIGO_INTEGRAL; acima disso (ou sem o nome entre os
+    arquivos), só os trechos mais relevantes, e sempre só desse arquivo.
+    """
+    codigo = texto_do_arquivo(contexto_arquivo, nome_arquivo)
+    if codigo is None:
+        codigo = contexto_arquivo  # Chat antigo, sem os marcadores de arquivo
+    if len(codigo) <= LIMITE_CODIGO_INTEGRAL:
+        return codigo, True
+    if not modelo_embedding:
+        return codigo[:LIMITE_CODIGO_INTEGRAL], False
+    try:
+        indice = obter_indice_documento(chat_id, contexto_arquivo)
+        return indice.montar_contexto(pergunta, nome_arquivo=nome_arquivo), False
+    except Exception as e:
+        logging.error(f"Erro ao buscar trechos do arquivo '{nome_arquivo}': {e}")
+        return codigo[:LIMITE_CODIGO_INTEGRAL], False
 
 
 def gerar_imagem_com_dalle(prompt_para_imagem):
@@ -431,15 +513,20 @@ def gerar_imagem_com_dalle(prompt_para_imagem):
 # <--- REMOVIDAS: As funções `classificar_categoria`, `detectar_tom_emocional`, e `detectar_tom_usuario` foram substituídas pela nova `analisar_metadados_prompt`.
 
 
-def detectar_idioma_com_ia(texto_usuario):
-    """Usa a própria OpenAI para detectar o idioma, um método mais preciso."""
+def detectar_idioma_com_ia(texto_usuario, modelo_selecionado=None):
+    """
+    Usa a própria OpenAI para detectar o idioma, um método mais preciso.
+    `modelo_selecionado` pode ser informado para chamadas feitas fora da thread
+    do Streamlit (ex: na etapa de análises preliminares), onde não há session_state.
+    """
     if not texto_usuario.strip():
         return 'pt'  # Retorna português como padrão se o texto for vazio
 
     try:
         prompt = f"Qual o código de idioma ISO 639-1 (ex: 'en', 'pt', 'es') do seguinte texto? Responda APENAS com o código de duas letras.\n\nTexto: \"{texto_usuario}\""
 
-        modelo_selecionado = st.session_state.get('admin_model_choice', 'gpt-5-nano')
+        if modelo_selecionado is None:
+            modelo_selecionado = st.session_state.get('admin_model_choice', 'gpt-5-nano')
         resposta_modelo = modelo.chat.completions.create(
             model=modelo_selecionado,
             messages=[{"role": "user", "content": prompt}],
@@ -508,22 +595,17 @@ def preparar_texto_para_fala(texto):
 
 
 def carregar_memoria():
-    try:
-        with open("memoria_jarvis.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    return carregar_json_local(CAMINHO_MEMORIA, {})
 
 
 def salvar_memoria(memoria):
-    with open("memoria_jarvis.json", "w", encoding="utf-8") as f:
-        json.dump(memoria, f, ensure_ascii=False, indent=4)
+    salvar_json_local(CAMINHO_MEMORIA, memoria, "Atualiza memória do Jarvis")
 
 
 def adicionar_a_memoria(pergunta, resposta, modelo_emb):
     """
-    Adiciona um novo par de pergunta e resposta à memória dinâmica (vetores em sessão)
-    e à memória persistente (arquivo JSON).
+    Adiciona um novo par de pergunta e resposta à base de conhecimento compartilhada
+    (uma nova versão, visível para todas as sessões) e à memória persistente (JSON).
     """
     if not modelo_emb:
         st.error(
@@ -531,28 +613,15 @@ def adicionar_a_memoria(pergunta, resposta, modelo_emb):
         return
 
     try:
-        # --- ETAPA 1: ATUALIZAR A MEMÓRIA EM TEMPO DE EXECUÇÃO (SESSION_STATE) ---
-        st.info("Atualizando a memória dinâmica da sessão...")
+        # --- ETAPA 1: ATUALIZAR A BASE DE CONHECIMENTO COMPARTILHADA ---
+        st.info("Atualizando a memória dinâmica compartilhada...")
 
         novo_vetor = modelo_emb.encode([pergunta])
+        nova_versao = base_conhecimento.adicionar(pergunta, resposta, novo_vetor)
 
-        if 'vetores_perguntas' in st.session_state and st.session_state.vetores_perguntas is not None:
-            st.session_state.vetores_perguntas = np.vstack(
-                [st.session_state.vetores_perguntas, novo_vetor])
-        else:
-            st.session_state.vetores_perguntas = novo_vetor
-
-        nova_resposta_formatada = {'texto': resposta, 'tom': 'neutro'}
-        if 'base_de_conhecimento' in st.session_state and st.session_state.base_de_conhecimento is not None:
-            st.session_state.base_de_conhecimento['respostas'].append(
-                [nova_resposta_formatada])
-        else:
-            st.session_state.base_de_conhecimento = {
-                'respostas': [[nova_resposta_formatada]]}
-
-        st.toast("✅ Memória dinâmica atualizada para esta sessão!", icon="🧠")
+        st.toast("✅ Memória dinâmica atualizada para todas as sessões!", icon="🧠")
         print(
-            f"Novo tamanho da matriz de vetores na sessão: {st.session_state.vetores_perguntas.shape}")
+            f"Base de conhecimento v{nova_versao.versao}: matriz de vetores {nova_versao.vetores.shape}")
 
         # --- ETAPA 2: PERSISTIR A MEMÓRIA NO ARQUIVO JSON ---
         memoria_persistente = carregar_memoria()
@@ -622,65 +691,164 @@ def processar_comando_lembrese(texto_do_comando):
         st.error(f"Ocorreu um erro ao tentar memorizar a preferência: {e}")
 
 
+# Layout dos chats no armazenamento de dados (GitHub por padrão): um índice pequeno +
+# um arquivo criptografado por chat, assim salvar regrava só os chats alterados.
+def _pasta_chats(username):
+    return f"dados/chats_{username}"
+
+
+def _caminho_indice_chats(username):
+    return f"{_pasta_chats(username)}/indice.json"
+
+
+def _caminho_chat(username, nome_arquivo):
+    return f"{_pasta_chats(username)}/{nome_arquivo}"
+
+
+def _nome_arquivo_chat(chat_id):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(chat_id)) + ".json"
+
+
+def _ler_json_criptografado(caminho):
+    """Lê (da fila de gravação ou do armazenamento) e descriptografa um JSON; None se não existir."""
+    # Uma gravação ainda na fila é mais recente que a do armazenamento.
+    conteudo = fila_persistencia.conteudo_pendente(
+        caminho) or obter_armazenamento_dados().get(caminho)
+    if not conteudo:
+        return None
+    try:
+        return json.loads(decrypt_file_content_general(conteudo))
+    except Exception as e:
+        print(
+            f"AVISO: Falha ao descriptografar '{caminho}'. Tentando como JSON bruto. Erro: {e}")
+        try:
+            return json.loads(conteudo)
+        except json.JSONDecodeError:
+            print(f"ERRO FATAL: Conteúdo de '{caminho}' não é um JSON válido.")
+            return None
+
+
+def _serializar_chat(chat_data):
+    """JSON de um chat sem os objetos não-serializáveis (dataframe e gráficos), sem copiar o chat."""
+    chat = {chave: valor for chave, valor in chat_data.items()
+            if chave != "dataframe"}
+    chat.setdefault("title", "Chat sem título")
+    if "messages" in chat:
+        chat["messages"] = [
+            msg for msg in chat["messages"] if msg.get("type") != "plot"]
+    return serializar_json(chat)
+
+
+def _caminho_chats_legado(username):
+    return f"dados/chats_historico_{username}.json"
+
+
 def carregar_chats(username):
-    """Carrega os chats de um arquivo JSON no GitHub, descriptografando o conteúdo."""
+    """
+    Carrega os chats do usuário do armazenamento de dados: lê o índice e depois os arquivos
+    de cada chat em paralelo. Se ainda não houver índice, usa o arquivo único
+    antigo (dados/chats_historico_{username}.json), migrado no próximo salvamento
+    e excluído logo depois do índice.
+    Guarda em st.session_state os hashes dos chats lidos, usados por `salvar_chats`.
+    """
     if not username:
         return {}
 
-    filename = f"dados/chats_historico_{username}.json"
-    encrypted_file_content = carregar_dados_do_github(filename)
-
-    if encrypted_file_content:
-        try:
-            decrypted_file_content = decrypt_file_content_general(
-                encrypted_file_content)
-            return json.loads(decrypted_file_content)
-        except Exception as e:
+    indice = _ler_json_criptografado(_caminho_indice_chats(username))
+    if indice is None:
+        chats_legado = _ler_json_criptografado(_caminho_chats_legado(username))
+        st.session_state["_hashes_chats_salvos"] = None  # Força gravar todos os chats e o índice
+        st.session_state["_chats_nao_carregados"] = {}
+        st.session_state["_excluir_chats_legado"] = chats_legado is not None
+        return chats_legado or {}
+
+    entradas = indice.get("chats", [])
+    caminhos = [_caminho_chat(username, e["arquivo"]) for e in entradas]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        conteudos = list(executor.map(_ler_json_criptografado, caminhos))
+
+    chats, hashes, nao_carregados = {}, {}, {}
+    for entrada, chat_data in zip(entradas, conteudos):
+        if chat_data is None:
+            # Leitura recusada (cota) ou com erro não é exclusão: a entrada continua no índice.
             print(
-                f"AVISO: Falha ao descriptografar chats de '{username}' do GitHub. Tentando como JSON bruto. Erro: {e}")
-            try:
-                return json.loads(encrypted_file_content)
-            except json.JSONDecodeError:
-                print(
-                    f"ERRO FATAL: Conteúdo do chat de '{username}' do GitHub não é um JSON válido.")
-                return {}
-    return {}
+                f"AVISO: Arquivo do chat '{entrada['id']}' de '{username}' não pôde ser lido. Mantido no índice.")
+            nao_carregados[entrada["id"]] = entrada
+            continue
+        chats[entrada["id"]] = chat_data
+        hashes[entrada["id"]] = entrada.get("hash")
+    if nao_carregados:
+        st.warning(
+            f"{len(nao_carregados)} conversa(s) não puderam ser carregadas agora. Elas não foram apagadas; recarregue a página mais tarde.")
+    st.session_state["_hashes_chats_salvos"] = hashes
+    st.session_state["_chats_nao_carregados"] = nao_carregados
+    return chats
 
 
 def salvar_chats(username):
     """
-    Salva os chats do usuário no GitHub, ignorando objetos não-serializáveis
-    e criptografando o conteúdo.
+    Salva os chats do usuário no armazenamento de dados, criptografados, um arquivo por chat.
+    Só os chats cujo conteúdo mudou desde o último salvamento são criptografados
+    e enviados para a fila de gravação; o índice só é regravado se algo mudou.
     """
     if not username or "chats" not in st.session_state:
         return
 
-    chats_para_salvar = copy.deepcopy(st.session_state.chats)
-
-    for chat_id, chat_data in chats_para_salvar.items():
-        if "title" not in chat_data:
-            chat_data["title"] = "Chat sem título"
-
-    for chat_id, chat_data in chats_para_salvar.items():
-        if "dataframe" in chat_data:
-            del chat_data["dataframe"]
-        if "messages" in chat_data:
-            mensagens_serializaveis = [
-                msg for msg in chat_data["messages"] if msg.get("type") != "plot"]
-            chat_data["messages"] = mensagens_serializaveis
-
-    data_json_string = json.dumps(
-        chats_para_salvar, ensure_ascii=False, indent=4)
-    encrypted_data_string = encrypt_file_content_general(data_json_string)
-
-    filename = f"dados/chats_historico_{username}.json"
-    mensagem_commit = f"Atualiza chat do usuario {username}"
-    try:
-        salvar_dados_no_github(
-            filename, encrypted_data_string, mensagem_commit)
-        print(f"Chats de '{username}' salvos no GitHub.")
-    except Exception as e:
-        print(f"Erro ao salvar chats no GitHub: {e}")
+    hashes_salvos = st.session_state.get("_hashes_chats_salvos")
+    regravar_tudo = hashes_salvos is None
+    hashes_salvos = hashes_salvos or {}
+    nao_carregados = st.session_state.get("_chats_nao_carregados") or {}
+    if regravar_tudo:
+        # O índice não foi lido ao carregar (ausente ou leitura falhou): preserva as entradas
+        # que ele tiver agora, para não sobrescrevê-lo só com os chats desta sessão.
+        indice_existente = _ler_json_criptografado(_caminho_indice_chats(username)) or {}
+        for entrada in indice_existente.get("chats", []):
+            if entrada.get("id") not in st.session_state.chats:
+                nao_carregados.setdefault(entrada["id"], entrada)
+        st.session_state["_chats_nao_carregados"] = nao_carregados
+
+    indice, hashes_atuais, alterados = [], {}, 0
+    for chat_id, chat_data in st.session_state.chats.items():
+        json_chat = _serializar_chat(chat_data)
+        hash_chat = hashlib.sha256(json_chat.encode("utf-8")).hexdigest()
+        nome_arquivo = _nome_arquivo_chat(chat_id)
+        indice.append(
+            {"id": chat_id, "arquivo": nome_arquivo, "hash": hash_chat})
+        hashes_atuais[chat_id] = hash_chat
+
+        if regravar_tudo or hashes_salvos.get(chat_id) != hash_chat:
+            # A gravação é feita pela fila em segundo plano.
+            fila_persistencia.agendar(
+                _caminho_chat(username, nome_arquivo),
+                encrypt_file_content_general(json_chat),
+                f"Atualiza chat {chat_id} do usuario {username}")
+            alterados += 1
+
+    # Chats que não puderam ser lidos continuam no índice como estavam (não são apagados).
+    indice.extend(entrada for chat_id, entrada in nao_carregados.items()
+                  if chat_id not in hashes_atuais)
+
+    removidos = [chat_id for chat_id in hashes_salvos
+                 if chat_id not in hashes_atuais]
+    for chat_id in removidos:
+        fila_persistencia.agendar_exclusao(
+            _caminho_chat(username, _nome_arquivo_chat(chat_id)),
+            f"Remove chat {chat_id} do usuario {username}")
+
+    if regravar_tudo or alterados or removidos:
+        # Agendado por último: é gravado depois dos arquivos dos chats que ele referencia.
+        fila_persistencia.agendar(
+            _caminho_indice_chats(username),
+            encrypt_file_content_general(serializar_json({"versao": 1, "chats": indice})),
+            f"Atualiza indice de chats do usuario {username}")
+        if st.session_state.pop("_excluir_chats_legado", False):
+            # Depois do índice: a fila não exclui nada num lote em que uma gravação anterior falhou.
+            fila_persistencia.agendar_exclusao(
+                _caminho_chats_legado(username),
+                f"Remove arquivo unico de chats do usuario {username} (migrado)")
+        print(
+            f"Chats de '{username}': {alterados} alterado(s) e {len(removidos)} removido(s) agendados para gravação.")
+    st.session_state["_hashes_chats_salvos"] = hashes_atuais
 
 
 def escolher_resposta_por_contexto(entry):
@@ -689,15 +857,12 @@ def escolher_resposta_por_contexto(entry):
     return None
 
 
-def buscar_resposta_local(pergunta_usuario, memoria, limiar=0.9):
-    pergunta_usuario = pergunta_usuario.lower()
-    melhor_match, melhor_score = None, 0
-    for categoria in memoria:
-        for item in memoria[categoria]:
-            score = SequenceMatcher(
-                None, pergunta_usuario, item["pergunta"].lower()).ratio()
-            if score > melhor_score and score >= limiar:
-                melhor_match, melhor_score = item, score
+def buscar_resposta_local(pergunta_usuario, limiar=0.9):
+    """
+    Procura na memória persistente uma pergunta escrita quase igual à do usuário.
+    Usa o índice lexical (um produto de matriz esparsa) em vez de comparar item a item.
+    """
+    melhor_match, _ = indice_lexical.buscar(pergunta_usuario, limiar)
     if melhor_match:
         return escolher_resposta_por_contexto(melhor_match)
     return None
@@ -735,13 +900,23 @@ def ia_fez_uma_pergunta(mensagem_ia):
 
 
 # <--- MODIFICADO: Função agora aceita `tom_do_usuario` para evitar uma chamada de API extra.
-def responder_com_inteligencia(pergunta_usuario, modelo, historico_chat, memoria, resumo_contexto="", tom_do_usuario=None):
+def responder_com_inteligencia(pergunta_usuario, modelo, historico_chat, memoria, resumo_contexto="", tom_do_usuario=None, metadados=None, stream=False, usar_cache=False):
     """
     Decide como responder, com uma instrução de idioma reforçada e precisa.
+    Se `metadados` vierem das análises preliminares, o idioma e a decisão de busca
+    na web são reaproveitados em vez de consultados novamente.
+    Com `stream=True`, respostas da OpenAI voltam com a chave "stream" (iterador de
+    chunks) e "texto" igual a None; respostas da memória local continuam prontas em "texto".
+    `usar_cache=True` indica que a pergunta não depende do contexto da conversa e pode
+    ser respondida pelo cache semântico compartilhado.
     """
-    idioma_da_pergunta = detectar_idioma_com_ia(pergunta_usuario)
+    if metadados is None:
+        metadados = {}
+    idioma_da_pergunta = metadados.get("idioma") or detectar_idioma(
+        pergunta_usuario, fallback=detectar_idioma_com_ia)
     instrucao_idioma_reforcada = f"Sua regra mais importante e inegociável é responder estritamente no seguinte idioma: '{idioma_da_pergunta}'. Não use nenhum outro idioma sob nenhuma circunstância."
     entrada_curta = len(pergunta_usuario.strip()) <= 3
+    pergunta_original = pergunta_usuario
     resposta_memoria = None
 
     if entrada_curta and "ultima_pergunta_ia" in st.session_state:
@@ -749,18 +924,29 @@ def responder_com_inteligencia(pergunta_usuario, modelo, historico_chat, memoria
         if ia_fez_uma_pergunta(ultima):
             pergunta_usuario = f"Minha resposta é: '{pergunta_usuario}'. Com base na sua pergunta anterior: '{ultima}'"
         else:
-            resposta_memoria = buscar_resposta_local(pergunta_usuario, memoria)
+            resposta_memoria = buscar_resposta_local(pergunta_usuario)
     else:
-        resposta_memoria = buscar_resposta_local(pergunta_usuario, memoria)
+        resposta_memoria = buscar_resposta_local(pergunta_usuario)
+
+    vetor_pergunta_usuario = None
+    if modelo_embedding:
+        try:
+            # Calculado uma única vez: serve à memória local e ao cache semântico.
+            vetor_pergunta_usuario = modelo_embedding.encode([pergunta_usuario])
+        except Exception as e:
+            logging.error(f"Erro ao gerar o embedding da pergunta: {e}")
 
-    if modelo_embedding and st.session_state.get('vetores_perguntas') is not None:
+    # Uma única versão é lida por turno, assim índice e respostas sempre estão alinhados.
+    versao_base = base_conhecimento.versao_atual()
+    if vetor_pergunta_usuario is not None and versao_base is not None:
         try:
-            vetor_pergunta_usuario = modelo_embedding.encode(
-                [pergunta_usuario])
-            scores_similaridade = cosine_similarity(
-                vetor_pergunta_usuario, st.session_state.vetores_perguntas)
-            indice_melhor_match = np.argmax(scores_similaridade)
-            score_maximo = scores_similaridade[0, indice_melhor_match]
+            scores_similaridade, indices = versao_base.indice.search(
+                vetor_pergunta_usuario, k=1)
+            # A checagem de tamanho protege contra um índice já com um vetor a mais que as respostas
+            # (ex: durante um retreinamento, entre a gravação do .jvec e a do .joblib).
+            encontrado = len(indices) and int(indices[0]) < len(versao_base.respostas)
+            indice_melhor_match = int(indices[0]) if encontrado else None
+            score_maximo = float(scores_similaridade[0]) if encontrado else 0.0
             LIMIAR_CONFIANCA = 0.8
 
             if score_maximo > LIMIAR_CONFIANCA:
@@ -768,8 +954,7 @@ def responder_com_inteligencia(pergunta_usuario, modelo, historico_chat, memoria
                     f"Resposta encontrada na memória local com confiança de {score_maximo:.2%}.")
                 st.info(
                     f"Resposta encontrada na memória local (Confiança: {score_maximo:.2%}) 🧠")
-                respostas_possiveis = st.session_state.base_de_conhecimento[
-                    'respostas'][indice_melhor_match]
+                respostas_possiveis = versao_base.respostas[indice_melhor_match]
                 resposta_local = random.choice(respostas_possiveis)['texto']
                 return {"texto": resposta_local, "origem": "local"}
         except Exception as e:
@@ -784,7 +969,29 @@ def responder_com_inteligencia(pergunta_usuario, modelo, historico_chat, memoria
     if tom_do_usuario:
         st.sidebar.info(f"Tom detectado: {tom_do_usuario}")
 
-    if precisa_buscar_na_web(pergunta_usuario):
+    busca_web = metadados.get("precisa_busca_web")
+    if busca_web is None:
+        busca_web = precisa_buscar_na_web(pergunta_usuario)
+
+    # Respostas com busca na web (dependem do momento), personalizadas por preferências
+    # ou que dependem de um documento/conversa em contexto nunca passam pelo cache compartilhado.
+    # As que passam são geradas sem o tom e o estado emocional deste usuário (ver abaixo)
+    # e só são reaproveitadas para perguntas no mesmo idioma.
+    pergunta_cacheavel = (
+        usar_cache and vetor_pergunta_usuario is not None and not busca_web and not preferencias
+        and not resumo_contexto and pergunta_usuario == pergunta_original
+    )
+    if pergunta_cacheavel:
+        resposta_cache, score_cache = cache_respostas.buscar(vetor_pergunta_usuario, idioma_da_pergunta)
+        if resposta_cache:
+            logging.info(
+                f"Resposta reaproveitada do cache semântico (similaridade {score_cache:.2%}).")
+            st.info(
+                f"Resposta reaproveitada de uma pergunta equivalente (Similaridade: {score_cache:.2%}) ⚡")
+            st.session_state["ultima_pergunta_ia"] = resposta_cache
+            return {"texto": resposta_cache, "origem": "cache"}
+
+    if busca_web:
         logging.info(
             f"Iniciando busca na web para a pergunta: '{pergunta_usuario}'")
         st.info("Buscando informações em tempo real na web... 🌐")
@@ -818,18 +1025,14 @@ PERGUNTA DO USUÁRIO:
 
         prompt_sistema = f"{instrucao_idioma_reforcada}\n\nVocê é Jarvis, um assistente prestativo."
 
-        if tom_do_usuario:
+        # Uma resposta que vai para o cache compartilhado não pode levar a personalização deste usuário.
+        if tom_do_usuario and not pergunta_cacheavel:
             prompt_sistema += f"\nO tom do texto dele parece ser '{tom_do_usuario}'. Adapte seu estilo de resposta a isso."
-        if preferencias_emocionais := carregar_emocoes(username):
-            try:  # Adicionado try-except para mais robustez
-                ultima_emocao = list(preferencias_emocionais.values())[-1]
-                if isinstance(ultima_emocao, dict):
-                    ultima_emocao = ultima_emocao.get("emocao", "neutro")
-                ajuste_de_estilo = adaptar_estilo_com_base_na_emocao(
-                    str(ultima_emocao))
-                prompt_sistema += f"\nO usuário parece estar se sentindo '{ultima_emocao}' recentemente. {ajuste_de_estilo}"
-            except (IndexError, TypeError) as e:
-                print(f"Não foi possível obter a última emoção: {e}")
+        if not pergunta_cacheavel and (estado_emocional := obter_estado_emocional(username)):
+            ultima_emocao = estado_emocional["ultima_emocao"]
+            ajuste_de_estilo = adaptar_estilo_com_base_na_emocao(
+                str(ultima_emocao))
+            prompt_sistema += f"\nO usuário parece estar se sentindo '{ultima_emocao}' recentemente. {ajuste_de_estilo}"
 
         if preferencias:
             # PROMPT ATUALIZADO PARA RESPOSTA PADRÃO
@@ -845,7 +1048,8 @@ PERGUNTA DO USUÁRIO:
     resposta_modelo = chamar_openai_com_retries(
         modelo_openai=modelo,
         mensagens=mensagens_para_api,
-        modelo=modelo_selecionado
+        modelo=modelo_selecionado,
+        stream=stream
     )
 
     if resposta_modelo is None:
@@ -854,9 +1058,17 @@ PERGUNTA DO USUÁRIO:
             "origem": "erro_api"
         }
 
+    origem = "openai_web" if 'contexto_da_web' in locals() else 'openai'
+    # Quem recebe a resposta grava no cache (com stream, o texto só existe ao final).
+    vetor_cache = vetor_pergunta_usuario if pergunta_cacheavel else None
+    if stream:
+        # O texto final (e "ultima_pergunta_ia") é definido por quem consumir o stream.
+        return {"texto": None, "stream": resposta_modelo, "origem": origem, "vetor_cache": vetor_cache,
+                "idioma": idioma_da_pergunta}
+
     resposta_ia = resposta_modelo.choices[0].message.content
     st.session_state["ultima_pergunta_ia"] = resposta_ia
-    return {"texto": resposta_ia, "origem": "openai_web" if 'contexto_da_web' in locals() else 'openai'}
+    return {"texto": resposta_ia, "origem": origem, "vetor_cache": vetor_cache, "idioma": idioma_da_pergunta}
 
 
 
@@ -883,7 +1095,7 @@ def analisar_imagem(image_file):
         return "" # Retorna uma string vazia em caso de erro
 
 
-def processar_entrada_usuario(prompt_usuario, metadados=None):
+def processar_entrada_usuario(prompt_usuario, metadados=None, inicio_turno=None):
     chat_id = st.session_state.current_chat_id
     active_chat = st.session_state.chats[chat_id]
     active_chat = padronizar_chat(active_chat)
@@ -891,6 +1103,8 @@ def processar_entrada_usuario(prompt_usuario, metadados=None):
 
     if metadados is None:
         metadados = {}
+    if inicio_turno is None:
+        inicio_turno = time.perf_counter()
 
     df = active_chat.get("dataframe")
     if df is not None:
@@ -940,6 +1154,11 @@ def processar_entrada_usuario(prompt_usuario, metadados=None):
         else:
             nome_arquivo_display = "documento carregado"  # Caso de fallback
 
+        # Arquivos grandes: só os trechos relevantes para esta pergunta, não o texto inteiro a cada turno.
+        texto_contexto, contexto_completo = contexto_documento_para_pergunta(
+            chat_id, contexto_do_arquivo, prompt_usuario)
+        rotulo_contexto = "" if contexto_completo else " (TRECHOS MAIS RELEVANTES PARA A PERGUNTA ATUAL)"
+
         if is_modo_programacao:
             # MODO PROGRAMAÇÃO
             prompt_sistema_programacao = """
@@ -950,7 +1169,7 @@ def processar_entrada_usuario(prompt_usuario, metadados=None):
             """
             historico_para_analise = [
                 {"role": "system", "content": prompt_sistema_programacao},
-                {"role": "user", "content": f"O(s) seguinte(s) arquivo(s) de código está(ão) em contexto para nossa conversa:\n`{nome_arquivo_display}`\n\nCONTEÚDO DO(S) ARQUIVO(S):\n---\n{contexto_do_arquivo}\n---"},
+                {"role": "user", "content": f"O(s) seguinte(s) arquivo(s) de código está(ão) em contexto para nossa conversa:\n`{nome_arquivo_display}`\n\nCONTEÚDO DO(S) ARQUIVO(S){rotulo_contexto}:\n---\n{texto_contexto}\n---"},
                 {"role": "assistant",
                     "content": f"Entendido. O(s) arquivo(s) `{nome_arquivo_display}` foi(ram) carregado(s). Estou pronto para ajudar com o código."}
             ]
@@ -958,7 +1177,7 @@ def processar_entrada_usuario(prompt_usuario, metadados=None):
             # MODO DOCUMENTO/DADOS
             historico_para_analise = [
                 {"role": "system", "content": "Você é um assistente especialista em análise de dados e documentos. Responda às perguntas do usuário baseando-se ESTRITAMENTE no conteúdo do documento fornecido abaixo."},
-                {"role": "user", "content": f"CONTEÚDO DO DOCUMENTO PARA ANÁLISE:\n---\n{contexto_do_arquivo}\n---"},
+                {"role": "user", "content": f"CONTEÚDO DO DOCUMENTO PARA ANÁLISE{rotulo_contexto}:\n---\n{texto_contexto}\n---"},
                 {"role": "assistant", "content": "Entendido. O conteúdo do documento foi carregado. Estou pronto para responder suas perguntas sobre ele."}
             ]
 
@@ -971,14 +1190,49 @@ def processar_entrada_usuario(prompt_usuario, metadados=None):
     # <--- MODIFICADO: Passa o tom do usuário (dos metadados) para a função de resposta.
     tom_do_usuario = metadados.get("sentimento_usuario")
     dict_resposta = responder_com_inteligencia(
-        prompt_usuario, modelo, historico_final, memoria, resumo_contexto, tom_do_usuario=tom_do_usuario
+        prompt_usuario, modelo, historico_final, memoria, resumo_contexto, tom_do_usuario=tom_do_usuario,
+        metadados=metadados, stream=True,
+        # Só perguntas que abrem a conversa e sem arquivo em contexto são independentes do histórico.
+        usar_cache=not contexto_do_arquivo and sum(
+            1 for msg in historico_chat if msg["role"] == "user") <= 1
     )
 
+    metricas = {}
+    estado_stream = {}
+    if dict_resposta.get("stream") is not None:
+        # Renderiza os tokens no balão do chat à medida que chegam.
+        with st.chat_message("assistant"):
+            texto_final = st.write_stream(gerar_tokens_do_stream(
+                dict_resposta["stream"], metricas, inicio_turno, estado_stream))
+        if not isinstance(texto_final, str):
+            texto_final = "".join(str(parte) for parte in texto_final)
+        dict_resposta["texto"] = texto_final
+        st.session_state["ultima_pergunta_ia"] = texto_final
+    else:
+        metricas["tempo_primeiro_token"] = round(time.perf_counter() - inicio_turno, 3)
+
+    if estado_stream.get("erro") is not None:
+        # O texto parcial (com o aviso) fica no chat, mas não conta como resposta da OpenAI:
+        # fica fora do cache, da curadoria e das métricas de latência.
+        dict_resposta["origem"] = "erro_api"
+        metricas = {}
+        logging.warning(f"Turno concluído com erro no stream: {estado_stream['erro']}")
+    else:
+        metricas["latencia_total"] = round(time.perf_counter() - inicio_turno, 3)
+        if dict_resposta.get("vetor_cache") is not None and dict_resposta["origem"] == "openai":
+            cache_respostas.armazenar(
+                dict_resposta["vetor_cache"], prompt_usuario, dict_resposta["texto"], dict_resposta["idioma"])
+        logging.info(
+            f"Turno concluído (origem: {dict_resposta['origem']}) - primeiro token em {metricas.get('tempo_primeiro_token', 'n/a')}s, total em {metricas['latencia_total']}s.")
+
     active_chat["messages"].append({
         "role": "assistant",
         "type": "text",
         "content": dict_resposta["texto"],
-        "origem": dict_resposta["origem"]
+        "origem": dict_resposta["origem"],
+        # A resposta é sempre gerada no idioma da pergunta; reaproveitado pelo TTS.
+        "idioma": metadados.get("idioma"),
+        "metricas": metricas
     })
 
     if len(active_chat["messages"]) == 2 and active_chat.get("title", "") == "Novo Chat":
@@ -1000,24 +1254,12 @@ def salvar_feedback(username, rating, comment):
         "comment": comment
     }
 
-    caminho_arquivo = "dados/feedback.json"
-    os.makedirs("dados", exist_ok=True)
-
-    dados_existentes = []
-    if os.path.exists(caminho_arquivo) and os.path.getsize(caminho_arquivo) > 0:
-        with open(caminho_arquivo, "r", encoding="utf-8") as f:
-            try:
-                dados_existentes = json.load(f)
-            except json.JSONDecodeError:
-                dados_existentes = []
-
+    dados_existentes = carregar_json_local("dados/feedback.json", [])
     if not isinstance(dados_existentes, list):
         dados_existentes = []
 
     dados_existentes.append(feedback_data)
-
-    with open(caminho_arquivo, "w", encoding="utf-8") as f:
-        json.dump(dados_existentes, f, indent=4, ensure_ascii=False)
+    salvar_json_local("dados/feedback.json", dados_existentes, "Atualiza feedback")
 
 
 def gerar_resumo_curto_prazo(historico_chat):
@@ -1092,7 +1334,7 @@ def precisa_buscar_na_web(pergunta_usuario):
     """
     Usa a OpenAI para decidir rapidamente se uma pergunta requer busca na web.
     """
-    if any(p in pergunta_usuario.lower() for p in ["link", "vídeo", "site", "inscrição", "cadastro", "url"]):
+    if any(p in pergunta_usuario.lower() for p in PALAVRAS_CHAVE_BUSCA_WEB):
         return True
 
     print("Verificando necessidade de busca na web...")
@@ -1132,6 +1374,77 @@ def precisa_buscar_na_web(pergunta_usuario):
         return False
 
 
+# --- ANÁLISES PRELIMINARES (PRE-FLIGHT) EM PARALELO ---
+
+# Prazo total (em segundos) para todos os classificadores preliminares de um turno.
+PRAZO_ANALISES_PRELIMINARES = 8
+
+METADADOS_PADRAO = {
+    "emocao": "neutro", "sentimento_usuario": "n/a",
+    "categoria": "geral", "tipo_interacao": "conversa_geral"
+}
+
+
+@st.cache_resource
+def _obter_executor_preliminar():
+    """Cria (uma única vez por processo) o pool de threads usado pelas análises preliminares."""
+    return ThreadPoolExecutor(max_workers=6, thread_name_prefix="jarvis_preflight")
+
+
+def executar_analises_preliminares(prompt_usuario, prazo_segundos=PRAZO_ANALISES_PRELIMINARES):
+    """
+    Dispara ao mesmo tempo os classificadores independentes de um turno de chat
+    e junta tudo em um único dicionário de metadados. O classificador de metadados
+    já devolve também o idioma e a decisão de busca na web; se esses campos
+    faltarem, as funções dedicadas rodam em paralelo como plano B.
+    Classificadores que não terminarem dentro do prazo são substituídos pelos
+    valores padrão, assim o turno nunca espera mais que `prazo_segundos`.
+    """
+    # Lido aqui, pois as threads do pool não têm acesso ao st.session_state.
+    modelo_selecionado = st.session_state.get('admin_model_choice', 'gpt-5-nano')
+    executor = _obter_executor_preliminar()
+
+    inicio = time.perf_counter()
+    metadados = dict(METADADOS_PADRAO)
+    tarefas = {executor.submit(analisar_metadados_prompt, prompt_usuario): "metadados"}
+    prazo_final = inicio + prazo_segundos
+
+    while tarefas:
+        concluidas, pendentes = wait(
+            tarefas, timeout=max(0, prazo_final - time.perf_counter()), return_when=FIRST_COMPLETED)
+        if not concluidas:
+            break
+        for tarefa in concluidas:
+            chave = tarefas.pop(tarefa)
+            try:
+                resultado = tarefa.result()
+            except Exception as e:
+                print(f"Erro na análise preliminar '{chave}': {e}")
+                continue
+            if chave != "metadados":
+                metadados[chave] = resultado
+                continue
+            metadados.update(resultado or {})
+            # Plano B: só consulta as funções dedicadas se o classificador não trouxe os campos.
+            if "idioma" not in metadados:
+                # Detector local primeiro; a IA só é consultada para textos curtos e ambíguos.
+                fallback_idioma = lambda texto: detectar_idioma_com_ia(texto, modelo_selecionado)
+                tarefas[executor.submit(detectar_idioma, prompt_usuario, fallback_idioma)] = "idioma"
+            if "precisa_busca_web" not in metadados:
+                tarefas[executor.submit(precisa_buscar_na_web, prompt_usuario)] = "precisa_busca_web"
+
+    for tarefa, chave in tarefas.items():
+        tarefa.cancel()
+        logging.warning(
+            f"Análise preliminar '{chave}' excedeu o prazo de {prazo_segundos}s. Usando valor padrão.")
+    metadados.setdefault("idioma", "pt")
+    metadados.setdefault("precisa_busca_web", False)
+
+    logging.info(
+        f"Análises preliminares concluídas em {time.perf_counter() - inicio:.2f}s.")
+    return metadados
+
+
 def buscar_na_internet(pergunta_usuario):
     """
     Pesquisa a pergunta na web usando a API Serper e retorna um resumo dos resultados com links.
@@ -1345,7 +1658,10 @@ def delete_chat(chat_id_to_delete):
 
 
 def fazer_logout():
-    """Limpa a sessão para deslogar o usuário."""
+    """Grava os chats pendentes e limpa a sessão para deslogar o usuário."""
+    if st.session_state.get("username"):
+        salvar_chats(st.session_state["username"])
+    fila_persistencia.descarregar()
     st.session_state.clear()
 
 
@@ -1588,13 +1904,27 @@ with st.expander("📂 Anexar Arquivos"):
             else:  # Caso de múltiplos arquivos de documento/código
                 conteudo_agregado = []
                 with st.spinner(f"Analisando {len(arquivos_carregados)} arquivo(s)..."):
-                    for arquivo in arquivos_carregados:
-                        texto_extraido = extrair_texto_documento(arquivo)
+                    barra_progresso = st.progress(0.0)
+
+                    def mostrar_progresso(concluidos, total, nome):
+                        barra_progresso.progress(
+                            concluidos / total, text=f"{concluidos}/{total} arquivo(s) lido(s) — último: {nome}")
+
+                    # Arquivos e páginas de PDFs grandes são extraídos em paralelo (extracao_documentos.py)
+                    textos_extraidos = extrair_textos(
+                        [(arquivo.name, arquivo.getvalue()) for arquivo in arquivos_carregados],
+                        ao_concluir_arquivo=mostrar_progresso)
+                    for arquivo, texto_extraido in zip(arquivos_carregados, textos_extraidos):
                         conteudo_agregado.append(
                             f"--- INÍCIO DO ARQUIVO: {arquivo.name} ---\n\n{texto_extraido}\n\n--- FIM DO ARQUIVO: {arquivo.name} ---")
+                    barra_progresso.empty()
 
                     active_chat["contexto_arquivo"] = "\n\n".join(
                         conteudo_agregado)
+                    if modelo_embedding and len(active_chat["contexto_arquivo"]) > LIMITE_CONTEXTO_INTEGRAL:
+                        # Indexa já no envio, para a primeira pergunta não esperar os embeddings
+                        obter_indice_documento(
+                            chat_id_for_key, active_chat["contexto_arquivo"])
                     active_chat["processed_file_names"] = nomes_arquivos_atuais
                     active_chat["messages"].append({
                         "role": "assistant", "type": "text",
@@ -1831,7 +2161,8 @@ if active_chat["messages"] and active_chat["messages"][-1]["role"] == "assistant
     if active_chat["messages"][-1].get("type") == "text":
         resposta_ia = active_chat["messages"][-1]["content"]
         if resposta_ia != active_chat.get("ultima_mensagem_falada"):
-            idioma_detectado = detectar_idioma_com_ia(resposta_ia)
+            idioma_detectado = active_chat["messages"][-1].get(
+                "idioma") or detectar_idioma(resposta_ia, fallback=detectar_idioma_com_ia)
             texto_limpo_para_fala = preparar_texto_para_fala(resposta_ia)
             resposta_formatada_para_voz = json.dumps(texto_limpo_para_fala)
             st.components.v1.html(f"""
@@ -1958,20 +2289,30 @@ def processar_comandos(prompt_usuario, active_chat):
             partes = prompt_usuario.strip().split(" ", 1)
             comando = partes[0].lower()
             instrucao_adicional = partes[1] if len(partes) > 1 else ""
-            nome_arquivo = active_chat.get("processed_file_names", [""])[0]
+            nomes_arquivos = active_chat.get("processed_file_names") or [""]
+            # O arquivo citado nas instruções (ex: "/refatorar utils.py ..."); senão, o primeiro anexado.
+            nome_arquivo = next((nome for nome in nomes_arquivos if nome and nome in instrucao_adicional),
+                                nomes_arquivos[0])
 
             with st.spinner(f"Processando '{comando}' no arquivo `{nome_arquivo}`..."):
+                codigo_para_analise, codigo_completo = codigo_para_comando(
+                    st.session_state.current_chat_id, active_chat.get("contexto_arquivo"), nome_arquivo,
+                    instrucao_adicional or f"{comando} {nome_arquivo}")
+                aviso_trechos = "" if codigo_completo else (
+                    "Atenção: o arquivo é grande demais para ser enviado inteiro; abaixo estão só os "
+                    "trechos mais relevantes. Não reescreva o arquivo inteiro, trabalhe sobre esses trechos.")
                 prompt_para_ia = f"""
                 Você é um programador expert. Sua tarefa é executar a ação '{comando}' no código-fonte fornecido.
 
                 Arquivo em análise: `{nome_arquivo}`
                 Instruções adicionais do usuário: "{instrucao_adicional if instrucao_adicional else 'Nenhuma'}"
+                {aviso_trechos}
 
                 Responda de forma clara, com explicações detalhadas e, se aplicável, forneça o bloco de código modificado ou sugerido.
 
                 CÓDIGO-FONTE PARA ANÁLISE:
                 ---
-                {active_chat.get("contexto_arquivo")}
+                {codigo_para_analise}
                 ---
                 """
                                 
@@ -2061,15 +2402,19 @@ if prompt_usuario := st.chat_input("Fale com a Jarvis ou use /lembrese, /imagine
 
     # Se NÃO for um comando, processa como um chat normal
     if not comando_foi_processado:
-        # 1. Analisa os metadados do prompt com UMA chamada de API otimizada
-        metadados = analisar_metadados_prompt(prompt_usuario)
+        inicio_turno = time.perf_counter()
+        # Mostra a pergunta já nesta execução, antes de a resposta começar a ser transmitida.
+        with st.chat_message("user"):
+            st.write(prompt_usuario)
+        # 1. Executa em paralelo as análises preliminares (metadados, idioma e busca na web)
+        metadados = executar_analises_preliminares(prompt_usuario)
 
         # 2. Salva as emoções e outros metadados coletados
         if st.session_state.username:
             timestamp_atual = datetime.now().isoformat()
             data_hora_obj = datetime.now()
 
-            emocoes_dict[timestamp_atual] = {
+            registro_emocao = {
                 "emocao": metadados.get("emocao", "neutro"),
                 "sentimento_mensagem_usuario": metadados.get("sentimento_usuario", "n/a"),
                 "tipo_interacao": metadados.get("tipo_interacao", "conversa_geral"),
@@ -2078,10 +2423,13 @@ if prompt_usuario := st.chat_input("Fale com a Jarvis ou use /lembrese, /imagine
                 "periodo_do_dia": "manhã" if 5 <= data_hora_obj.hour < 12 else "tarde" if 12 <= data_hora_obj.hour < 18 else "noite",
                 "prompt_original": prompt_usuario
             }
-            salvar_emocoes(emocoes_dict, st.session_state.username)
+            # Acrescenta só este evento à partição do mês (não regrava o histórico)
+            registrar_emocao(st.session_state.username,
+                             registro_emocao, timestamp_atual)
             # Atualiza a última emoção na sessão para uso imediato
             st.session_state["ultima_emocao_usuario"] = metadados.get(
                 "emocao", "neutro")
 
         # 3. Chama a função de processamento de chat, passando os metadados já coletados
-        processar_entrada_usuario(prompt_usuario, metadados=metadados)
+        processar_entrada_usuario(
+            prompt_usuario, metadados=metadados, inicio_turno=inicio_turno)
@@ -0,0 +1,391 @@
+# armazenamento.py - Camada única de armazenamento de dados (GitHub, disco local ou SQLite)
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+TIPO_ARMAZENAMENTO_LOCAL = os.getenv("ARMAZENAMENTO_LOCAL", "local")  # "local" ou "sqlite"
+CAMINHO_SQLITE = os.getenv("ARMAZENAMENTO_SQLITE", "dados/jarvis.db")
+VERSAO_AUSENTE = "ausente"  # versao() de um objeto que não existe
+
+
+class ErroArmazenamento(Exception):
+    """Falha ao ler ou listar (diferente de um objeto que não existe)."""
+
+
+class Armazenamento:
+    """
+    Interface comum dos drivers: objetos de texto identificados por uma chave
+    no formato de caminho (ex: "dados/feedback.json").
+    - get(chave) -> conteúdo ou None se não existir; uma falha de leitura levanta exceção
+      (ErroArmazenamento ou a do próprio driver), nunca vira None
+    - put(chave, conteudo, mensagem=None) -> bool (`mensagem` só é usada pelo GitHub, como commit)
+    - delete(chave, mensagem=None) -> bool (excluir algo inexistente também é sucesso)
+    - list(prefixo="") -> chaves que começam com o prefixo, ordenadas
+    - versao(chave) -> marca barata que muda quando o objeto muda (VERSAO_AUSENTE se ele
+      não existir), sem ler o conteúdo; None se o driver não souber dizer
+    - acrescentar(chave, conteudo, mensagem=None, conteudo_anterior=None) -> bool:
+      acrescenta `conteudo` ao fim do objeto (criando-o se não existir)
+    - aplicar_lote(alteracoes, mensagem=None, prefixos_exclusao=()) -> bool: várias
+      gravações (chave -> conteúdo) e exclusões (chave -> None) de uma vez
+    """
+
+    def get(self, chave):
+        raise NotImplementedError
+
+    def put(self, chave, conteudo, mensagem=None):
+        raise NotImplementedError
+
+    def delete(self, chave, mensagem=None):
+        raise NotImplementedError
+
+    def list(self, prefixo=""):
+        raise NotImplementedError
+
+    def versao(self, chave):
+        return None
+
+    def acrescentar(self, chave, conteudo, mensagem=None, conteudo_anterior=None):
+        """
+        Implementação padrão: regrava o objeto inteiro. `conteudo_anterior`, se
+        informado, evita reler o objeto. Os drivers locais só escrevem o final.
+        """
+        if conteudo_anterior is None:
+            conteudo_anterior = self.get(chave) or ""
+        return self.put(chave, conteudo_anterior + conteudo, mensagem)
+
+    def aplicar_lote(self, alteracoes, mensagem=None, prefixos_exclusao=()):
+        """Implementação padrão: uma operação por chave. O driver do GitHub faz um único commit."""
+        alteracoes = dict(alteracoes)
+        for prefixo in prefixos_exclusao:
+            for chave in self.list(prefixo):
+                alteracoes.setdefault(chave, None)
+        sucesso = True
+        for chave, conteudo in alteracoes.items():
+            if conteudo is None:
+                sucesso = self.delete(chave, mensagem) and sucesso
+            else:
+                sucesso = self.put(chave, conteudo, mensagem) and sucesso
+        return sucesso
+
+
+class ArmazenamentoLocal(Armazenamento):
+    """Arquivos em disco abaixo de `raiz`; a gravação é atômica (arquivo temporário + os.replace)."""
+
+    def __init__(self, raiz="."):
+        self.raiz = raiz
+
+    def _caminho(self, chave):
+        return os.path.join(self.raiz, *chave.split("/"))
+
+    def get(self, chave):
+        try:
+            with open(self._caminho(chave), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, chave, conteudo, mensagem=None):
+        caminho = self._caminho(chave)
+        try:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            caminho_tmp = f"{caminho}.tmp"
+            with open(caminho_tmp, "w", encoding="utf-8") as f:
+                f.write(conteudo)
+            os.replace(caminho_tmp, caminho)
+            return True
+        except OSError as e:
+            print(f"ERRO ao gravar '{chave}' no disco: {e}")
+            return False
+
+    def acrescentar(self, chave, conteudo, mensagem=None, conteudo_anterior=None):
+        caminho = self._caminho(chave)
+        try:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            with open(caminho, "a", encoding="utf-8") as f:
+                f.write(conteudo)
+            return True
+        except OSError as e:
+            print(f"ERRO ao acrescentar a '{chave}' no disco: {e}")
+            return False
+
+    def delete(self, chave, mensagem=None):
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"ERRO ao excluir '{chave}' do disco: {e}")
+            return False
+        return True
+
+    def versao(self, chave):
+        """Data de modificação (ns) e tamanho do arquivo: um os.stat, sem abrir o arquivo."""
+        try:
+            info = os.stat(self._caminho(chave))
+        except FileNotFoundError:
+            return VERSAO_AUSENTE
+        return info.st_mtime_ns, info.st_size
+
+    def list(self, prefixo=""):
+        pasta = prefixo.rsplit("/", 1)[0] if "/" in prefixo else ""
+        chaves = []
+        for diretorio, _, arquivos in os.walk(self._caminho(pasta) if pasta else self.raiz):
+            relativo = os.path.relpath(diretorio, self.raiz).replace(os.sep, "/")
+            for nome in arquivos:
+                chave = nome if relativo == "." else f"{relativo}/{nome}"
+                if chave.startswith(prefixo) and not chave.endswith(".tmp"):
+                    chaves.append(chave)
+        return sorted(chaves)
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """
+    Objetos em uma tabela SQLite em modo WAL: gravações de milissegundos e
+    leituras que não esperam pelas escritas de outras sessões.
+
+    Com `raiz_importacao`, uma chave que ainda não está no banco é lida uma única
+    vez do arquivo antigo em disco (ex: dados/assinaturas.json) e importada. A tabela
+    `importados` registra as chaves já vistas, para que um arquivo antigo nunca
+    reapareça depois de a chave ser excluída ou regravada no banco.
+    """
+
+    def __init__(self, caminho=CAMINHO_SQLITE, raiz_importacao=None):
+        self.caminho = caminho
+        self._disco = ArmazenamentoLocal(raiz_importacao) if raiz_importacao else None
+        # O próprio banco (e seus arquivos -wal/-shm) pode estar dentro da pasta importada.
+        self._chave_banco = os.path.relpath(caminho, raiz_importacao or ".").replace(os.sep, "/")
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        with self._lock:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS objetos ("
+                "chave TEXT PRIMARY KEY, conteudo TEXT NOT NULL, atualizado_em REAL NOT NULL)")
+            self._conexao.execute("CREATE TABLE IF NOT EXISTS importados (chave TEXT PRIMARY KEY)")
+            self._conexao.commit()
+
+    def _ja_importado(self, chave):
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT 1 FROM importados WHERE chave = ?", (chave,)).fetchone() is not None
+
+    def _marcar_importado(self, chave):
+        """Chamar dentro da transação (com o lock) de uma gravação ou exclusão."""
+        if self._disco is not None:
+            self._conexao.execute("INSERT OR IGNORE INTO importados (chave) VALUES (?)", (chave,))
+
+    def _importar_do_disco(self, chave):
+        """Importa (uma vez) o arquivo antigo da chave, se existir. Retorna o conteúdo importado ou None."""
+        if self._disco is None or self._ja_importado(chave):
+            return None
+        conteudo = self._disco.get(chave)
+        try:
+            with self._lock, self._conexao:
+                self._marcar_importado(chave)
+                if conteudo is not None:
+                    self._conexao.execute(
+                        "INSERT OR IGNORE INTO objetos (chave, conteudo, atualizado_em) VALUES (?, ?, ?)",
+                        (chave, conteudo, time.time()))
+        except sqlite3.Error as e:
+            print(f"ERRO ao importar '{chave}' para o SQLite: {e}")
+        return conteudo
+
+    def get(self, chave):
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT conteudo FROM objetos WHERE chave = ?", (chave,)).fetchone()
+        if linha:
+            return linha[0]
+        if self._importar_do_disco(chave) is None:
+            return None
+        with self._lock:  # Relê: uma gravação concorrente tem prioridade sobre o arquivo antigo
+            linha = self._conexao.execute(
+                "SELECT conteudo FROM objetos WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def put(self, chave, conteudo, mensagem=None):
+        try:
+            with self._lock, self._conexao:
+                self._marcar_importado(chave)
+                self._conexao.execute(
+                    "INSERT INTO objetos (chave, conteudo, atualizado_em) VALUES (?, ?, ?) "
+                    "ON CONFLICT(chave) DO UPDATE SET conteudo = excluded.conteudo, "
+                    "atualizado_em = excluded.atualizado_em",
+                    (chave, conteudo, time.time()))
+            return True
+        except sqlite3.Error as e:
+            print(f"ERRO ao gravar '{chave}' no SQLite: {e}")
+            return False
+
+    def acrescentar(self, chave, conteudo, mensagem=None, conteudo_anterior=None):
+        self._importar_do_disco(chave)  # O final vai depois do conteúdo do arquivo antigo
+        try:
+            with self._lock, self._conexao:
+                self._conexao.execute(
+                    "INSERT INTO objetos (chave, conteudo, atualizado_em) VALUES (?, ?, ?) "
+                    "ON CONFLICT(chave) DO UPDATE SET conteudo = objetos.conteudo || excluded.conteudo, "
+                    "atualizado_em = excluded.atualizado_em",
+                    (chave, conteudo, time.time()))
+            return True
+        except sqlite3.Error as e:
+            print(f"ERRO ao acrescentar a '{chave}' no SQLite: {e}")
+            return False
+
+    def delete(self, chave, mensagem=None):
+        try:
+            with self._lock, self._conexao:
+                self._marcar_importado(chave)
+                self._conexao.execute("DELETE FROM objetos WHERE chave = ?", (chave,))
+            return True
+        except sqlite3.Error as e:
+            print(f"ERRO ao excluir '{chave}' do SQLite: {e}")
+            return False
+
+    def versao(self, chave):
+        """`atualizado_em` da chave; se ela ainda não foi importada, a versão do arquivo antigo em disco."""
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT atualizado_em, length(conteudo) FROM objetos WHERE chave = ?", (chave,)).fetchone()
+        if linha:
+            return tuple(linha)
+        if self._disco is not None and not self._ja_importado(chave):
+            return self._disco.versao(chave)
+        return VERSAO_AUSENTE
+
+    def list(self, prefixo=""):
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT chave FROM objetos WHERE chave >= ? AND chave < ? ORDER BY chave",
+                (prefixo, prefixo + "\U0010ffff")).fetchall()
+            chaves = {linha[0] for linha in linhas}
+            if self._disco is not None:
+                importados = {linha[0] for linha in self._conexao.execute(
+                    "SELECT chave FROM importados WHERE chave >= ? AND chave < ?",
+                    (prefixo, prefixo + "\U0010ffff"))}
+        if self._disco is not None:  # Arquivos antigos ainda não importados também existem
+            chaves.update(c for c in self._disco.list(prefixo)
+                          if c not in importados and not c.startswith(self._chave_banco))
+        return sorted(chaves)
+
+
+class ArmazenamentoGitHub(Armazenamento):
+    """
+    Driver do repositório GitHub. Recebe as funções de acesso de utils.py
+    (que já cuidam do token, do cache de leitura e dos commits).
+    """
+
+    def __init__(self, funcao_ler, funcao_gravar, funcao_excluir, funcao_listar, funcao_gravar_lote):
+        self._ler = funcao_ler  # (caminho) -> conteudo ou None; levanta ErroArmazenamento se falhar
+        self._gravar = funcao_gravar  # (caminho, conteudo, mensagem_commit) -> bool
+        self._excluir = funcao_excluir  # (caminho, mensagem_commit) -> bool
+        self._listar = funcao_listar  # (prefixo) -> [caminho]
+        self._gravar_lote = funcao_gravar_lote  # (alteracoes, mensagem_commit, prefixos_exclusao) -> bool
+
+    def get(self, chave):
+        return self._ler(chave)
+
+    def put(self, chave, conteudo, mensagem=None):
+        return self._gravar(chave, conteudo, mensagem or f"Atualiza {chave}")
+
+    def delete(self, chave, mensagem=None):
+        return self._excluir(chave, mensagem or f"Exclui {chave}")
+
+    def list(self, prefixo=""):
+        return sorted(self._listar(prefixo))
+
+    def aplicar_lote(self, alteracoes, mensagem=None, prefixos_exclusao=()):
+        return self._gravar_lote(alteracoes, mensagem or f"Atualiza {len(alteracoes)} arquivo(s)",
+                                 prefixos_exclusao)
+
+
+class ArmazenamentoComBackup(Armazenamento):
+    """
+    Usa um armazenamento rápido (local/SQLite) como principal e replica cada
+    alteração para um backup lento (o GitHub) através de uma FilaPersistencia,
+    sem bloquear quem grava.
+    """
+
+    def __init__(self, principal, fila_backup):
+        self.principal = principal
+        self._fila_backup = fila_backup
+
+    def get(self, chave):
+        return self.principal.get(chave)
+
+    def put(self, chave, conteudo, mensagem=None):
+        if not self.principal.put(chave, conteudo, mensagem):
+            return False
+        self._fila_backup.agendar(chave, conteudo, mensagem or f"Atualiza {chave}")
+        return True
+
+    def acrescentar(self, chave, conteudo, mensagem=None, conteudo_anterior=None):
+        if not self.principal.acrescentar(chave, conteudo, mensagem, conteudo_anterior):
+            return False
+        # O backup (GitHub) só sabe gravar o objeto inteiro.
+        completo = conteudo_anterior + conteudo if conteudo_anterior is not None else self.principal.get(chave)
+        self._fila_backup.agendar(chave, completo, mensagem or f"Atualiza {chave}")
+        return True
+
+    def delete(self, chave, mensagem=None):
+        if not self.principal.delete(chave, mensagem):
+            return False
+        self._fila_backup.agendar_exclusao(chave, mensagem or f"Exclui {chave}")
+        return True
+
+    def list(self, prefixo=""):
+        return self.principal.list(prefixo)
+
+    def versao(self, chave):
+        return self.principal.versao(chave)
+
+
+def criar_armazenamento(tipo, raiz_importacao=None):
+    """
+    Cria um driver sem dependências externas: "local" (arquivos a partir da raiz) ou "sqlite".
+    No SQLite, `raiz_importacao` importa sob demanda os arquivos JSON antigos dessa pasta.
+    """
+    if tipo == "sqlite":
+        return ArmazenamentoSQLite(raiz_importacao=raiz_importacao)
+    if tipo == "local":
+        return ArmazenamentoLocal()
+    raise ValueError(f"Tipo de armazenamento desconhecido: {tipo}. Use 'local' ou 'sqlite'.")
+
+
+_armazenamento_local = None
+_lock_armazenamento_local = threading.Lock()
+
+
+def obter_armazenamento_local():
+    """
+    Armazenamento dos dados que sempre ficaram no servidor (assinaturas, feedback,
+    memória, históricos locais). Uma instância por processo; o tipo vem da
+    variável de ambiente ARMAZENAMENTO_LOCAL ("local", o padrão, ou "sqlite").
+    """
+    global _armazenamento_local
+    with _lock_armazenamento_local:
+        if _armazenamento_local is None:
+            # Os arquivos JSON de antes do SQLite (assinaturas, feedback, memória) estão na raiz.
+            _armazenamento_local = criar_armazenamento(TIPO_ARMAZENAMENTO_LOCAL, raiz_importacao=".")
+        return _armazenamento_local
+
+
+def carregar_json_local(chave, padrao=None):
+    """Lê um JSON em texto claro do armazenamento local; `padrao` se não existir ou for inválido."""
+    conteudo = obter_armazenamento_local().get(chave)
+    if conteudo is None:
+        return padrao
+    try:
+        return json.loads(conteudo)
+    except json.JSONDecodeError:
+        print(f"ERRO: '{chave}' não é um JSON válido.")
+        return padrao
+
+
+def salvar_json_local(chave, dados, mensagem=None):
+    """Grava um JSON em texto claro (indentado, para edição manual) no armazenamento local."""
+    return obter_armazenamento_local().put(chave, json.dumps(dados, ensure_ascii=False, indent=4), mensagem)
@@ -0,0 +1,148 @@
+# armazenamento_vetores.py - Formato em disco da matriz de embeddings (append-only, memmap, quantizado)
+
+import os
+import struct
+import numpy as np
+
+# Layout do arquivo (.jvec):
+#   [cabeçalho de 64 bytes][capacidade × dim valores do tipo escolhido]
+# O cabeçalho guarda: assinatura, versão, tipo, dimensão, quantidade usada (n) e capacidade.
+# Os vetores são gravados já normalizados (norma 1), que é tudo o que a busca por cosseno precisa;
+# por isso o int8 usa uma escala fixa de 127 sem precisar guardar escalas por vetor.
+ASSINATURA = b"JVEC"
+VERSAO_FORMATO = 1
+TAMANHO_CABECALHO = 64
+_FORMATO_CABECALHO = "<4sHBxIQQ"  # assinatura, versão, código do tipo, dimensão, n, capacidade
+
+TIPOS = {"float32": (1, np.float32), "float16": (2, np.float16), "int8": (3, np.int8)}
+_TIPOS_POR_CODIGO = {codigo: (nome, dtype) for nome, (codigo, dtype) in TIPOS.items()}
+ESCALA_INT8 = 127.0
+
+CAPACIDADE_INICIAL = 1024
+FATOR_CRESCIMENTO = 2
+
+
+def _normalizar(vetores):
+    vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vetores / normas
+
+
+class ArmazenamentoVetores:
+    """
+    Matriz de embeddings em disco, lida via np.memmap (abertura quase instantânea e
+    sem copiar tudo para a RAM). Adições são O(1) amortizado: o arquivo tem capacidade
+    pré-alocada que cresce geometricamente, sem nunca copiar as linhas existentes.
+    """
+
+    def __init__(self, caminho, modo="r"):
+        self.caminho = caminho
+        self.modo = modo
+        self._ler_cabecalho()
+        self._mapear()
+
+    # --- Criação / abertura ---
+
+    @classmethod
+    def criar(cls, caminho, dim, tipo="float16", capacidade=CAPACIDADE_INICIAL):
+        """Cria um armazenamento vazio (sobrescreve o arquivo, se existir)."""
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de vetor não suportado: {tipo}. Use um de {list(TIPOS)}.")
+        codigo, dtype = TIPOS[tipo]
+        capacidade = max(1, int(capacidade))
+        with open(caminho, "wb") as f:
+            f.write(struct.pack(_FORMATO_CABECALHO, ASSINATURA, VERSAO_FORMATO, codigo, dim, 0, capacidade)
+                    .ljust(TAMANHO_CABECALHO, b"\0"))
+            f.truncate(TAMANHO_CABECALHO + capacidade * dim * np.dtype(dtype).itemsize)
+        return cls(caminho, modo="r+")
+
+    @classmethod
+    def de_array(cls, caminho, vetores, tipo="float16", folga=CAPACIDADE_INICIAL):
+        """
+        Grava uma matriz inteira em um novo armazenamento de forma atômica
+        (arquivo temporário + os.replace). Usado pelo treinamento.
+        """
+        vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+        caminho_tmp = f"{caminho}.tmp"
+        armazenamento = cls.criar(caminho_tmp, vetores.shape[1], tipo, capacidade=len(vetores) + folga)
+        if len(vetores):
+            armazenamento.adicionar(vetores)
+        armazenamento.fechar()
+        os.replace(caminho_tmp, caminho)
+        return cls(caminho)
+
+    def _ler_cabecalho(self):
+        with open(self.caminho, "rb") as f:
+            cabecalho = f.read(TAMANHO_CABECALHO)
+        assinatura, versao, codigo, dim, n, capacidade = struct.unpack_from(_FORMATO_CABECALHO, cabecalho)
+        if assinatura != ASSINATURA or versao != VERSAO_FORMATO:
+            raise ValueError(f"'{self.caminho}' não é um armazenamento de vetores válido.")
+        self.tipo, self.dtype = _TIPOS_POR_CODIGO[codigo]
+        self.dim, self.n, self.capacidade = dim, n, capacidade
+
+    def _mapear(self):
+        self._dados = np.memmap(self.caminho, dtype=self.dtype, mode=self.modo,
+                                offset=TAMANHO_CABECALHO, shape=(self.capacidade, self.dim))
+
+    def _gravar_n(self):
+        """Atualiza só o contador de linhas no cabeçalho (depois de os dados estarem no disco)."""
+        with open(self.caminho, "r+b") as f:
+            f.write(struct.pack(_FORMATO_CABECALHO, ASSINATURA, VERSAO_FORMATO, TIPOS[self.tipo][0],
+                                self.dim, self.n, self.capacidade))
+
+    # --- Leitura / escrita ---
+
+    def __len__(self):
+        return self.n
+
+    def vetores(self):
+        """Visão (memmap, sem cópia) das linhas usadas, no tipo armazenado e já normalizadas."""
+        return self._dados[:self.n]
+
+    def vetores_float32(self, inicio=0, fim=None):
+        """Cópia em float32 de um intervalo de linhas, desfazendo a quantização int8."""
+        bloco = np.asarray(self._dados[inicio:self.n if fim is None else min(fim, self.n)], dtype=np.float32)
+        return bloco / ESCALA_INT8 if self.tipo == "int8" else bloco
+
+    def adicionar(self, vetores):
+        """Acrescenta vetores ao final; retorna o índice da primeira linha adicionada."""
+        if self.modo == "r":
+            raise PermissionError("Armazenamento de vetores aberto somente para leitura.")
+        vetores = _normalizar(vetores)
+        if vetores.shape[1] != self.dim:
+            raise ValueError(f"Dimensão {vetores.shape[1]} diferente da do armazenamento ({self.dim}).")
+
+        necessario = self.n + len(vetores)
+        if necessario > self.capacidade:
+            self._crescer(necessario)
+
+        if self.tipo == "int8":
+            vetores = np.clip(np.rint(vetores * ESCALA_INT8), -127, 127)
+        inicio = self.n
+        self._dados[inicio:necessario] = vetores.astype(self.dtype)
+        self._dados.flush()
+        self.n = necessario
+        self._gravar_n()
+        return inicio
+
+    def _crescer(self, minimo):
+        """Aumenta a capacidade geometricamente estendendo o arquivo (as linhas existentes não são copiadas)."""
+        nova_capacidade = max(minimo, self.capacidade * FATOR_CRESCIMENTO)
+        self._dados.flush()
+        del self._dados
+        with open(self.caminho, "r+b") as f:
+            f.truncate(TAMANHO_CABECALHO + nova_capacidade * self.dim * np.dtype(self.dtype).itemsize)
+        self.capacidade = nova_capacidade
+        self._gravar_n()
+        self._mapear()
+
+    def fechar(self):
+        if self.modo != "r":
+            self._dados.flush()
+        del self._dados
+
+
+def converter_npy(caminho_npy, caminho_destino, tipo="float16"):
+    """Converte um .npy antigo (float32) para o formato .jvec."""
+    return ArmazenamentoVetores.de_array(caminho_destino, np.load(caminho_npy), tipo=tipo)
@@ -6,6 +6,7 @@ import bcrypt
 import os
 from datetime import datetime
 from dotenv import load_dotenv
+from armazenamento import obter_armazenamento_local
 
 
 load_dotenv()
@@ -13,27 +14,26 @@ ADMIN_USERNAME = st.secrets.get("ADMIN_USERNAME") or os.getenv("ADMIN_USERNAME")
 ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD") or os.getenv("ADMIN_PASSWORD")
 
 # --- Funções Auxiliares (carregar_assinaturas E salvar_assinaturas) ---
+CAMINHO_ASSINATURAS = "dados/assinaturas.json"
+
 def carregar_assinaturas(): #
-    """Carrega os dados de assinaturas do arquivo JSON em texto claro.""" #
-    caminho_arquivo = "dados/assinaturas.json" #
-    if os.path.exists(caminho_arquivo): #
-        with open(caminho_arquivo, 'r', encoding='utf-8') as f: #
-            try: #
-                data = json.load(f) #
-                return data if isinstance(data, dict) else {} #
-            except json.JSONDecodeError: #
-                print(f"ERRO: O arquivo '{caminho_arquivo}' não é um JSON válido. Retornando vazio.") #
-                return {} #
-    print(f"AVISO: Arquivo '{caminho_arquivo}' não encontrado. Retornando assinaturas vazias.") #
+    """Carrega os dados de assinaturas (JSON em texto claro) do armazenamento local.""" #
+    conteudo = obter_armazenamento_local().get(CAMINHO_ASSINATURAS)
+    if conteudo is not None: #
+        try: #
+            data = json.loads(conteudo) #
+            return data if isinstance(data, dict) else {} #
+        except json.JSONDecodeError: #
+            print(f"ERRO: O arquivo '{CAMINHO_ASSINATURAS}' não é um JSON válido. Retornando vazio.") #
+            return {} #
+    print(f"AVISO: Arquivo '{CAMINHO_ASSINATURAS}' não encontrado. Retornando assinaturas vazias.") #
     return {} #
 
 def salvar_assinaturas(assinaturas_data): #
-    """Salva os dados de assinaturas no arquivo JSON em texto claro.""" #
-    caminho_arquivo = "dados/assinaturas.json" #
-    os.makedirs(os.path.dirname(caminho_arquivo), exist_ok=True) #
-    with open(caminho_arquivo, 'w', encoding='utf-8') as f: #
-        json.dump(assinaturas_data, f, ensure_ascii=False, indent=4) #
-    print(f"Assinaturas salvas em '{caminho_arquivo}'.") #
+    """Salva os dados de assinaturas (JSON em texto claro) no armazenamento local.""" #
+    conteudo = json.dumps(assinaturas_data, ensure_ascii=False, indent=4)
+    if obter_armazenamento_local().put(CAMINHO_ASSINATURAS, conteudo, "Atualiza assinaturas"): #
+        print(f"Assinaturas salvas em '{CAMINHO_ASSINATURAS}'.") #
 
 def carregar_lista_usuarios():
     """
@@ -0,0 +1,129 @@
+# base_conhecimento.py - Base de conhecimento local única e compartilhada por todas as sessões
+
+import os
+import threading
+from dataclasses import dataclass
+import joblib
+import numpy as np
+from indice_vetorial import criar_indice
+from armazenamento_vetores import ArmazenamentoVetores, converter_npy, ESCALA_INT8
+
+CAMINHO_VETORES = "vetores_perguntas_v3.jvec"
+CAMINHO_VETORES_LEGADO = "vetores_perguntas_v2.npy"  # Formato antigo, convertido na primeira carga
+CAMINHO_CONHECIMENTO = "dados_conhecimento_v2.joblib"
+
+
+@dataclass(frozen=True)
+class VersaoBase:
+    """
+    Fotografia imutável da base de conhecimento. As sessões só leem versões;
+    uma atualização cria uma nova versão e a troca de uma vez (swap atômico).
+    """
+    versao: int
+    vetores: np.ndarray
+    perguntas: tuple
+    respostas: tuple
+    indice: object
+
+    def __len__(self):
+        return len(self.respostas)
+
+
+class BaseConhecimento:
+    """
+    Mantém uma única cópia (por processo) dos vetores e respostas da memória local.
+    Os vetores ficam em um ArmazenamentoVetores (memmap float16) em vez de copiados
+    para a RAM, e toda curadoria vira uma nova versão visível imediatamente para todas as sessões.
+    """
+
+    def __init__(self, caminho_vetores=CAMINHO_VETORES, caminho_conhecimento=CAMINHO_CONHECIMENTO):
+        self.caminho_vetores = caminho_vetores
+        self.caminho_conhecimento = caminho_conhecimento
+        self._lock = threading.Lock()
+        self._armazenamento = None
+        self._atual = None
+        self._assinatura_arquivos = None
+        self.recarregar()
+
+    def _ler_assinatura_arquivos(self):
+        """Data de modificação dos artefatos: muda quando o treinamento os regrava."""
+        try:
+            return (os.path.getmtime(self.caminho_vetores), os.path.getmtime(self.caminho_conhecimento))
+        except OSError:
+            return None
+
+    def _abrir_armazenamento(self):
+        """Abre o arquivo de vetores, convertendo o .npy legado se ainda não houver um .jvec."""
+        if not os.path.exists(self.caminho_vetores) and os.path.exists(CAMINHO_VETORES_LEGADO):
+            print(f"Convertendo '{CAMINHO_VETORES_LEGADO}' para o formato '{self.caminho_vetores}'...")
+            converter_npy(CAMINHO_VETORES_LEGADO, self.caminho_vetores).fechar()
+        return ArmazenamentoVetores(self.caminho_vetores, modo="r+")
+
+    def _criar_indice(self):
+        escala = ESCALA_INT8 if self._armazenamento.tipo == "int8" else 1.0
+        return criar_indice(self._armazenamento.vetores(), pre_normalizados=True, escala=escala)
+
+    def recarregar(self):
+        """(Re)carrega os artefatos do disco e publica uma nova versão."""
+        with self._lock:
+            versao = self._atual.versao + 1 if self._atual else 1
+            try:
+                self._armazenamento = self._abrir_armazenamento()
+                conhecimento = joblib.load(self.caminho_conhecimento)
+                perguntas = tuple(conhecimento.get('perguntas', []))
+                respostas = tuple(tuple(r) for r in conhecimento.get('respostas', []))
+                self._atual = VersaoBase(versao, self._armazenamento.vetores(), perguntas, respostas,
+                                         self._criar_indice())
+                print(f"Base de conhecimento v{versao} carregada com {len(respostas)} respostas.")
+            except Exception as e:
+                print(f"Erro ao carregar arquivos de memória (.jvec, .joblib): {e}")
+                self._armazenamento = None
+                self._atual = None
+            self._assinatura_arquivos = self._ler_assinatura_arquivos()
+
+    def versao_atual(self):
+        """
+        Retorna a versão publicada mais recente (ou None se não houver base).
+        Se os arquivos foram regravados por um novo treinamento, recarrega antes.
+        """
+        if self._ler_assinatura_arquivos() != self._assinatura_arquivos:
+            self.recarregar()
+        return self._atual
+
+    def adicionar(self, pergunta, resposta, vetor):
+        """
+        Acrescenta um par pergunta/resposta curado e publica a nova versão para
+        todas as sessões. O vetor é anexado ao armazenamento em O(1) (sem np.vstack).
+        """
+        nova_resposta = ({'texto': resposta, 'tom': 'neutro'},)
+        vetor = np.atleast_2d(np.asarray(vetor, dtype=np.float32))
+        with self._lock:
+            atual = self._atual
+            if self._armazenamento is None:
+                self._armazenamento = ArmazenamentoVetores.criar(self.caminho_vetores, vetor.shape[1])
+            self._armazenamento.adicionar(vetor)
+
+            perguntas = (atual.perguntas if atual else ()) + (pergunta,)
+            respostas = (atual.respostas if atual else ()) + (nova_resposta,)
+            self._persistir_conhecimento(perguntas, respostas)
+
+            if atual is not None and atual.indice.tipo != "exato":
+                # O índice da versão atual continua em uso pelas sessões: a nova versão
+                # recebe um índice novo, sem alterar o antigo. O exato é só uma visão do memmap.
+                indice = atual.indice.com_vetores(vetor)
+            else:
+                indice = self._criar_indice()
+            self._atual = VersaoBase((atual.versao if atual else 0) + 1, self._armazenamento.vetores(),
+                                     perguntas, respostas, indice)
+            self._assinatura_arquivos = self._ler_assinatura_arquivos()
+            return self._atual
+
+    def _persistir_conhecimento(self, perguntas, respostas):
+        """Grava o .joblib em um arquivo temporário e o troca com os.replace."""
+        try:
+            tmp_conhecimento = f"{self.caminho_conhecimento}.tmp"
+            joblib.dump({'perguntas': list(perguntas), 'respostas': [list(r) for r in respostas]},
+                        tmp_conhecimento)
+            os.replace(tmp_conhecimento, self.caminho_conhecimento)
+        except Exception as e:
+            print(f"AVISO: Não foi possível persistir a base de conhecimento: {e}")
@@ -0,0 +1,121 @@
+# benchmark_criptografia.py - Compara o Fernet com o envelope AES-GCM (envelope_cripto.py) em históricos de chat
+
+import glob
+import io
+import json
+import os
+import time
+import zlib
+from dotenv import load_dotenv
+from cryptography.fernet import Fernet, InvalidToken
+from envelope_cripto import cifrar, decifrar, cifrar_fluxo, decifrar_fluxo, envelope_para_texto, FLAG_COMPRIMIDO
+
+load_dotenv()
+
+ARQUIVOS_HISTORICO = ["chats_historico_israel.json", "dados/chats_historico_*.json", "dados/chats_historico/*.json"]
+# Os históricos reais do repositório são pequenos: repetimos as mensagens para medir
+# também o tamanho de um usuário com meses de conversa.
+TAMANHOS_ALVO_BYTES = [0, 256 * 1024, 4 * 1024 * 1024]
+TEMPO_MINIMO_SEGUNDOS = 0.5
+
+
+def carregar_historicos(chave):
+    """Lê os históricos reais, decifrando com a chave geral os que estiverem criptografados."""
+    fernet = Fernet(chave.encode()) if chave else None
+    historicos = []
+    for padrao in ARQUIVOS_HISTORICO:
+        for caminho in sorted(glob.glob(padrao)):
+            with open(caminho, "r", encoding="utf-8") as f:
+                conteudo = f.read().strip()
+            try:
+                historicos.append(json.loads(conteudo))
+                continue
+            except json.JSONDecodeError:
+                pass
+            if fernet:
+                try:
+                    historicos.append(json.loads(fernet.decrypt(conteudo.encode())))
+                except (InvalidToken, json.JSONDecodeError):
+                    pass  # Cifrado com outra chave
+    return historicos
+
+
+def ampliar(historicos, tamanho_alvo):
+    """JSON no formato salvo pelo app, com mensagens repetidas até ~tamanho_alvo bytes."""
+    texto = json.dumps(historicos, ensure_ascii=False)
+    if len(texto) >= tamanho_alvo:
+        return texto
+    mensagens = [m for h in historicos if isinstance(h, dict) for chat in h.values()
+                 if isinstance(chat, dict) for m in chat.get("messages", [])]
+    mensagens = mensagens or [{"role": "user", "content": "Olá, Jarvis! Tudo bem?"}]
+    chat = {"title": "Chat longo", "messages": []}
+    while len(texto) < tamanho_alvo:
+        chat["messages"].extend(mensagens)
+        texto = json.dumps(historicos + [{"chat_longo": chat}], ensure_ascii=False)
+    return texto
+
+
+def medir(funcao):
+    """Repete `funcao` por pelo menos TEMPO_MINIMO_SEGUNDOS; retorna (resultado, segundos por chamada)."""
+    repeticoes, inicio = 0, time.perf_counter()
+    while True:
+        resultado = funcao()
+        repeticoes += 1
+        total = time.perf_counter() - inicio
+        if total >= TEMPO_MINIMO_SEGUNDOS:
+            return resultado, total / repeticoes
+
+
+def mb_por_segundo(n_bytes, segundos):
+    return n_bytes / (1024 * 1024) / segundos if segundos else float("inf")
+
+
+if __name__ == "__main__":
+    print(">> BENCHMARK DE CRIPTOGRAFIA (Fernet x envelope AES-GCM) <<")
+    chave = os.getenv("ENCRYPTION_KEY_GENERAL")
+    if not chave:
+        print("ENCRYPTION_KEY_GENERAL não definida: usando uma chave temporária (arquivos cifrados serão ignorados).")
+        chave = Fernet.generate_key().decode()
+    fernet = Fernet(chave.encode())
+
+    historicos = carregar_historicos(chave)
+    print(f"Históricos carregados: {len(historicos)}")
+
+    for tamanho_alvo in TAMANHOS_ALVO_BYTES:
+        dados = ampliar(historicos, tamanho_alvo).encode("utf-8")
+        n = len(dados)
+        print(f"\n- JSON de {n / 1024:.1f} KB")
+
+        token, t_cifrar = medir(lambda: fernet.encrypt(dados))
+        _, t_decifrar = medir(lambda: fernet.decrypt(token))
+        print(f"    Fernet:   cifrar {mb_por_segundo(n, t_cifrar):7.1f} MB/s | decifrar {mb_por_segundo(n, t_decifrar):7.1f} MB/s"
+              f" | tamanho {len(token) / n:.3f}x (texto)")
+
+        envelope, t_cifrar = medir(lambda: cifrar(dados, chave))
+        _, t_decifrar = medir(lambda: decifrar(envelope, chave))
+        texto, t_texto = medir(lambda: envelope_para_texto(cifrar(dados, chave)))
+        print(f"    Envelope: cifrar {mb_por_segundo(n, t_cifrar):7.1f} MB/s | decifrar {mb_por_segundo(n, t_decifrar):7.1f} MB/s"
+              f" | tamanho {len(envelope) / n:.3f}x (binário), {len(texto) / n:.3f}x (texto,"
+              f" cifrar {mb_por_segundo(n, t_texto):.1f} MB/s)")
+
+        # Como utils.encrypt_file_content_general grava: JSON compacto + zlib + envelope.
+        compacto = json.dumps(json.loads(dados), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        texto, t_cifrar = medir(lambda: envelope_para_texto(
+            cifrar(zlib.compress(compacto, 6), chave, flags=FLAG_COMPRIMIDO)))
+        print(f"    Compacto+zlib+envelope: cifrar {mb_por_segundo(n, t_cifrar):7.1f} MB/s"
+              f" | tamanho {len(texto) / n:.3f}x (texto)")
+
+    # Fluxo: arquivo grande cifrado e decifrado bloco a bloco, sem ter tudo em memória.
+    dados = ampliar(historicos, TAMANHOS_ALVO_BYTES[-1] * 4).encode("utf-8")
+    cifrado = io.BytesIO()
+    inicio = time.perf_counter()
+    cifrar_fluxo(io.BytesIO(dados), cifrado, chave)
+    t_cifrar = time.perf_counter() - inicio
+    cifrado.seek(0)
+    decifrado = io.BytesIO()
+    inicio = time.perf_counter()
+    decifrar_fluxo(cifrado, decifrado, chave)
+    t_decifrar = time.perf_counter() - inicio
+    assert decifrado.getvalue() == dados
+    print(f"\n- Fluxo em blocos ({len(dados) / (1024 * 1024):.1f} MB): cifrar {mb_por_segundo(len(dados), t_cifrar):.1f} MB/s"
+          f" | decifrar {mb_por_segundo(len(dados), t_decifrar):.1f} MB/s")
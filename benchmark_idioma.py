@@ -0,0 +1,87 @@
+# benchmark_idioma.py - Compara o detector de idioma local com a detecção via OpenAI
+
+import os
+import time
+from dotenv import load_dotenv
+from detector_idioma import identificar_idioma, detectar_idioma, LIMIAR_CONFIANCA
+
+load_dotenv()
+
+# Frases rotuladas no estilo das mensagens reais enviadas ao Jarvis.
+AMOSTRAS = [
+    ("Quem descobriu o Brasil?", "pt"),
+    ("Me dê ideias para um prompt de imagem", "pt"),
+    ("Qual a cotação do dólar hoje?", "pt"),
+    ("Crie uma lista de compras", "pt"),
+    ("Como está o tempo em Recife?", "pt"),
+    ("Resuma este documento para mim", "pt"),
+    ("obrigado", "pt"),
+    ("What time is it in Tokyo?", "en"),
+    ("Write me a poem about the sea", "en"),
+    ("Who won the game last night?", "en"),
+    ("Tell me a joke", "en"),
+    ("thanks", "en"),
+    ("¿Dónde está la biblioteca?", "es"),
+    ("Necesito ayuda con mi tarea de matemáticas", "es"),
+    ("¿Quién ganó el partido anoche?", "es"),
+    ("Cómo está el tiempo en Madrid?", "es"),
+    ("Où est la gare la plus proche ?", "fr"),
+    ("Je voudrais réserver une table pour deux", "fr"),
+    ("Qui a gagné le match hier soir ?", "fr"),
+    ("Wo ist der Bahnhof?", "de"),
+    ("Ich habe eine Frage zu meinem Vertrag", "de"),
+    ("Wer hat gestern das Spiel gewonnen?", "de"),
+    ("Dove si trova la stazione?", "it"),
+    ("Mi piace molto la pizza napoletana", "it"),
+    ("Chi ha vinto la partita ieri sera?", "it"),
+]
+
+REPETICOES_LOCAL = 200
+
+
+def detectar_idioma_openai(cliente, texto, modelo="gpt-5-nano"):
+    """Reproduz a chamada usada por `detectar_idioma_com_ia` em app.py."""
+    prompt = f"Qual o código de idioma ISO 639-1 (ex: 'en', 'pt', 'es') do seguinte texto? Responda APENAS com o código de duas letras.\n\nTexto: \"{texto}\""
+    resposta = cliente.chat.completions.create(
+        model=modelo,
+        messages=[{"role": "user", "content": prompt}],
+        max_completion_tokens=5,
+    )
+    idioma = resposta.choices[0].message.content.strip().lower()
+    return idioma if len(idioma) == 2 else 'pt'
+
+
+def medir(funcao, repeticoes=1):
+    """Executa `funcao` sobre todas as amostras e retorna (acertos, latência média em ms)."""
+    acertos = 0
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        acertos = sum(1 for texto, esperado in AMOSTRAS if funcao(texto) == esperado)
+    total = time.perf_counter() - inicio
+    return acertos, total / (repeticoes * len(AMOSTRAS)) * 1000
+
+
+if __name__ == "__main__":
+    print(">> BENCHMARK DE DETECÇÃO DE IDIOMA <<")
+    print(f"Amostras: {len(AMOSTRAS)} | Limiar de confiança local: {LIMIAR_CONFIANCA}")
+
+    acertos, ms = medir(lambda t: identificar_idioma(t)[0], REPETICOES_LOCAL)
+    print(f"- Local (somente n-gramas):  acurácia {acertos}/{len(AMOSTRAS)} | {ms * 1000:.1f} µs por texto")
+
+    ambiguos = [t for t, _ in AMOSTRAS if detectar_idioma(t, fallback=lambda _: None) is None]
+    print(f"- Textos que iriam para o plano B (IA): {len(ambiguos)}/{len(AMOSTRAS)}")
+    for texto in ambiguos:
+        print(f"    · {texto!r}")
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("- OpenAI: OPENAI_API_KEY não definida, comparação com a IA ignorada.")
+    else:
+        from openai import OpenAI
+        cliente = OpenAI(api_key=api_key)
+
+        acertos, ms = medir(lambda t: detectar_idioma_openai(cliente, t))
+        print(f"- OpenAI (caminho atual):    acurácia {acertos}/{len(AMOSTRAS)} | {ms:.1f} ms por texto")
+
+        acertos, ms = medir(lambda t: detectar_idioma(t, fallback=lambda x: detectar_idioma_openai(cliente, x)))
+        print(f"- Híbrido (local + plano B): acurácia {acertos}/{len(AMOSTRAS)} | {ms:.1f} ms por texto")
@@ -0,0 +1,150 @@
+# cache_respostas.py - Cache semântico de respostas da OpenAI, compartilhado entre usuários
+
+import os
+import time
+import threading
+import joblib
+import numpy as np
+
+# Arquivos do cache, salvos ao lado dos vetores da memória local (vetores_perguntas_v3.jvec)
+CAMINHO_VETORES_CACHE = "cache_respostas_vetores.npy"
+CAMINHO_DADOS_CACHE = "cache_respostas_dados.joblib"
+
+LIMIAR_SIMILARIDADE_CACHE = 0.95  # Similaridade de cosseno mínima para reaproveitar uma resposta
+TTL_CACHE_SEGUNDOS = 24 * 60 * 60  # Respostas expiram após 24h
+MAX_ENTRADAS_CACHE = 2000  # Acima disso, a entrada menos usada recentemente é descartada
+
+
+def _normalizar(vetores):
+    """Normaliza as linhas para norma 1, assim o produto escalar vira similaridade de cosseno."""
+    vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vetores / normas
+
+
+class CacheRespostasSemantico:
+    """
+    Cache de respostas indexado pelo embedding da pergunta.
+    Uma pergunta "quase igual" (similaridade >= limiar) a outra já respondida
+    no mesmo idioma e dentro do TTL devolve a resposta salva sem uma nova chamada
+    paga à API.
+    É seguro para uso por várias sessões ao mesmo tempo (protegido por lock).
+    """
+
+    def __init__(self, caminho_vetores=CAMINHO_VETORES_CACHE, caminho_dados=CAMINHO_DADOS_CACHE,
+                 limiar=LIMIAR_SIMILARIDADE_CACHE, ttl_segundos=TTL_CACHE_SEGUNDOS,
+                 max_entradas=MAX_ENTRADAS_CACHE):
+        self.caminho_vetores = caminho_vetores
+        self.caminho_dados = caminho_dados
+        self.limiar = limiar
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._vetores = None  # Matriz (n, d) já normalizada
+        self._entradas = []  # Lista de dicts alinhada com as linhas de _vetores
+        self._carregar()
+
+    def _carregar(self):
+        """Lê o cache do disco, se existir. Um cache corrompido é simplesmente descartado."""
+        try:
+            if os.path.exists(self.caminho_vetores) and os.path.exists(self.caminho_dados):
+                vetores = np.load(self.caminho_vetores)
+                entradas = joblib.load(self.caminho_dados)
+                if entradas and len(entradas) == len(vetores):
+                    self._vetores, self._entradas = vetores, entradas
+                    self._remover_expiradas()
+        except Exception as e:
+            print(f"AVISO: Não foi possível carregar o cache de respostas: {e}")
+            self._vetores, self._entradas = None, []
+
+    def _salvar(self):
+        """Grava o cache de forma atômica (arquivo temporário + os.replace)."""
+        try:
+            tmp_vetores = f"{self.caminho_vetores}.tmp.npy"
+            tmp_dados = f"{self.caminho_dados}.tmp"
+            vetores = self._vetores if self._vetores is not None else np.zeros((0, 0), dtype=np.float32)
+            np.save(tmp_vetores, vetores)
+            joblib.dump(self._entradas, tmp_dados)
+            os.replace(tmp_vetores, self.caminho_vetores)
+            os.replace(tmp_dados, self.caminho_dados)
+        except Exception as e:
+            print(f"AVISO: Não foi possível salvar o cache de respostas: {e}")
+
+    def _manter_indices(self, indices):
+        self._entradas = [self._entradas[i] for i in indices]
+        self._vetores = self._vetores[indices] if len(indices) else None
+
+    def _remover_expiradas(self):
+        agora = time.time()
+        validos = [i for i, e in enumerate(self._entradas) if agora - e["criado_em"] < self.ttl_segundos]
+        if len(validos) != len(self._entradas):
+            self._manter_indices(validos)
+
+    def _scores_do_idioma(self, vetor, idioma):
+        """Similaridade com cada entrada; entradas de outro idioma nunca são escolhidas."""
+        scores = self._vetores @ vetor
+        scores[[e.get("idioma") != idioma for e in self._entradas]] = -np.inf
+        return scores
+
+    def buscar(self, vetor_pergunta, idioma):
+        """
+        Procura uma resposta salva, no idioma dado, para uma pergunta semanticamente
+        equivalente. Retorna (texto, similaridade) ou (None, melhor_similaridade).
+        """
+        vetor = _normalizar(vetor_pergunta)[0]
+        with self._lock:
+            if self._vetores is None or not self._entradas:
+                return None, 0.0
+            scores = self._scores_do_idioma(vetor, idioma)
+            indice = int(np.argmax(scores))
+            score = float(scores[indice])
+            entrada = self._entradas[indice]
+            if score < self.limiar:
+                return None, max(score, 0.0)
+            if time.time() - entrada["criado_em"] >= self.ttl_segundos:
+                self._remover_expiradas()
+                return None, score
+            entrada["ultimo_acesso"] = time.time()
+            entrada["acertos"] = entrada.get("acertos", 0) + 1
+            return entrada["texto"], score
+
+    def armazenar(self, vetor_pergunta, pergunta, texto, idioma):
+        """Adiciona uma resposta (no idioma dado) ao cache, aplicando TTL e descarte LRU, e persiste em disco."""
+        if not texto or not texto.strip():
+            return
+        vetor = _normalizar(vetor_pergunta)
+        agora = time.time()
+        with self._lock:
+            self._remover_expiradas()
+            if self._vetores is not None and self._entradas:
+                scores = self._scores_do_idioma(vetor[0], idioma)
+                indice = int(np.argmax(scores))
+                if scores[indice] >= self.limiar:
+                    # Já existe uma pergunta equivalente: apenas renova a resposta.
+                    self._entradas[indice].update(
+                        {"texto": texto, "criado_em": agora, "ultimo_acesso": agora})
+                    self._salvar()
+                    return
+
+            self._entradas.append({
+                "pergunta": pergunta, "texto": texto, "idioma": idioma,
+                "criado_em": agora, "ultimo_acesso": agora, "acertos": 0
+            })
+            self._vetores = vetor if self._vetores is None else np.vstack([self._vetores, vetor])
+
+            if len(self._entradas) > self.max_entradas:
+                # LRU: mantém as entradas acessadas mais recentemente.
+                ordem = sorted(range(len(self._entradas)),
+                               key=lambda i: self._entradas[i]["ultimo_acesso"], reverse=True)
+                self._manter_indices(sorted(ordem[:self.max_entradas]))
+            self._salvar()
+
+    def limpar(self):
+        """Esvazia o cache (memória e disco)."""
+        with self._lock:
+            self._vetores, self._entradas = None, []
+            self._salvar()
+
+    def __len__(self):
+        return len(self._entradas)
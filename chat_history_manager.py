@@ -1,27 +1,27 @@
 # chat_history_manager.py
 
 import json
-import os
-from pathlib import Path
-from utils import encrypt_string_users, decrypt_string_users, fernet_users
+from armazenamento import obter_armazenamento_local
+from utils import encrypt_string_users, decrypt_string_users, hmac_string_users, fernet_users, serializar_json
 
 # Define a pasta raiz onde os dados são armazenados
 DATA_FOLDER = "dados"
 # Define a nova subpasta para os históricos de chat
 CHAT_HISTORY_SUBFOLDER = "chats_historico"
-# Constrói o caminho completo para a pasta de históricos de chat
-CHAT_HISTORY_FOLDER_PATH = Path(DATA_FOLDER) / CHAT_HISTORY_SUBFOLDER
+# Constrói o prefixo (chave no armazenamento) da pasta de históricos de chat
+CHAT_HISTORY_FOLDER_PATH = f"{DATA_FOLDER}/{CHAT_HISTORY_SUBFOLDER}"
 
 def _get_chat_file_path(username_plain):
     """
-    Retorna o caminho completo do arquivo de histórico de chat para um usuário.
-    O nome do arquivo é o nome de usuário criptografado.
+    Retorna a chave (caminho) do arquivo de histórico de chat de um usuário no armazenamento.
+    O nome do arquivo é o HMAC do nome de usuário: não revela o nome e é sempre o mesmo,
+    então carregar e salvar apontam para o mesmo arquivo.
+    Arquivos antigos (nome criptografado com Fernet) são juntados por migrar_historicos_chat.py.
     """
     if fernet_users is None:
         raise ValueError("A chave Fernet para usuários não está inicializada. Verifique ENCRYPTION_KEY_USERS no seu .env e utils.py.")
     
-    encrypted_username = encrypt_string_users(username_plain)
-    return CHAT_HISTORY_FOLDER_PATH / f"{encrypted_username}.json"
+    return f"{CHAT_HISTORY_FOLDER_PATH}/{hmac_string_users(username_plain)}.json"
 
 def carregar_historico_chat(username_plain):
     """
@@ -29,22 +29,21 @@ def carregar_historico_chat(username_plain):
     Retorna uma lista de mensagens.
     """
     file_path = _get_chat_file_path(username_plain)
-    
-    if not file_path.exists():
+    encrypted_content = obter_armazenamento_local().get(file_path)
+
+    if encrypted_content is None:
         return [] # Retorna uma lista vazia se o arquivo não existir
 
     if fernet_users is None:
         raise ValueError("A chave Fernet para usuários não está inicializada. Não é possível descriptografar o histórico de chat.")
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            encrypted_content = f.read()
-            if not encrypted_content: # Arquivo vazio
-                return []
-            
-            # O conteúdo do arquivo é uma única string JSON criptografada
-            decrypted_json_str = decrypt_string_users(encrypted_content)
-            return json.loads(decrypted_json_str)
+        if not encrypted_content: # Arquivo vazio
+            return []
+
+        # O conteúdo do arquivo é uma única string JSON criptografada
+        decrypted_json_str = decrypt_string_users(encrypted_content)
+        return json.loads(decrypted_json_str)
     except Exception as e:
         print(f"ERRO ao carregar histórico de chat para {username_plain} de {file_path}: {e}")
         # Em caso de erro (ex: arquivo corrompido ou não criptografado corretamente), retorna vazio
@@ -55,9 +54,6 @@ def salvar_historico_chat(username_plain, chat_history):
     Salva o histórico de chat de um usuário específico.
     Espera uma lista de mensagens.
     """
-    # Garante que a pasta existe antes de salvar
-    CHAT_HISTORY_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
-    
     file_path = _get_chat_file_path(username_plain)
 
     if fernet_users is None:
@@ -65,35 +61,32 @@ def salvar_historico_chat(username_plain, chat_history):
 
     try:
         # Converte a lista de mensagens para uma string JSON
-        json_str = json.dumps(chat_history, ensure_ascii=False, indent=4)
+        json_str = serializar_json(chat_history)
         # Criptografa a string JSON completa
         encrypted_content = encrypt_string_users(json_str)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(encrypted_content)
+        obter_armazenamento_local().put(file_path, encrypted_content, "Atualiza histórico de chat")
         # print(f"Histórico de chat para {username_plain} salvo em {file_path}")
     except Exception as e:
         print(f"ERRO ao salvar histórico de chat para {username_plain} em {file_path}: {e}")
 
 def get_all_chat_history_files():
     """
-    Retorna uma lista de todos os caminhos de arquivo de histórico de chat criptografados.
+    Retorna uma lista de todas as chaves (caminhos) de histórico de chat criptografados.
     """
-    if not CHAT_HISTORY_FOLDER_PATH.exists():
-        return []
-    return list(CHAT_HISTORY_FOLDER_PATH.glob("*.json"))
+    return [chave for chave in obter_armazenamento_local().list(f"{CHAT_HISTORY_FOLDER_PATH}/")
+            if chave.endswith(".json")]
 
 def delete_chat_history(username_plain):
     """
     Deleta o arquivo de histórico de chat de um usuário específico.
     """
     file_path = _get_chat_file_path(username_plain)
-    if file_path.exists():
-        try:
-            os.remove(file_path)
+    armazenamento = obter_armazenamento_local()
+    if armazenamento.get(file_path) is not None:
+        if armazenamento.delete(file_path, "Exclui histórico de chat"):
             print(f"Histórico de chat para {username_plain} deletado.")
             return True
-        except Exception as e:
-            print(f"ERRO ao deletar histórico de chat para {username_plain}: {e}")
-            return False
+        print(f"ERRO ao deletar histórico de chat para {username_plain}.")
+        return False
     return False
\ No newline at end of file
@@ -0,0 +1,231 @@
+# detector_idioma.py - Identificação de idioma local (offline) por n-gramas de caracteres
+
+import math
+import re
+import unicodedata
+from collections import Counter
+
+# Idiomas suportados: os mesmos oferecidos em "Idioma da Fala" na barra lateral.
+IDIOMAS_SUPORTADOS = ('pt', 'en', 'es', 'fr', 'de', 'it')
+
+# Abaixo desta confiança (0 a 1) o resultado é considerado ambíguo e vai para o plano B (IA).
+LIMIAR_CONFIANCA = 0.55
+
+TAMANHOS_NGRAMA = (1, 2, 3)
+MAX_NGRAMAS_POR_PERFIL = 3000
+
+# Pequenos textos de referência usados para montar o perfil de cada idioma.
+# Privilegiam palavras funcionais e construções comuns em conversas com o Jarvis.
+_TEXTOS_REFERENCIA = {
+    'pt': """
+        Olá, tudo bem com você? Eu estou muito bem, obrigado por perguntar.
+        Você pode me ajudar a entender como isso funciona? Não sei o que fazer agora.
+        Qual é a previsão do tempo para amanhã em São Paulo e no Recife?
+        Eu gostaria de saber mais sobre a história do Brasil e da sua independência.
+        Quais são as notícias de hoje? Me explique de uma forma simples, por favor.
+        Ontem à noite nós fomos ao cinema, mas o filme não era tão bom quanto pensávamos.
+        Preciso de uma lista de compras para a semana: pão, leite, feijão, arroz e café.
+        Como faço para criar uma função em Python que lê um arquivo e conta as palavras?
+        Estou me sentindo cansado e preocupado com o trabalho, você tem alguma sugestão?
+        Isso não é possível, então vamos tentar de novo mais tarde. Muito obrigado pela ajuda.
+        Também quero aprender programação, matemática e inglês neste ano, são meus objetivos.
+        """,
+    'en': """
+        Hello, how are you doing today? I am fine, thank you for asking.
+        Can you help me understand how this works? I don't know what to do now.
+        What is the weather forecast for tomorrow in New York and in London?
+        I would like to know more about the history of the United States and its independence.
+        What are the latest news today? Please explain it to me in a simple way.
+        Last night we went to the movies, but the film was not as good as we thought.
+        I need a shopping list for the week: bread, milk, beans, rice and coffee.
+        How do I write a function in Python that reads a file and counts the words?
+        I am feeling tired and worried about work, do you have any suggestions for me?
+        That is not possible, so let's try again later. Thank you very much for the help.
+        I also want to learn programming, mathematics and Spanish this year, those are my goals.
+        """,
+    'es': """
+        Hola, ¿cómo estás hoy? Yo estoy muy bien, gracias por preguntar.
+        ¿Puedes ayudarme a entender cómo funciona esto? No sé qué hacer ahora.
+        ¿Cuál es el pronóstico del tiempo para mañana en Madrid y en Buenos Aires?
+        Me gustaría saber más sobre la historia de España y de su independencia.
+        ¿Cuáles son las noticias de hoy? Explícamelo de una forma sencilla, por favor.
+        Anoche nosotros fuimos al cine, pero la película no era tan buena como pensábamos.
+        Necesito una lista de compras para la semana: pan, leche, frijoles, arroz y café.
+        ¿Cómo hago para crear una función en Python que lee un archivo y cuenta las palabras?
+        Me siento cansado y preocupado por el trabajo, ¿tienes alguna sugerencia para mí?
+        Eso no es posible, entonces vamos a intentarlo de nuevo más tarde. Muchas gracias por la ayuda.
+        También quiero aprender programación, matemáticas e inglés este año, son mis objetivos.
+        """,
+    'fr': """
+        Bonjour, comment ça va aujourd'hui ? Je vais très bien, merci de demander.
+        Peux-tu m'aider à comprendre comment cela fonctionne ? Je ne sais pas quoi faire maintenant.
+        Quelle est la météo prévue pour demain à Paris et à Montréal ?
+        J'aimerais en savoir plus sur l'histoire de la France et de la révolution.
+        Quelles sont les nouvelles d'aujourd'hui ? Explique-le moi de façon simple, s'il te plaît.
+        Hier soir nous sommes allés au cinéma, mais le film n'était pas aussi bon que nous pensions.
+        J'ai besoin d'une liste de courses pour la semaine : pain, lait, haricots, riz et café.
+        Comment est-ce que je crée une fonction en Python qui lit un fichier et compte les mots ?
+        Je me sens fatigué et inquiet à cause du travail, est-ce que tu as une suggestion pour moi ?
+        Ce n'est pas possible, alors nous allons essayer encore plus tard. Merci beaucoup pour l'aide.
+        Je veux aussi apprendre la programmation, les mathématiques et l'anglais cette année.
+        """,
+    'de': """
+        Hallo, wie geht es dir heute? Mir geht es sehr gut, danke der Nachfrage.
+        Kannst du mir helfen zu verstehen, wie das funktioniert? Ich weiß nicht, was ich jetzt tun soll.
+        Wie ist die Wettervorhersage für morgen in Berlin und in München?
+        Ich möchte mehr über die Geschichte Deutschlands und die Wiedervereinigung wissen.
+        Was sind die Nachrichten von heute? Bitte erkläre es mir auf eine einfache Weise.
+        Gestern Abend sind wir ins Kino gegangen, aber der Film war nicht so gut, wie wir dachten.
+        Ich brauche eine Einkaufsliste für die Woche: Brot, Milch, Bohnen, Reis und Kaffee.
+        Wie schreibe ich eine Funktion in Python, die eine Datei liest und die Wörter zählt?
+        Ich fühle mich müde und mache mir Sorgen wegen der Arbeit, hast du einen Vorschlag für mich?
+        Das ist nicht möglich, also versuchen wir es später noch einmal. Vielen Dank für die Hilfe.
+        Ich will dieses Jahr auch Programmieren, Mathematik und Englisch lernen, das sind meine Ziele.
+        """,
+    'it': """
+        Ciao, come stai oggi? Io sto molto bene, grazie per avermelo chiesto.
+        Puoi aiutarmi a capire come funziona questo? Non so cosa fare adesso.
+        Qual è la previsione del tempo per domani a Roma e a Milano?
+        Vorrei sapere di più sulla storia dell'Italia e della sua unificazione.
+        Quali sono le notizie di oggi? Spiegamelo in modo semplice, per favore.
+        Ieri sera siamo andati al cinema, ma il film non era così bello come pensavamo.
+        Ho bisogno di una lista della spesa per la settimana: pane, latte, fagioli, riso e caffè.
+        Come faccio a creare una funzione in Python che legge un file e conta le parole?
+        Mi sento stanco e preoccupato per il lavoro, hai qualche suggerimento per me?
+        Questo non è possibile, quindi proviamo di nuovo più tardi. Grazie mille per l'aiuto.
+        Voglio anche imparare la programmazione, la matematica e l'inglese quest'anno, sono i miei obiettivi.
+        """,
+}
+
+
+# Palavras funcionais mais frequentes de cada idioma. Entram no perfil como
+# atributos de palavra inteira, o que ajuda bastante em textos curtos.
+_PALAVRAS_FREQUENTES = {
+    'pt': "o a os as um uma de do da dos das em no na nos nas por para com que não é e ou mas se "
+          "eu você ele ela nós eles elas meu minha seu sua isso isto esse essa aqui ali onde quando "
+          "como qual quais quem porque muito mais também já ainda sim oi olá obrigado obrigada tchau "
+          "está estou são ser ter tem fazer pode quero preciso hoje amanhã ontem bom boa dia noite",
+    'en': "the a an of to in on at for with from by and or but if not is are was were be been "
+          "i you he she we they my your his her our their this that these those here there where "
+          "when how what which who why very more also already still yes no hi hello thanks thank "
+          "bye do does did can could will would should have has had me tell give make today tomorrow",
+    'es': "el la los las un una unos unas de del al en por para con que no es y o pero si "
+          "yo tú usted él ella nosotros ellos mi tu su esto eso este esta aquí allí donde cuando "
+          "cómo cuál quién porque muy más también ya todavía sí hola gracias adiós está estoy son "
+          "ser tener tiene hacer puede quiero necesito hoy mañana ayer bueno buena día noche",
+    'fr': "le la les un une des de du au aux en dans par pour avec que qui ne pas est et ou mais si "
+          "je tu il elle nous vous ils elles mon ma mes ton ta son sa ce cette ces ici où quand "
+          "comment quel quelle pourquoi très plus aussi déjà encore oui non bonjour salut merci "
+          "être avoir fait peut veux besoin aujourd'hui demain hier bon bonne jour nuit c'est",
+    'de': "der die das ein eine einen dem den des von zu in im am auf für mit aus bei und oder aber "
+          "wenn nicht ist sind war ich du er sie wir ihr mein dein sein unser dies hier dort wo wann "
+          "wie was welche wer warum sehr mehr auch schon noch ja nein hallo danke tschüss haben hat "
+          "machen kann will brauche heute morgen gestern gut guten tag nacht",
+    'it': "il lo la i gli le un uno una di del della dei delle in nel nella per con che non è e o ma se "
+          "io tu lui lei noi voi loro mio mia tuo tua suo sua questo questa qui lì dove quando "
+          "come quale chi perché molto più anche già ancora sì ciao grazie arrivederci sono sei "
+          "essere avere ha fare può voglio bisogno oggi domani ieri buono buona giorno notte",
+}
+PESO_PALAVRAS_FREQUENTES = 3
+
+
+def _normalizar_texto(texto):
+    """Coloca em minúsculas e troca tudo que não for letra por um único espaço."""
+    texto = unicodedata.normalize('NFC', texto.lower())
+    texto = re.sub(r"[^\w']+|[\d_]+", ' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    return f" {texto} "
+
+
+def _extrair_ngramas(texto):
+    """Conta os n-gramas de caracteres (tamanhos em TAMANHOS_NGRAMA) do texto normalizado."""
+    texto = _normalizar_texto(texto)
+    contagem = Counter()
+    for n in TAMANHOS_NGRAMA:
+        for i in range(len(texto) - n + 1):
+            ngrama = texto[i:i + n]
+            if ngrama.strip():
+                contagem[ngrama] += 1
+    # Palavras inteiras também viram atributos (prefixo "#" para não colidir com n-gramas).
+    for palavra in texto.split():
+        contagem[f"#{palavra}"] += 1
+    return contagem
+
+
+def _construir_perfis():
+    """
+    Monta, uma única vez, o perfil de log-probabilidades de n-gramas de cada idioma
+    (Naive Bayes com suavização de Laplace).
+    """
+    perfis = {}
+    for idioma, texto in _TEXTOS_REFERENCIA.items():
+        contagem = Counter(dict(_extrair_ngramas(texto).most_common(MAX_NGRAMAS_POR_PERFIL)))
+        for palavra in _PALAVRAS_FREQUENTES[idioma].split():
+            contagem[f"#{palavra}"] += PESO_PALAVRAS_FREQUENTES
+        total = sum(contagem.values())
+        vocabulario = len(contagem) + 1
+        perfis[idioma] = (
+            {ng: math.log((c + 1) / (total + vocabulario)) for ng, c in contagem.items()},
+            math.log(1 / (total + vocabulario)),  # Log-probabilidade de um n-grama desconhecido
+        )
+    return perfis
+
+
+_PERFIS = _construir_perfis()
+
+
+def pontuar_idiomas(texto):
+    """
+    Retorna um dicionário {idioma: probabilidade} normalizado (soma 1) para o texto.
+    Retorna um dicionário vazio se o texto não tiver nenhuma letra.
+    """
+    ngramas = _extrair_ngramas(texto)
+    if not ngramas:
+        return {}
+
+    log_scores = {}
+    for idioma, (log_probs, log_desconhecido) in _PERFIS.items():
+        log_scores[idioma] = sum(
+            log_probs.get(ng, log_desconhecido) * c for ng, c in ngramas.items())
+
+    # Softmax estável. As log-verossimilhanças são divididas pelo número de n-gramas
+    # para que a confiança não sature em 1.0 só porque o texto é longo.
+    total_ngramas = sum(ngramas.values())
+    maximo = max(log_scores.values())
+    exps = {i: math.exp((s - maximo) / math.sqrt(total_ngramas)) for i, s in log_scores.items()}
+    soma = sum(exps.values())
+    return {i: v / soma for i, v in exps.items()}
+
+
+def identificar_idioma(texto):
+    """
+    Identifica localmente o idioma do texto.
+    Retorna uma tupla (codigo_iso, confianca), ex: ('pt', 0.91).
+    Para textos vazios ou sem letras, retorna ('pt', 0.0).
+    """
+    scores = pontuar_idiomas(texto or "")
+    if not scores:
+        return 'pt', 0.0
+    idioma = max(scores, key=scores.get)
+    return idioma, scores[idioma]
+
+
+def detectar_idioma(texto, fallback=None, limiar=LIMIAR_CONFIANCA):
+    """
+    Detecta o idioma do texto em microssegundos, sem chamadas de rede.
+    Só recorre a `fallback(texto)` (ex: detectar_idioma_com_ia) quando a confiança
+    fica abaixo do limiar, qualquer que seja o tamanho do texto.
+    """
+    if not texto or not texto.strip():
+        return 'pt'
+
+    idioma, confianca = identificar_idioma(texto)
+    if confianca >= limiar:
+        return idioma
+
+    if fallback is not None:
+        try:
+            return fallback(texto)
+        except Exception as e:
+            print(f"Erro no plano B de detecção de idioma: {e}")
+    return idioma
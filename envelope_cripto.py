@@ -0,0 +1,153 @@
+# envelope_cripto.py - Envelope de criptografia versionado (AES-256-GCM em blocos), sucessor do Fernet
+
+import base64
+import io
+import os
+import struct
+from functools import lru_cache
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Layout binário do envelope:
+#   cabeçalho: assinatura "JENV" | versão (1 byte) | algoritmo (1 byte) | flags (1 byte)
+#              | tamanho do bloco (4 bytes) | prefixo do nonce (8 bytes aleatórios)
+#   blocos:    [tamanho do bloco cifrado (4 bytes)][texto cifrado + tag GCM de 16 bytes] ...
+# Cada bloco usa o nonce prefixo + índice e autentica (como AAD) o cabeçalho, o índice e se é o
+# último bloco: blocos não podem ser reordenados, trocados entre arquivos nem truncados.
+# Blobs Fernet antigos ("gAAAAA...") não têm essa assinatura e continuam legíveis em utils.py.
+ASSINATURA = b"JENV"
+VERSAO_ENVELOPE = 1
+ALGORITMO_AES_256_GCM = 1
+_FORMATO_CABECALHO = ">4sBBBI8s"
+TAMANHO_CABECALHO = struct.calcsize(_FORMATO_CABECALHO)
+TAMANHO_TAG = 16
+TAMANHO_BLOCO = 64 * 1024  # Texto claro por bloco: a memória usada não depende do tamanho do chat
+
+FLAG_COMPRIMIDO = 0x01  # Texto claro comprimido com zlib antes de cifrar (ver utils.py)
+
+# Forma texto, para armazenamentos que só guardam texto (API de contents, logs por linha).
+PREFIXO_TEXTO = "JENV1:"
+
+
+@lru_cache(maxsize=8)
+def _obter_aead(chave_fernet):
+    """
+    Deriva (HKDF-SHA256) uma chave AES-256 da chave Fernet configurada e guarda o objeto
+    AESGCM pronto: a derivação e a preparação da chave acontecem uma vez por processo.
+    """
+    material = base64.urlsafe_b64decode(chave_fernet)
+    chave = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                 info=b"jarvis-envelope-v1").derive(material)
+    return AESGCM(chave)
+
+
+def _aad(cabecalho, indice, ultimo):
+    return cabecalho + struct.pack(">IB", indice, 1 if ultimo else 0)
+
+
+def _nonce(prefixo, indice):
+    return prefixo + struct.pack(">I", indice)
+
+
+def cifrar_fluxo(entrada, saida, chave_fernet, flags=0, tamanho_bloco=TAMANHO_BLOCO):
+    """Cifra tudo o que for lido de `entrada` (arquivo binário) e escreve o envelope em `saida`."""
+    aead = _obter_aead(chave_fernet)
+    prefixo = _gerar_prefixo_nonce()
+    cabecalho = struct.pack(_FORMATO_CABECALHO, ASSINATURA, VERSAO_ENVELOPE, ALGORITMO_AES_256_GCM,
+                            flags, tamanho_bloco, prefixo)
+    saida.write(cabecalho)
+
+    indice = 0
+    bloco = entrada.read(tamanho_bloco)
+    while True:
+        proximo = entrada.read(tamanho_bloco) if len(bloco) == tamanho_bloco else b""
+        ultimo = not proximo
+        cifrado = aead.encrypt(_nonce(prefixo, indice), bloco, _aad(cabecalho, indice, ultimo))
+        saida.write(struct.pack(">I", len(cifrado)))
+        saida.write(cifrado)
+        if ultimo:
+            return
+        bloco, indice = proximo, indice + 1
+
+
+def decifrar_fluxo(entrada, saida, chave_fernet):
+    """
+    Lê um envelope de `entrada` e escreve o texto claro em `saida`, bloco a bloco.
+    Levanta ValueError se o envelope estiver corrompido, truncado ou a chave for outra.
+    Retorna as flags do cabeçalho.
+    """
+    cabecalho = entrada.read(TAMANHO_CABECALHO)
+    if len(cabecalho) < TAMANHO_CABECALHO:
+        raise ValueError("Envelope truncado (cabeçalho incompleto).")
+    assinatura, versao, algoritmo, flags, tamanho_bloco, prefixo = struct.unpack(_FORMATO_CABECALHO, cabecalho)
+    if assinatura != ASSINATURA:
+        raise ValueError("Conteúdo não é um envelope de criptografia.")
+    if versao != VERSAO_ENVELOPE or algoritmo != ALGORITMO_AES_256_GCM:
+        raise ValueError(f"Envelope versão {versao} / algoritmo {algoritmo} não suportado.")
+    aead = _obter_aead(chave_fernet)
+
+    def ler_bloco():
+        tamanho = entrada.read(4)
+        if not tamanho:
+            return None
+        if len(tamanho) < 4:
+            raise ValueError("Envelope truncado.")
+        (n,) = struct.unpack(">I", tamanho)
+        if n < TAMANHO_TAG or n > tamanho_bloco + TAMANHO_TAG:
+            raise ValueError("Envelope corrompido (tamanho de bloco inválido).")
+        dados = entrada.read(n)
+        if len(dados) < n:
+            raise ValueError("Envelope truncado.")
+        return dados
+
+    indice, atual = 0, ler_bloco()
+    if atual is None:
+        raise ValueError("Envelope truncado (sem blocos).")
+    while atual is not None:
+        proximo = ler_bloco()  # Olha adiante para saber se `atual` é o último bloco
+        try:
+            saida.write(aead.decrypt(_nonce(prefixo, indice), atual, _aad(cabecalho, indice, proximo is None)))
+        except InvalidTag:
+            raise ValueError("Envelope corrompido, truncado ou cifrado com outra chave.") from None
+        atual, indice = proximo, indice + 1
+    return flags
+
+
+def cifrar(dados, chave_fernet, flags=0):
+    """Cifra bytes e retorna o envelope binário."""
+    saida = io.BytesIO()
+    cifrar_fluxo(io.BytesIO(dados), saida, chave_fernet, flags=flags)
+    return saida.getvalue()
+
+
+def decifrar(envelope, chave_fernet):
+    """Decifra um envelope binário; retorna (bytes, flags)."""
+    saida = io.BytesIO()
+    flags = decifrar_fluxo(io.BytesIO(envelope), saida, chave_fernet)
+    return saida.getvalue(), flags
+
+
+def eh_envelope(dado):
+    """True se `dado` (bytes do envelope ou sua forma texto) está no formato novo."""
+    if isinstance(dado, (bytes, bytearray)):
+        return bytes(dado[:len(ASSINATURA)]) == ASSINATURA
+    return isinstance(dado, str) and dado.startswith(PREFIXO_TEXTO)
+
+
+def envelope_para_texto(envelope_bytes):
+    """Forma texto (prefixo + base64, numa única linha) de um envelope binário."""
+    return PREFIXO_TEXTO + base64.b64encode(envelope_bytes).decode("ascii")
+
+
+def envelope_de_texto(texto):
+    """Envelope binário a partir da forma texto."""
+    if not texto.startswith(PREFIXO_TEXTO):
+        raise ValueError("Texto não está no formato de envelope.")
+    return base64.b64decode(texto[len(PREFIXO_TEXTO):])
+
+
+def _gerar_prefixo_nonce():
+    # 8 bytes aleatórios por envelope + contador de 4 bytes por bloco = nonce GCM de 96 bits.
+    return os.urandom(8)
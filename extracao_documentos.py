@@ -0,0 +1,164 @@
+# extracao_documentos.py - Extração de texto dos arquivos anexados, em paralelo (processos) e por páginas
+
+import io
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Tudo aqui recebe (nome, bytes) ou caminhos de arquivo, e não objetos do Streamlit:
+# as funções rodam em outros processos.
+EXTENSOES_CODIGO = (
+    '.py', '.js', '.ts', '.html', '.htm', '.css', '.php', '.java', '.kt',
+    '.c', '.cpp', '.h', '.cs', '.rb', '.go', '.swift', '.sql', '.json',
+    '.xml', '.yaml', '.yml', '.md', '.sh', '.bat', '.ps1', '.R', '.pl', '.lua'
+)
+PAGINAS_POR_TAREFA = 25  # PDFs maiores que isso são divididos em faixas de páginas entre os processos
+LIMITE_BYTES_SEM_PROCESSOS = 512 * 1024  # Total de bytes abaixo do qual iniciar processos custa mais que extrair
+MAXIMO_PROCESSOS = min(4, os.cpu_count() or 1)
+# "spawn": os processos não herdam (por fork) as threads e o estado do servidor do Streamlit.
+CONTEXTO_PROCESSOS = "spawn"
+
+
+def _abrir_pdf(origem):
+    """Abre um PDF a partir dos bytes ou do caminho de um arquivo."""
+    import fitz  # PyMuPDF
+    return fitz.open(origem) if isinstance(origem, str) else fitz.open(stream=origem, filetype="pdf")
+
+
+def paginas_pdf(origem, inicio=0, fim=None):
+    """Gera o texto de cada página do PDF (bytes ou caminho) no intervalo [inicio, fim), uma de cada vez."""
+    with _abrir_pdf(origem) as doc:
+        for numero in range(inicio, doc.page_count if fim is None else min(fim, doc.page_count)):
+            yield doc.load_page(numero).get_text()
+
+
+def extrair_faixa_pdf(origem, inicio, fim):
+    """Texto das páginas [inicio, fim) do PDF (tarefa de um processo)."""
+    return "".join(paginas_pdf(origem, inicio, fim))
+
+
+def extrair_texto(nome_arquivo, dados):
+    """Extrai o texto de arquivos PDF, DOCX, TXT, Excel, e várias linguagens de programação e scripts de banco de dados."""
+    if nome_arquivo.endswith(('.xlsx', '.xls')):
+        try:
+            import pandas as pd
+            return pd.read_excel(io.BytesIO(dados), engine='openpyxl').to_csv(index=False)
+        except Exception as e:
+            return f"Erro ao ler o arquivo Excel: {e}"
+    elif nome_arquivo.endswith(".pdf"):
+        return "".join(paginas_pdf(dados))
+    elif nome_arquivo.endswith(".docx"):
+        import docx
+        return "\n".join(p.text for p in docx.Document(io.BytesIO(dados)).paragraphs)
+    elif nome_arquivo.endswith(".txt"):
+        return dados.decode("utf-8")
+    elif nome_arquivo.endswith(EXTENSOES_CODIGO):
+        try:
+            # Tenta UTF-8 primeiro, que é o mais comum para código
+            return dados.decode("utf-8")
+        except UnicodeDecodeError:
+            return dados.decode("latin-1")
+    return "Formato de arquivo não suportado."
+
+
+def _extrair_arquivo(nome, caminho):
+    """
+    Primeira tarefa de cada arquivo, lido do disco pelo próprio processo.
+    Retorna (texto, paginas): num PDF com mais de PAGINAS_POR_TAREFA páginas, `texto` é só
+    a primeira faixa e `paginas` o total, para que as demais faixas sejam distribuídas.
+    """
+    if nome.endswith(".pdf"):
+        with _abrir_pdf(caminho) as doc:
+            paginas = doc.page_count
+            texto = "".join(doc.load_page(n).get_text() for n in range(min(paginas, PAGINAS_POR_TAREFA)))
+        return texto, paginas
+    with open(caminho, "rb") as f:
+        return extrair_texto(nome, f.read()), 0
+
+
+def _contar_paginas_pdf(dados):
+    """Número de páginas de um PDF (só lê a estrutura do arquivo); 0 se ele não abrir."""
+    try:
+        with _abrir_pdf(dados) as doc:
+            return doc.page_count
+    except Exception:
+        return 0
+
+
+def _extrair_no_processo_atual(arquivos):
+    """
+    Diz se vale extrair sem pool de processos: o total de bytes é pequeno e os PDFs, somados,
+    não passam de uma faixa de páginas. Só então o custo de iniciar os processos ("spawn")
+    supera o da própria extração.
+    """
+    if MAXIMO_PROCESSOS == 1:
+        return True
+    if sum(len(dados) for _, dados in arquivos) >= LIMITE_BYTES_SEM_PROCESSOS:
+        return False
+    paginas = sum(_contar_paginas_pdf(dados) for nome, dados in arquivos if nome.endswith(".pdf"))
+    return paginas <= PAGINAS_POR_TAREFA
+
+
+def extrair_textos(arquivos, ao_concluir_arquivo=None):
+    """
+    Extrai o texto de uma lista de (nome, bytes), na mesma ordem. Os arquivos (e as
+    faixas de páginas dos PDFs grandes) são processados em paralelo num pool de processos.
+    Cada arquivo é gravado uma única vez numa pasta temporária e os processos o leem de
+    lá, em vez de receberem os bytes (serializados) a cada tarefa.
+    `ao_concluir_arquivo(concluidos, total, nome)` é chamada no processo atual quando cada
+    arquivo termina, para mostrar o progresso. Um erro num arquivo vira o texto dele, sem parar os demais.
+    """
+    total = len(arquivos)
+    if _extrair_no_processo_atual(arquivos):
+        textos = []
+        for nome, dados in arquivos:
+            textos.append(_extrair_com_erro(nome, dados))
+            if ao_concluir_arquivo:
+                ao_concluir_arquivo(len(textos), total, nome)
+        return textos
+
+    partes = [[None] for _ in arquivos]  # Partes de cada arquivo, na ordem das faixas de páginas
+    pendentes = [1] * total
+    concluidos = 0
+    with tempfile.TemporaryDirectory(prefix="jarvis_extracao_") as pasta, ProcessPoolExecutor(
+            max_workers=MAXIMO_PROCESSOS, mp_context=multiprocessing.get_context(CONTEXTO_PROCESSOS)) as executor:
+        caminhos = []
+        for indice, (nome, dados) in enumerate(arquivos):
+            caminhos.append(os.path.join(pasta, f"{indice}{os.path.splitext(nome)[1]}"))
+            with open(caminhos[-1], "wb") as f:
+                f.write(dados)
+
+        # futuro -> (índice do arquivo, posição da parte; 0 é a primeira tarefa do arquivo)
+        futuros = {executor.submit(_extrair_arquivo, nome, caminhos[indice]): (indice, 0)
+                   for indice, (nome, _) in enumerate(arquivos)}
+        while futuros:
+            prontos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                indice, posicao = futuros.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                    if posicao == 0:
+                        resultado, paginas = resultado
+                        # O PDF é grande: as faixas seguintes viram novas tarefas.
+                        for inicio in range(PAGINAS_POR_TAREFA, paginas, PAGINAS_POR_TAREFA):
+                            futuros[executor.submit(extrair_faixa_pdf, caminhos[indice], inicio,
+                                                    inicio + PAGINAS_POR_TAREFA)] = (indice, len(partes[indice]))
+                            partes[indice].append(None)
+                            pendentes[indice] += 1
+                except Exception as e:
+                    resultado = f"Erro ao ler o arquivo: {e}"
+                partes[indice][posicao] = resultado
+                pendentes[indice] -= 1
+                if pendentes[indice] == 0:
+                    concluidos += 1
+                    if ao_concluir_arquivo:
+                        ao_concluir_arquivo(concluidos, total, arquivos[indice][0])
+    return ["".join(p) for p in partes]
+
+
+def _extrair_com_erro(nome, dados):
+    try:
+        return extrair_texto(nome, dados)
+    except Exception as e:
+        return f"Erro ao ler o arquivo: {e}"
@@ -1,9 +1,8 @@
 # feedback_manager.py
 
-import os
 import json
-from pathlib import Path
-from utils import encrypt_file_content_general, decrypt_file_content_general # Funções de criptografia geral
+from armazenamento import obter_armazenamento_local
+from utils import encrypt_file_content_general, decrypt_file_content_general, serializar_json # Funções de criptografia geral
 
 FEEDBACK_FILE_PATH = "dados/feedback.json"
 
@@ -11,14 +10,12 @@ def carregar_feedback():
     """
     Carrega os dados de feedback do arquivo, descriptografando o conteúdo inteiro.
     """
-    if not os.path.exists(FEEDBACK_FILE_PATH):
+    encrypted_content = obter_armazenamento_local().get(FEEDBACK_FILE_PATH)
+    if encrypted_content is None:
         print(f"Arquivo de feedback '{FEEDBACK_FILE_PATH}' não encontrado. Retornando vazio.")
         return [] # Assumindo que feedback é uma lista de itens
 
     try:
-        with open(FEEDBACK_FILE_PATH, 'r', encoding='utf-8') as f:
-            encrypted_content = f.read()
-        
         decrypted_content = decrypt_file_content_general(encrypted_content)
         
         feedback_data = json.loads(decrypted_content)
@@ -40,14 +37,11 @@ def salvar_feedback(feedback_data):
     """
     Salva os dados de feedback no arquivo, criptografando o conteúdo inteiro.
     """
-    Path(FEEDBACK_FILE_PATH).parent.mkdir(parents=True, exist_ok=True)
-
     try:
-        json_string = json.dumps(feedback_data, indent=4, ensure_ascii=False)
+        json_string = serializar_json(feedback_data)
         encrypted_string = encrypt_file_content_general(json_string) # Criptografa a string JSON inteira
         
-        with open(FEEDBACK_FILE_PATH, 'w', encoding='utf-8') as f:
-            f.write(encrypted_string)
-        print(f"Feedback salvo e criptografado em '{FEEDBACK_FILE_PATH}'.")
+        if obter_armazenamento_local().put(FEEDBACK_FILE_PATH, encrypted_string, "Atualiza feedback"):
+            print(f"Feedback salvo e criptografado em '{FEEDBACK_FILE_PATH}'.")
     except Exception as e:
         print(f"ERRO ao salvar feedback em '{FEEDBACK_FILE_PATH}': {e}")
\ No newline at end of file
@@ -0,0 +1,129 @@
+# fila_persistencia.py - Gravação adiada (write-behind) dos arquivos salvos no GitHub
+
+import atexit
+import threading
+
+INTERVALO_DESCARGA_SEGUNDOS = 20  # De quanto em quanto tempo o trabalhador grava o que está pendente
+
+
+class FilaPersistencia:
+    """
+    Fila de gravações em segundo plano. Cada `agendar` só guarda o conteúdo mais
+    recente de um arquivo (várias alterações seguidas viram um único commit) e
+    volta imediatamente; uma thread trabalhadora grava tudo a cada intervalo.
+    `descarregar()` força a gravação (usado no logout) e ela também acontece
+    quando o processo termina. Os arquivos são gravados na ordem do último agendamento.
+    """
+
+    def __init__(self, funcao_gravar, funcao_excluir=None, funcao_gravar_lote=None,
+                 intervalo_segundos=INTERVALO_DESCARGA_SEGUNDOS):
+        self._funcao_gravar = funcao_gravar  # (caminho, conteudo, mensagem_commit) -> bool
+        self._funcao_excluir = funcao_excluir  # (caminho, mensagem_commit) -> bool
+        # Opcional: (alteracoes {caminho: conteudo ou None}, mensagem_commit) -> bool, tudo em um commit
+        self._funcao_gravar_lote = funcao_gravar_lote
+        self.intervalo_segundos = intervalo_segundos
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()  # Uma descarga por vez (trabalhador ou logout)
+        self._pendentes = {}  # caminho -> (conteudo ou None para excluir, mensagem_commit, n_alteracoes)
+        self._em_gravacao = {}  # Lote sendo enviado agora (ainda visível para leituras)
+        self._acordar = threading.Event()
+        self._parar = False
+        self._trabalhador = threading.Thread(target=self._trabalhar, name="fila-persistencia", daemon=True)
+        self._trabalhador.start()
+        atexit.register(self.encerrar)
+
+    def agendar(self, caminho, conteudo, mensagem_commit):
+        """Marca o arquivo para gravação; substitui um conteúdo ainda não gravado."""
+        with self._lock:
+            # Reinserido no fim: um arquivo de índice agendado depois das partes é gravado depois delas.
+            anterior = self._pendentes.pop(caminho, None)
+            n_alteracoes = anterior[2] + 1 if anterior else 1
+            self._pendentes[caminho] = (conteudo, mensagem_commit, n_alteracoes)
+
+    def agendar_exclusao(self, caminho, mensagem_commit):
+        """Marca o arquivo para exclusão (cancela uma gravação ainda pendente dele)."""
+        if self._funcao_excluir is None:
+            raise ValueError("Esta fila não foi criada com uma função de exclusão.")
+        self.agendar(caminho, None, mensagem_commit)
+
+    def conteudo_pendente(self, caminho):
+        """
+        Conteúdo ainda não confirmado no GitHub para o caminho (ou None, inclusive
+        se a pendência for uma exclusão). As leituras devem preferi-lo ao do GitHub
+        para não ver dados antigos.
+        """
+        with self._lock:
+            item = self._pendentes.get(caminho) or self._em_gravacao.get(caminho)
+            return item[0] if item else None
+
+    def descarregar(self):
+        """Grava agora todos os arquivos pendentes. Retorna quantos foram gravados."""
+        with self._lock_gravacao:
+            with self._lock:
+                lote, self._pendentes = self._pendentes, {}
+                self._em_gravacao = dict(lote)
+
+            if self._funcao_gravar_lote is not None and len(lote) > 1:
+                return self._descarregar_em_lote(lote)
+
+            gravados, houve_falha = 0, False
+            for caminho, (conteudo, mensagem_commit, n_alteracoes) in lote.items():
+                mensagem = mensagem_commit
+                if n_alteracoes > 1:
+                    mensagem = f"{mensagem_commit} ({n_alteracoes} alterações agrupadas)"
+                try:
+                    if conteudo is None and houve_falha:
+                        # Uma exclusão pode depender de uma gravação anterior que falhou
+                        # (ex: o arquivo antigo só some depois do índice novo): fica para a próxima vez.
+                        sucesso = False
+                    elif conteudo is None:
+                        sucesso = self._funcao_excluir(caminho, mensagem)
+                    else:
+                        sucesso = self._funcao_gravar(caminho, conteudo, mensagem)
+                except Exception as e:
+                    print(f"ERRO: Falha ao gravar '{caminho}' em segundo plano: {e}")
+                    sucesso = False
+                houve_falha = houve_falha or not sucesso
+
+                with self._lock:
+                    self._em_gravacao.pop(caminho, None)
+                    if sucesso:
+                        gravados += 1
+                    elif caminho not in self._pendentes:
+                        # Volta para a fila (a menos que já exista uma versão mais nova) e é tentado de novo.
+                        self._pendentes[caminho] = (conteudo, mensagem_commit, n_alteracoes)
+            return gravados
+
+    def _descarregar_em_lote(self, lote):
+        """Publica todo o lote de uma vez; se falhar, devolve à fila o que não foi substituído."""
+        mensagens = list(dict.fromkeys(mensagem for _, mensagem, _ in lote.values()))
+        mensagem = f"Atualiza {len(lote)} arquivos em segundo plano\n\n" + "\n".join(f"- {m}" for m in mensagens)
+        try:
+            sucesso = self._funcao_gravar_lote({caminho: item[0] for caminho, item in lote.items()}, mensagem)
+        except Exception as e:
+            print(f"ERRO: Falha ao gravar lote de {len(lote)} arquivos em segundo plano: {e}")
+            sucesso = False
+
+        with self._lock:
+            self._em_gravacao = {}
+            if not sucesso:
+                for caminho, item in lote.items():
+                    self._pendentes.setdefault(caminho, item)
+        return len(lote) if sucesso else 0
+
+    def _trabalhar(self):
+        while not self._parar:
+            self._acordar.wait(self.intervalo_segundos)
+            self._acordar.clear()
+            if self._pendentes:
+                self.descarregar()
+
+    def encerrar(self):
+        """Para o trabalhador e grava o que restar (chamado automaticamente ao sair)."""
+        self._parar = True
+        self._acordar.set()
+        self.descarregar()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pendentes)
@@ -0,0 +1,91 @@
+# indice_documentos.py - Índice de trechos dos arquivos anexados a um chat (busca por embeddings)
+
+import re
+from indice_vetorial import IndiceExato
+
+# Documentos até este tamanho vão inteiros para a IA; acima disso, só os trechos relevantes.
+LIMITE_CONTEXTO_INTEGRAL = 12000  # caracteres
+# Os comandos de código (/explicar, /refatorar, /depurar) precisam do arquivo inteiro: ele só
+# é reduzido a trechos acima deste limite, dimensionado pela janela de contexto do modelo
+# (~100 mil tokens de código, deixando folga para as instruções e para a resposta).
+CARACTERES_POR_TOKEN = 4
+LIMITE_CODIGO_INTEGRAL = 100_000 * CARACTERES_POR_TOKEN  # caracteres
+TAMANHO_TRECHO = 1500  # caracteres
+SOBREPOSICAO_TRECHO = 300  # caracteres repetidos entre trechos vizinhos
+TRECHOS_POR_PERGUNTA = 6
+LOTE_EMBEDDINGS = 64
+
+# Marcadores que o app coloca em volta de cada arquivo em `contexto_arquivo`.
+_PADRAO_ARQUIVO = re.compile(
+    r"--- INÍCIO DO ARQUIVO: (?P<nome>.+?) ---\n(?P<texto>.*?)\n--- FIM DO ARQUIVO: (?P=nome) ---", re.S)
+
+
+def separar_arquivos(contexto_arquivo):
+    """Lista de (nome do arquivo, texto) a partir do `contexto_arquivo` de um chat."""
+    arquivos = [(m.group("nome"), m.group("texto").strip()) for m in _PADRAO_ARQUIVO.finditer(contexto_arquivo)]
+    return arquivos or [("documento", contexto_arquivo)]
+
+
+def texto_do_arquivo(contexto_arquivo, nome_arquivo):
+    """Texto de um dos arquivos do `contexto_arquivo`, ou None se não houver arquivo com esse nome."""
+    return next((texto for nome, texto in separar_arquivos(contexto_arquivo) if nome == nome_arquivo), None)
+
+
+def dividir_em_trechos(texto, tamanho=TAMANHO_TRECHO, sobreposicao=SOBREPOSICAO_TRECHO):
+    """
+    Divide o texto em trechos de até `tamanho` caracteres que se sobrepõem em
+    `sobreposicao`. O corte é feito de preferência numa quebra de parágrafo ou de linha.
+    """
+    trechos, inicio = [], 0
+    while inicio < len(texto):
+        fim = min(inicio + tamanho, len(texto))
+        if fim < len(texto):
+            corte = max(texto.rfind("\n\n", inicio + sobreposicao, fim), texto.rfind("\n", inicio + sobreposicao, fim))
+            if corte > inicio + sobreposicao:
+                fim = corte
+        trecho = texto[inicio:fim].strip()
+        if trecho:
+            trechos.append(trecho)
+        if fim >= len(texto):
+            break
+        inicio = max(fim - sobreposicao, inicio + 1)
+    return trechos
+
+
+class IndiceDocumento:
+    """
+    Trechos dos arquivos de um chat com seus embeddings (o mesmo modelo MiniLM da memória).
+    A cada pergunta só os trechos mais parecidos com ela vão para a IA, em vez do
+    documento inteiro em todos os turnos.
+    """
+
+    def __init__(self, contexto_arquivo, modelo_embedding):
+        self.trechos = []  # (nome do arquivo, posição do trecho no arquivo, texto)
+        for nome, texto in separar_arquivos(contexto_arquivo):
+            self.trechos.extend((nome, i, trecho) for i, trecho in enumerate(dividir_em_trechos(texto)))
+        self._modelo = modelo_embedding
+        vetores = modelo_embedding.encode([t[2] for t in self.trechos], batch_size=LOTE_EMBEDDINGS) \
+            if self.trechos else []
+        self._indice = IndiceExato(vetores) if len(self.trechos) else None
+
+    def __len__(self):
+        return len(self.trechos)
+
+    def buscar(self, pergunta, k=TRECHOS_POR_PERGUNTA, nome_arquivo=None):
+        """
+        Os k trechos mais relevantes para a pergunta, na ordem em que aparecem nos arquivos.
+        Com `nome_arquivo`, só trechos desse arquivo.
+        """
+        if self._indice is None:
+            return []
+        # Filtrando por arquivo, o ranking é feito sobre todos os trechos e só os do arquivo ficam.
+        _, indices = self._indice.search(self._modelo.encode([pergunta]),
+                                         k=k if nome_arquivo is None else len(self.trechos))
+        if nome_arquivo is not None:
+            indices = [i for i in indices if self.trechos[i][0] == nome_arquivo][:k]
+        return [self.trechos[i] for i in sorted(int(i) for i in indices)]
+
+    def montar_contexto(self, pergunta, k=TRECHOS_POR_PERGUNTA, nome_arquivo=None):
+        """Texto com os trechos relevantes, identificados pelo arquivo de origem."""
+        return "\n\n".join(f"[{nome} — trecho {posicao + 1}]\n{texto}"
+                           for nome, posicao, texto in self.buscar(pergunta, k, nome_arquivo))
@@ -0,0 +1,104 @@
+# indice_lexical.py - Busca aproximada (por grafia) das perguntas de memoria_jarvis.json
+
+import json
+import threading
+import zlib
+from difflib import SequenceMatcher
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from armazenamento import obter_armazenamento_local
+
+CAMINHO_MEMORIA = "memoria_jarvis.json"
+N_CANDIDATOS = 5  # Candidatos do produto esparso que passam pela conferência fina
+
+
+class IndiceLexical:
+    """
+    Índice TF-IDF de trigramas de caracteres das perguntas da memória persistente.
+    A pontuação de todas as perguntas é um único produto de matriz esparsa; só os
+    poucos melhores candidatos são conferidos com SequenceMatcher, mantendo o mesmo
+    significado do limiar que a busca antiga (que comparava pergunta a pergunta).
+    O índice é reconstruído quando a memória muda no armazenamento local.
+    """
+
+    def __init__(self, caminho_memoria=CAMINHO_MEMORIA, n_candidatos=N_CANDIDATOS):
+        self.caminho_memoria = caminho_memoria
+        self.n_candidatos = n_candidatos
+        self._lock = threading.Lock()
+        self._assinatura_arquivo = None
+        # (itens, vetorizador, matriz): trocados juntos para as buscas nunca verem um estado misto.
+        self._estado = ([], None, None)
+        self.recarregar()
+
+    def _ler_assinatura(self):
+        """
+        Marca de alteração da memória dada pelo armazenamento (data de modificação do arquivo,
+        `atualizado_em` no SQLite), sem ler o conteúdo. Só num driver que não a fornece a
+        memória é lida e resumida por tamanho + CRC32.
+        """
+        armazenamento = obter_armazenamento_local()
+        versao = armazenamento.versao(self.caminho_memoria)
+        if versao is not None:
+            return versao
+        conteudo = armazenamento.get(self.caminho_memoria)
+        return None if conteudo is None else (len(conteudo), zlib.crc32(conteudo.encode("utf-8")))
+
+    def recarregar(self):
+        """Lê a memória do armazenamento e reconstrói o índice."""
+        with self._lock:
+            # A assinatura vem antes do conteúdo: uma gravação entre os dois só causa uma recarga a mais.
+            assinatura = self._ler_assinatura()
+            conteudo = obter_armazenamento_local().get(self.caminho_memoria)
+            try:
+                memoria = json.loads(conteudo) if conteudo else {}
+            except json.JSONDecodeError:
+                memoria = {}
+            if not isinstance(memoria, dict):
+                memoria = {}
+
+            itens = [item for categoria in memoria.values() if isinstance(categoria, list)
+                     for item in categoria if isinstance(item, dict) and item.get("pergunta")]
+            vetorizador, matriz = None, None
+            if itens:
+                try:
+                    vetorizador = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 3),
+                                                  lowercase=True, dtype=np.float32)
+                    # Guardada transposta (trigramas × perguntas): a consulta esparsa vezes esta
+                    # matriz devolve só as perguntas que compartilham algum trigrama.
+                    matriz = vetorizador.fit_transform([item["pergunta"] for item in itens]).T.tocsr()
+                except ValueError as e:  # Ex: só perguntas com menos de 3 caracteres
+                    print(f"AVISO: Índice lexical não construído: {e}")
+                    vetorizador, matriz = None, None
+            self._estado = (itens, vetorizador, matriz)
+            self._assinatura_arquivo = assinatura
+
+    def buscar(self, pergunta, limiar=0.9):
+        """
+        Retorna (item, score) da pergunta da memória mais parecida com `pergunta`
+        se o score (razão do SequenceMatcher) for >= limiar; senão (None, melhor_score).
+        """
+        if self._ler_assinatura() != self._assinatura_arquivo:
+            self.recarregar()
+        itens, vetorizador, matriz = self._estado
+        if matriz is None:
+            return None, 0.0
+
+        pergunta = pergunta.lower()
+        resultado = (vetorizador.transform([pergunta]) @ matriz).tocsr()
+        scores, ids = resultado.data, resultado.indices  # Só as perguntas com score > 0
+        if not len(scores):
+            return None, 0.0
+        k = min(self.n_candidatos, len(scores))
+        candidatos = ids[np.argpartition(-scores, k - 1)[:k]]
+
+        melhor_item, melhor_score = None, 0.0
+        for i in candidatos:
+            score = SequenceMatcher(None, pergunta, itens[i]["pergunta"].lower()).ratio()
+            if score > melhor_score:
+                melhor_item, melhor_score = itens[i], score
+        if melhor_score >= limiar:
+            return melhor_item, melhor_score
+        return None, melhor_score
+
+    def __len__(self):
+        return len(self._estado[0])
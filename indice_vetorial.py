@@ -0,0 +1,203 @@
+# indice_vetorial.py - Índices de busca por similaridade para a memória local do Jarvis
+
+import copy
+import pickle
+import numpy as np
+
+try:
+    import hnswlib  # Opcional: índice HNSW (busca aproximada em tempo sublinear)
+except ImportError:
+    hnswlib = None
+
+# Abaixo deste número de vetores a busca exata já é rápida o bastante.
+LIMITE_BUSCA_EXATA = 20000
+# Ao acrescentar vetores a um índice HNSW cheio, a capacidade cresce por este fator.
+FATOR_CRESCIMENTO_HNSW = 1.25
+
+
+def normalizar_vetores(vetores):
+    """Converte para float32 e normaliza as linhas (norma 1): produto escalar = similaridade de cosseno."""
+    vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vetores / normas
+
+
+def _top_k(scores, k):
+    """Retorna (scores, índices) dos k maiores valores, em ordem decrescente, sem ordenar tudo."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    candidatos = np.argpartition(-scores, k - 1)[:k]
+    ordem = candidatos[np.argsort(-scores[candidatos])]
+    return scores[ordem], ordem
+
+
+class IndiceExato:
+    """
+    Busca exata por produto escalar sobre vetores pré-normalizados.
+    Equivale a `cosine_similarity`, mas normaliza a base uma única vez e usa
+    argpartition para o top-k. Com `pre_normalizados=True` a matriz recebida
+    (ex: um memmap float16/int8) é usada como está, sem cópia para a RAM;
+    `escala` desfaz a quantização (ex: 127 para int8).
+    """
+
+    tipo = "exato"
+    TAMANHO_BLOCO = 65536  # Linhas convertidas para float32 por vez durante a busca
+
+    def __init__(self, vetores, pre_normalizados=False, escala=1.0):
+        self._vetores = vetores if pre_normalizados else normalizar_vetores(vetores)
+        self._escala = escala
+
+    def __len__(self):
+        return len(self._vetores)
+
+    def search(self, vetor, k=1):
+        """Retorna (scores, índices) dos k vizinhos mais similares ao vetor de consulta."""
+        if not len(self._vetores):
+            return _top_k(np.empty(0, dtype=np.float32), k)
+        consulta = normalizar_vetores(vetor)[0]
+        if self._vetores.dtype == np.float32:
+            scores = self._vetores @ consulta
+        else:
+            scores = np.concatenate([
+                np.asarray(self._vetores[i:i + self.TAMANHO_BLOCO], dtype=np.float32) @ consulta
+                for i in range(0, len(self._vetores), self.TAMANHO_BLOCO)])
+        if self._escala != 1.0:
+            scores = scores / self._escala
+        return _top_k(scores, k)
+
+
+class IndiceIVF:
+    """
+    Índice de arquivo invertido (IVF): os vetores são agrupados por k-means em
+    `n_listas` centróides e a busca só varre as `n_sondas` listas mais próximas.
+    Não depende de bibliotecas externas além do NumPy.
+    """
+
+    tipo = "ivf"
+
+    def __init__(self, vetores, n_listas=None, n_sondas=8, iteracoes=10, semente=42):
+        self._vetores = normalizar_vetores(vetores)
+        n = len(self._vetores)
+        self.n_listas = max(1, min(n, n_listas or int(np.sqrt(n))))
+        self.n_sondas = max(1, min(n_sondas, self.n_listas))
+        self._centroides = self._treinar_kmeans(iteracoes, semente)
+        self._listas = self._distribuir(np.arange(n))
+
+    def __len__(self):
+        return len(self._vetores)
+
+    def _treinar_kmeans(self, iteracoes, semente):
+        rng = np.random.default_rng(semente)
+        centroides = self._vetores[rng.choice(len(self._vetores), self.n_listas, replace=False)].copy()
+        for _ in range(iteracoes):
+            atribuicao = np.argmax(self._vetores @ centroides.T, axis=1)
+            for c in range(self.n_listas):
+                membros = self._vetores[atribuicao == c]
+                if len(membros):
+                    centroides[c] = membros.mean(axis=0)
+            centroides = normalizar_vetores(centroides)
+        return centroides
+
+    def _distribuir(self, indices, listas=None):
+        if listas is None:
+            listas = [np.empty(0, dtype=np.int64) for _ in range(self.n_listas)]
+        atribuicao = np.argmax(self._vetores[indices] @ self._centroides.T, axis=1)
+        for c in np.unique(atribuicao):
+            listas[c] = np.concatenate([listas[c], indices[atribuicao == c]])
+        return listas
+
+    def search(self, vetor, k=1):
+        """Retorna (scores, índices) aproximados dos k vizinhos mais similares."""
+        consulta = normalizar_vetores(vetor)[0]
+        _, listas_proximas = _top_k(self._centroides @ consulta, self.n_sondas)
+        candidatos = np.concatenate([self._listas[c] for c in listas_proximas])
+        scores, posicoes = _top_k(self._vetores[candidatos] @ consulta, k)
+        return scores, candidatos[posicoes]
+
+    def com_vetores(self, vetores):
+        """
+        Novo índice com os vetores acrescentados, cada um atribuído ao centróide mais
+        próximo (sem retreinar). Este índice não muda: os centróides são compartilhados
+        e as listas alteradas são arrays novos.
+        """
+        novo = copy.copy(self)
+        inicio = len(self._vetores)
+        novo._vetores = np.vstack([self._vetores, normalizar_vetores(vetores)])
+        novo._listas = novo._distribuir(np.arange(inicio, len(novo._vetores)), list(self._listas))
+        return novo
+
+
+class IndiceHNSW:
+    """Índice HNSW (grafo navegável) via `hnswlib`, com métrica de cosseno."""
+
+    tipo = "hnsw"
+
+    def __init__(self, vetores, m=16, ef_construcao=200, ef_busca=64):
+        if hnswlib is None:
+            raise ImportError("O pacote 'hnswlib' não está instalado.")
+        vetores = normalizar_vetores(vetores)
+        self._parametros = {"m": m, "ef_construcao": ef_construcao, "ef_busca": ef_busca}
+        self._n = len(vetores)
+        self._indice = hnswlib.Index(space="cosine", dim=vetores.shape[1])
+        self._indice.init_index(max_elements=max(self._n, 1), M=m, ef_construction=ef_construcao)
+        if self._n:
+            self._indice.add_items(vetores, np.arange(self._n))
+        self._indice.set_ef(ef_busca)
+
+    def __len__(self):
+        return self._n
+
+    def search(self, vetor, k=1):
+        """Retorna (scores, índices) aproximados dos k vizinhos mais similares."""
+        k = min(k, self._n)
+        if k <= 0:
+            return _top_k(np.empty(0, dtype=np.float32), k)
+        rotulos, distancias = self._indice.knn_query(normalizar_vetores(vetor), k=k)
+        # hnswlib devolve distância de cosseno (1 - similaridade).
+        return 1.0 - distancias[0], rotulos[0].astype(np.int64)
+
+    def com_vetores(self, vetores):
+        """
+        Novo índice com os vetores acrescentados. O grafo atual continua em uso pelas
+        sessões, então é copiado (cópia de memória, sem reconstruir o grafo) e só a cópia
+        recebe os novos itens. A capacidade cresce em blocos para não redimensionar a cada curadoria.
+        """
+        vetores = normalizar_vetores(vetores)
+        novo = copy.copy(self)
+        novo._indice = pickle.loads(pickle.dumps(self._indice, protocol=pickle.HIGHEST_PROTOCOL))
+        novo._n = self._n + len(vetores)
+        capacidade = novo._indice.get_max_elements()
+        if novo._n > capacidade:
+            novo._indice.resize_index(max(novo._n, int(capacidade * FATOR_CRESCIMENTO_HNSW)))
+        novo._indice.add_items(vetores, np.arange(self._n, novo._n))
+        novo._indice.set_ef(self._parametros["ef_busca"])
+        return novo
+
+
+def criar_indice(vetores, tipo="auto", pre_normalizados=False, escala=1.0):
+    """
+    Cria o índice de busca para a matriz de vetores.
+    `tipo` pode ser "exato", "ivf", "hnsw" ou "auto" (exato para bases pequenas;
+    HNSW se `hnswlib` estiver instalado, senão IVF, para bases grandes).
+    `pre_normalizados` e `escala` permitem usar diretamente a matriz de um
+    ArmazenamentoVetores (memmap quantizado) no índice exato.
+    """
+    if tipo == "auto":
+        if len(vetores) < LIMITE_BUSCA_EXATA:
+            tipo = "exato"
+        else:
+            tipo = "hnsw" if hnswlib is not None else "ivf"
+
+    if tipo == "exato":
+        return IndiceExato(vetores, pre_normalizados=pre_normalizados, escala=escala)
+
+    # IVF e HNSW mantêm sua própria cópia float32 dos vetores.
+    vetores = np.asarray(vetores, dtype=np.float32) / escala
+    if tipo == "hnsw":
+        try:
+            return IndiceHNSW(vetores)
+        except ImportError as e:
+            print(f"AVISO: {e} Usando índice IVF.")
+    return IndiceIVF(vetores)
@@ -0,0 +1,157 @@
+# limite_github.py - Orçamento compartilhado de requisições à API do GitHub (limite de 5000/h)
+
+import random
+import threading
+import time
+
+LIMITE_PADRAO_POR_HORA = 5000
+FRACAO_RESERVADA_ESCRITA = 0.10  # Parte final da cota que as leituras não podem usar
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 30.0
+
+STATUS_TRANSITORIOS = (500, 502, 503, 504)
+
+
+class OrcamentoGitHubEsgotado(Exception):
+    """Não há orçamento para a requisição dentro do prazo dado."""
+
+
+class OrcamentoGitHub:
+    """
+    Orçamento compartilhado por todas as sessões do processo, controlado só pela
+    cota real que o GitHub informa nos cabeçalhos X-RateLimit-* de cada resposta
+    (sem ritmo artificial: enquanto há cota, as requisições saem na hora). Os últimos
+    10% da cota ficam reservados para escritas: com pouca cota as leituras são recusadas
+    (e servidas do cache) para que salvar um chat nunca fique sem orçamento.
+    """
+
+    def __init__(self, limite=LIMITE_PADRAO_POR_HORA, fracao_reservada_escrita=FRACAO_RESERVADA_ESCRITA):
+        self.limite = limite
+        self.restante = limite
+        self.reset_em = None  # Epoch em que o GitHub renova a cota
+        self.fracao_reservada_escrita = fracao_reservada_escrita
+        self._condicao = threading.Condition()
+        self.estatisticas = {"requisicoes": 0, "esperas": 0, "leituras_recusadas": 0, "novas_tentativas": 0}
+
+    # --- Atualização pelo GitHub ---
+
+    def atualizar(self, limite=None, restante=None, reset_em=None):
+        """Ajusta o orçamento com os valores informados pelo GitHub."""
+        with self._condicao:
+            if limite and limite > 0:
+                self.limite = int(limite)
+            if restante is not None and restante >= 0:
+                self.restante = int(restante)
+            if reset_em:
+                self.reset_em = float(reset_em)
+            self._condicao.notify_all()
+
+    def atualizar_de_cabecalhos(self, cabecalhos):
+        """Lê X-RateLimit-Limit / -Remaining / -Reset de uma resposta HTTP."""
+        if not cabecalhos:
+            return
+        try:
+            self.atualizar(
+                limite=int(cabecalhos["X-RateLimit-Limit"]) if "X-RateLimit-Limit" in cabecalhos else None,
+                restante=int(cabecalhos["X-RateLimit-Remaining"]) if "X-RateLimit-Remaining" in cabecalhos else None,
+                reset_em=float(cabecalhos["X-RateLimit-Reset"]) if "X-RateLimit-Reset" in cabecalhos else None)
+        except (TypeError, ValueError):
+            pass
+
+    # --- Consumo ---
+
+    def _renovar_se_resetou(self):
+        if self.reset_em and time.time() >= self.reset_em:
+            self.restante, self.reset_em = self.limite, None
+
+    def _reserva_escrita(self):
+        return int(self.limite * self.fracao_reservada_escrita)
+
+    def adquirir(self, escrita=False, timeout=0.0):
+        """
+        Reserva uma requisição. Escritas podem usar a cota reservada; leituras não.
+        Espera até `timeout` segundos por orçamento e retorna False se não houver.
+        """
+        prazo = time.monotonic() + timeout
+        with self._condicao:
+            while True:
+                self._renovar_se_resetou()
+                minimo_restante = 0 if escrita else self._reserva_escrita()
+                if self.restante > minimo_restante:
+                    self.restante -= 1  # Estimativa até a próxima resposta trazer o valor real
+                    self.estatisticas["requisicoes"] += 1
+                    return True
+
+                espera = prazo - time.monotonic()
+                if espera <= 0:
+                    if not escrita:
+                        self.estatisticas["leituras_recusadas"] += 1
+                    return False
+                if self.reset_em:
+                    espera = min(espera, max(0.1, self.reset_em - time.time()))
+                self.estatisticas["esperas"] += 1
+                self._condicao.wait(espera)
+
+    def executar(self, funcao, escrita=False, timeout=0.0, tentativas=4):
+        """
+        Executa `funcao` (uma chamada à API) dentro do orçamento, repetindo com
+        espera exponencial e jitter em limites de taxa (403/429) e erros transitórios.
+        Levanta OrcamentoGitHubEsgotado se não houver orçamento dentro do prazo.
+        """
+        for tentativa in range(tentativas):
+            if not self.adquirir(escrita=escrita, timeout=timeout):
+                raise OrcamentoGitHubEsgotado(
+                    f"Orçamento da API do GitHub esgotado ({self.restante}/{self.limite} restantes).")
+            try:
+                return funcao()
+            except Exception as e:
+                espera = self._tempo_de_espera(e, tentativa)
+                if espera is None or tentativa == tentativas - 1:
+                    raise
+                with self._condicao:
+                    self.estatisticas["novas_tentativas"] += 1
+                time.sleep(espera)
+
+    def _tempo_de_espera(self, erro, tentativa):
+        """Quanto esperar antes de repetir a chamada que falhou, ou None se não vale repetir."""
+        resposta = getattr(erro, "response", None)
+        status = getattr(erro, "status", None) or getattr(resposta, "status_code", None)
+        cabecalhos = getattr(erro, "headers", None) or getattr(resposta, "headers", None) or {}
+        self.atualizar_de_cabecalhos(cabecalhos)
+        # Espera exponencial com "full jitter": espalha as novas tentativas das várias sessões.
+        espera_exponencial = random.uniform(0, min(ESPERA_MAXIMA_SEGUNDOS, ESPERA_BASE_SEGUNDOS * 2 ** tentativa))
+
+        if status in (403, 429):
+            if "Retry-After" in cabecalhos:  # Limite secundário (abuso): o GitHub diz quanto esperar
+                return min(ESPERA_MAXIMA_SEGUNDOS, float(cabecalhos["Retry-After"]) + random.uniform(0, 1))
+            if str(cabecalhos.get("X-RateLimit-Remaining")) == "0" and self.reset_em:
+                return min(ESPERA_MAXIMA_SEGUNDOS, max(0.0, self.reset_em - time.time()) + random.uniform(0, 1))
+            if status == 429 or "rate limit" in str(erro).lower():
+                return espera_exponencial
+            return None  # 403 de permissão: repetir não adianta
+        if status in STATUS_TRANSITORIOS or isinstance(erro, (ConnectionError, TimeoutError)):
+            return espera_exponencial
+        if type(erro).__name__ in ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout"):
+            return espera_exponencial  # Exceções de rede do requests
+        return None
+
+    def resumo(self):
+        """Estado atual do orçamento, para exibição no painel de status."""
+        with self._condicao:
+            self._renovar_se_resetou()
+            return {"limite": self.limite, "restante": self.restante, "reset_em": self.reset_em,
+                    "reserva_escrita": self._reserva_escrita(),
+                    **self.estatisticas}
+
+
+_orcamento = None
+_lock_orcamento = threading.Lock()
+
+
+def obter_orcamento_github():
+    """Orçamento único por processo, compartilhado por todas as sessões."""
+    global _orcamento
+    with _lock_orcamento:
+        if _orcamento is None:
+            _orcamento = OrcamentoGitHub()
+        return _orcamento
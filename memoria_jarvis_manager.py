@@ -1,9 +1,8 @@
 # memoria_jarvis_manager.py
 
-import os
 import json
-from pathlib import Path
-from utils import encrypt_file_content_general, decrypt_file_content_general # Funções de criptografia geral
+from armazenamento import obter_armazenamento_local
+from utils import encrypt_file_content_general, decrypt_file_content_general, serializar_json # Funções de criptografia geral
 
 MEMORIA_JARVIS_FILE_PATH = "memoria_jarvis.json" # Este arquivo está na raiz do projeto
 
@@ -11,14 +10,12 @@ def carregar_memoria_jarvis():
     """
     Carrega o conteúdo da memória do Jarvis do arquivo, descriptografando-o.
     """
-    if not os.path.exists(MEMORIA_JARVIS_FILE_PATH):
+    encrypted_content = obter_armazenamento_local().get(MEMORIA_JARVIS_FILE_PATH)
+    if encrypted_content is None:
         print(f"Arquivo de memória '{MEMORIA_JARVIS_FILE_PATH}' não encontrado. Retornando memória vazia.")
         return [] # Ou {} dependendo da estrutura da sua memória
 
     try:
-        with open(MEMORIA_JARVIS_FILE_PATH, 'r', encoding='utf-8') as f:
-            encrypted_content = f.read()
-        
         decrypted_content = decrypt_file_content_general(encrypted_content)
         
         memoria = json.loads(decrypted_content)
@@ -41,20 +38,18 @@ def salvar_memoria_jarvis(memoria_data):
     """
     Salva o conteúdo da memória do Jarvis no arquivo, criptografando-o.
     """
-    if not memoria_data and os.path.exists(MEMORIA_JARVIS_FILE_PATH):
-        try:
-            os.remove(MEMORIA_JARVIS_FILE_PATH)
+    armazenamento = obter_armazenamento_local()
+    if not memoria_data and armazenamento.get(MEMORIA_JARVIS_FILE_PATH) is not None:
+        if armazenamento.delete(MEMORIA_JARVIS_FILE_PATH, "Remove memória vazia"):
             print(f"Arquivo de memória '{MEMORIA_JARVIS_FILE_PATH}' removido (memória vazia).")
             return
-        except Exception as e:
-            print(f"AVISO: Não foi possível remover arquivo de memória vazio: {e}")
+        print("AVISO: Não foi possível remover arquivo de memória vazio.")
 
     try:
-        json_string = json.dumps(memoria_data, indent=4, ensure_ascii=False)
+        json_string = serializar_json(memoria_data)
         encrypted_string = encrypt_file_content_general(json_string) 
         
-        with open(MEMORIA_JARVIS_FILE_PATH, 'w', encoding='utf-8') as f:
-            f.write(encrypted_string)
-        print(f"Memória do Jarvis salva e criptografada em '{MEMORIA_JARVIS_FILE_PATH}'.")
+        if armazenamento.put(MEMORIA_JARVIS_FILE_PATH, encrypted_string, "Atualiza memória do Jarvis"):
+            print(f"Memória do Jarvis salva e criptografada em '{MEMORIA_JARVIS_FILE_PATH}'.")
     except Exception as e:
         print(f"ERRO ao salvar memória do Jarvis em '{MEMORIA_JARVIS_FILE_PATH}': {e}")
\ No newline at end of file
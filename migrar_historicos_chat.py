@@ -0,0 +1,112 @@
+# migrar_historicos_chat.py - Junta os históricos de chat órfãos no arquivo de nome determinístico (HMAC)
+
+import json
+from cryptography.fernet import InvalidToken
+from armazenamento import obter_armazenamento_local
+from chat_history_manager import CHAT_HISTORY_FOLDER_PATH, _get_chat_file_path
+from utils import decrypt_string_users, encrypt_string_users, fernet_users, serializar_json
+
+PREFIXO_NOME_LEGADO = "chats_historico_"  # Arquivos movidos por script.py, com o nome em texto claro
+
+
+def _identificar_arquivo(chave):
+    """
+    Retorna (username, timestamp) de um arquivo antigo, ou None se não for um deles.
+    Nos nomes Fernet o timestamp é o da criptografia, isto é, o do salvamento.
+    """
+    nome = chave.rsplit("/", 1)[-1][:-len(".json")]
+    if nome.startswith(PREFIXO_NOME_LEGADO):
+        return nome[len(PREFIXO_NOME_LEGADO):], 0
+    try:
+        token = nome.encode()
+        return fernet_users.decrypt(token).decode(), fernet_users.extract_timestamp(token)
+    except (InvalidToken, ValueError):
+        return None  # Já é um nome HMAC ou não é um histórico
+
+
+def _ler_historico(conteudo):
+    """Conteúdo de um arquivo (criptografado ou JSON em texto claro) como lista/dicionário."""
+    if not conteudo:
+        return None
+    try:
+        return json.loads(decrypt_string_users(conteudo))  # Devolve o original se não estiver criptografado
+    except json.JSONDecodeError:
+        return None
+
+
+def _juntar(acumulado, historico):
+    """
+    Junta duas versões do histórico. Dicionários (chat_id -> chat): a versão mais nova de cada chat.
+    Listas de mensagens: acrescenta só o que não é continuação já presente no fim de `acumulado`.
+    """
+    if acumulado is None:
+        return historico
+    if isinstance(acumulado, dict) and isinstance(historico, dict):
+        return {**acumulado, **historico}
+    if isinstance(acumulado, list) and isinstance(historico, list):
+        for sobreposicao in range(min(len(acumulado), len(historico)), 0, -1):
+            if acumulado[-sobreposicao:] == historico[:sobreposicao]:
+                return acumulado + historico[sobreposicao:]
+        return acumulado + historico
+    return historico  # Formatos diferentes: fica o mais recente
+
+
+def migrar_historicos_chat(aplicar=True):
+    """
+    Agrupa por usuário os arquivos de `dados/chats_historico/` com nome antigo (Fernet ou texto
+    claro), junta em ordem de salvamento com o arquivo HMAC atual, grava o resultado e apaga os órfãos.
+    Com aplicar=False só mostra o que seria feito.
+    """
+    if fernet_users is None:
+        raise ValueError("A chave Fernet para usuários não está inicializada. Verifique ENCRYPTION_KEY_USERS.")
+    armazenamento = obter_armazenamento_local()
+
+    orfaos_por_usuario = {}
+    for chave in armazenamento.list(f"{CHAT_HISTORY_FOLDER_PATH}/"):
+        if not chave.endswith(".json"):
+            continue
+        identificado = _identificar_arquivo(chave)
+        if identificado:
+            username, timestamp = identificado
+            orfaos_por_usuario.setdefault(username, []).append((timestamp, chave))
+
+    if not orfaos_por_usuario:
+        print("Nenhum arquivo de histórico órfão encontrado.")
+        return 0
+
+    for username, orfaos in sorted(orfaos_por_usuario.items()):
+        destino = _get_chat_file_path(username)
+        historico, legiveis = None, []
+        for _, chave in sorted(orfaos):
+            lido = _ler_historico(armazenamento.get(chave))
+            if lido is None:
+                print(f"  AVISO: '{chave}' ilegível; não será apagado.")
+                continue
+            historico = _juntar(historico, lido)
+            legiveis.append(chave)
+        # O arquivo HMAC, se já existir, é o mais recente de todos.
+        atual = _ler_historico(armazenamento.get(destino))
+        if atual is not None:
+            historico = _juntar(historico, atual)
+
+        print(f"Usuário '{username}': {len(legiveis)} arquivo(s) -> '{destino}'")
+        if not aplicar or historico is None:
+            continue
+        # Primeiro o consolidado; os órfãos só são apagados depois que ele foi gravado.
+        mensagem = f"Consolida históricos de chat de {username}"
+        if not armazenamento.put(destino, encrypt_string_users(serializar_json(historico)), mensagem):
+            print(f"  ERRO ao gravar o histórico consolidado de '{username}'; os arquivos antigos foram mantidos.")
+            continue
+        orfaos_a_apagar = {chave: None for chave in legiveis if chave != destino}
+        if orfaos_a_apagar and not armazenamento.aplicar_lote(orfaos_a_apagar, mensagem):
+            print(f"  ERRO ao apagar arquivos antigos de '{username}'; rode a migração de novo para concluir.")
+
+    return sum(len(orfaos) for orfaos in orfaos_por_usuario.values())
+
+
+if __name__ == "__main__":
+    import sys
+    simular = "--simular" in sys.argv
+    print(">> MIGRAÇÃO DOS HISTÓRICOS DE CHAT PARA NOMES HMAC <<" + (" (simulação)" if simular else ""))
+    total = migrar_historicos_chat(aplicar=not simular)
+    print(f"Concluído: {total} arquivo(s) antigo(s) processado(s).")
@@ -2,6 +2,7 @@ import streamlit as st
 import json
 import os
 from auth import check_password
+from armazenamento import carregar_json_local, salvar_json_local
 
 # pages/1_Gerenciar_Memoria.py
 import streamlit as st
@@ -30,17 +31,12 @@ if not check_password():
 # --- Funções de Memória ---
 
 def carregar_memoria():
-    """Carrega a memória de um arquivo JSON."""
-    try:
-        with open("memoria_jarvis.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    """Carrega a memória (JSON) do armazenamento local."""
+    return carregar_json_local("memoria_jarvis.json", {})
 
 def salvar_memoria(memoria):
-    """Salva a memória em um arquivo JSON."""
-    with open("memoria_jarvis.json", "w", encoding="utf-8") as f:
-        json.dump(memoria, f, ensure_ascii=False, indent=4)
+    """Salva a memória (JSON) no armazenamento local."""
+    salvar_json_local("memoria_jarvis.json", memoria, "Atualiza memória do Jarvis")
 
 # --- Callbacks para Edição em Tempo Real ---
 
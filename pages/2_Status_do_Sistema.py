@@ -10,6 +10,8 @@ import time
 import sys
 from dotenv import load_dotenv
 from utils import carregar_chats # Mantido, e usado para carregar chats do GitHub
+from limite_github import obter_orcamento_github
+from armazenamento import carregar_json_local
 
 # Removendo importação duplicada de streamlit
 # import streamlit as st 
@@ -65,17 +67,14 @@ def get_metadados_arquivo(filename):
         return "Erro ao ler", "N/A"
 
 def contar_entradas_json(filename, tipo='dict_de_listas'):
-    """Counts entries in different types of JSON files in the project root."""
-    filepath = os.path.join(RAIZ_PROJETO, filename)
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if tipo == 'dict_de_listas':
-            return sum(len(items) for items in data.values())
-        elif tipo == 'dict':
-            return len(data)
-    except (FileNotFoundError, json.JSONDecodeError):
+    """Counts entries in different types of JSON files in the local storage (project root)."""
+    data = carregar_json_local(filename, {})
+    if not isinstance(data, dict):
         return 0
+    if tipo == 'dict_de_listas':
+        return sum(len(items) for items in data.values())
+    elif tipo == 'dict':
+        return len(data)
 
 def ler_logs(filename, num_linhas=15):
     """Reads the last N lines of a log file in the project root."""
@@ -99,6 +98,22 @@ with col1:
 
 # The Serper API status display has been removed from this section
 
+st.header("Cota da API do GitHub")
+orcamento = obter_orcamento_github().resumo()
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric(label="Requisições Restantes", value=f"{orcamento['restante']} / {orcamento['limite']}",
+              delta=f"Reserva para escritas: {orcamento['reserva_escrita']}", delta_color="off")
+with col2:
+    renovacao = (datetime.datetime.fromtimestamp(orcamento["reset_em"]).strftime("%H:%M:%S")
+                 if orcamento["reset_em"] else "N/A")
+    st.metric(label="Renovação da Cota", value=renovacao,
+              delta=f"{orcamento['requisicoes']} requisições feitas", delta_color="off")
+with col3:
+    st.metric(label="Leituras Servidas do Cache (cota baixa)", value=orcamento["leituras_recusadas"],
+              delta=f"{orcamento['novas_tentativas']} novas tentativas, {orcamento['esperas']} esperas",
+              delta_color="off")
+
 st.header("Memória e Conhecimento")
 col1, col2, col3 = st.columns(3) # Mantém as 3 colunas para o layout
 
@@ -158,7 +173,7 @@ st.divider()
 st.header("Cérebro Local (Modelo de IA)")
 col1, col2 = st.columns(2)
 with col1:
-    tamanho_vetores, data_treino = get_metadados_arquivo("vetores_perguntas_v2.npy")
+    tamanho_vetores, data_treino = get_metadados_arquivo("vetores_perguntas_v3.jvec")
     st.metric(label="Último Treinamento", value=data_treino, delta=f"Tamanho do arquivo de vetores: {tamanho_vetores}")
 
 with col2:
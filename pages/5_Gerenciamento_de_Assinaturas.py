@@ -10,7 +10,7 @@ import pandas as pd
 import bcrypt
 # Importando as funções necessárias dos locais corretos
 from auth import carregar_assinaturas, salvar_assinaturas
-from utils import excluir_arquivo_do_github
+from utils import excluir_dados_do_usuario
 
 # Carregar .env local se estiver rodando localmente
 load_dotenv()
@@ -208,18 +208,11 @@ if assinaturas:
                             salvar_assinaturas(assinaturas)
 
                             # --- EXCLUIR ARQUIVOS DE DADOS DO USUÁRIO NO GITHUB ---
-                            chat_path = f"dados/chats_historico_{user}.json"
-                            preferences_path = f"preferencias/prefs_{user}.json"
-                            emocoes_path = f"dados/emocoes_{user}.json" # Corrigido para o caminho que você usa
-                            reflexoes_path = f"reflexoes/reflexoes_{user}.json"
-                            anotacoes_path = f"anotacoes/anotacoes_{user}.json"
-
-                            excluir_arquivo_do_github(chat_path, f"Admin excluiu chat de {user}")
-                            excluir_arquivo_do_github(preferences_path, f"Admin excluiu preferencias de {user}")
-                            excluir_arquivo_do_github(emocoes_path, f"Admin excluiu emoções de {user}")
-                            excluir_arquivo_do_github(reflexoes_path, f"Admin excluiu reflexões de {user}")
-                            excluir_arquivo_do_github(anotacoes_path, f"Admin excluiu anotações de {user}")
-                            st.info(f"Todos os dados no GitHub de '{user}' foram solicitados para exclusão.")
+                            # Todos os arquivos do usuário saem em um único commit (atômico).
+                            if excluir_dados_do_usuario(user, f"Admin excluiu todos os dados de {user}"):
+                                st.info(f"Todos os dados no GitHub de '{user}' foram excluídos.")
+                            else:
+                                st.error(f"Não foi possível excluir os dados no GitHub de '{user}'.")
 
                             # --- REMOVER ARQUIVOS LOCAIS (extra segurança) ---
                             # Nota: Em um deploy na nuvem, estes arquivos podem não existir localmente.
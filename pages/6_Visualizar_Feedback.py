@@ -4,6 +4,7 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+from armazenamento import carregar_json_local, salvar_json_local
 
 # --- Configuração da Página e Proteção de Acesso ---
 st.set_page_config(page_title="Dashboard de Feedback", page_icon="📊")
@@ -27,14 +28,10 @@ with st.container():
 # --- Função para Carregar os Dados ---
 @st.cache_data(ttl=60)  # Cache para não recarregar o arquivo a cada segundo
 def carregar_feedback():
-    caminho_arquivo = "dados/feedback.json"
-    if os.path.exists(caminho_arquivo):
-        try:
-            df = pd.read_json(caminho_arquivo, encoding="utf-8")
-            return df
-        except (ValueError, FileNotFoundError):
-            return pd.DataFrame()  # Retorna um DataFrame vazio se o arquivo estiver corrompido ou vazio
-    return pd.DataFrame()
+    feedbacks = carregar_json_local("dados/feedback.json", [])
+    if not isinstance(feedbacks, list):
+        return pd.DataFrame()  # Retorna um DataFrame vazio se o arquivo estiver corrompido
+    return pd.DataFrame(feedbacks)
 
 # --- Construção do Dashboard ---
 st.title("📊 Painel de Feedback dos Usuários")
@@ -44,9 +41,8 @@ df_feedback = carregar_feedback()
 
 # Adiciona o botão de limpar feedbacks
 if st.button("Limpar Todos os Feedbacks"):
-    caminho_arquivo = "dados/feedback.json"
-    with open(caminho_arquivo, "w") as f:
-        json.dump([], f)  # Escreve uma lista vazia para remover os dados existentes
+    salvar_json_local("dados/feedback.json", [], "Limpa feedbacks")  # Lista vazia remove os dados existentes
+    carregar_feedback.clear()
     st.success("Feedbacks limpos com sucesso!")
     # Recarrega os feedbacks após a limpeza
     df_feedback = carregar_feedback()
@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
-from utils import carregar_emocoes, salvar_emocoes, carregar_reflexoes, salvar_reflexoes
+from datetime import datetime, date
+from utils import listar_meses_emocoes, obter_colunas_emocoes, excluir_emocoes
+from utils import carregar_reflexoes, salvar_reflexoes
 from auth import get_current_username
 import requests
 import os
@@ -18,67 +19,35 @@ with st.container():
         if st.button("⬅️ Voltar", use_container_width=True):
             st.switch_page("app.py")
 
+# Meses carregados ao abrir o painel; o histórico mais antigo é lido só quando o filtro de datas pede.
+MESES_PAINEL = 3
+
 username = get_current_username()
-# Carrega as emoções (pode conter formatos mistos: dicionário ou string)
-emocoes_dict_raw = carregar_emocoes(username)
+ERRO_CARREGAR_EMOCOES = "Não foi possível carregar seus dados emocionais agora. Tente novamente em instantes."
 
-if not emocoes_dict_raw:
-    st.info("Nenhum dado emocional registrado ainda. Interaja no chat para que eu detecte automaticamente 💙")
+try:
+    meses_com_emocoes = listar_meses_emocoes(username)
+except Exception as e:
+    st.error(f"{ERRO_CARREGAR_EMOCOES} ({e})")
     st.stop()
 
-# --- INÍCIO DA CORREÇÃO CIRÚRGICA: Normalização e Criação do DataFrame ---
-normalized_emocoes_list = []
-for timestamp, data in emocoes_dict_raw.items():
-    entry = {"timestamp": timestamp}
-    if isinstance(data, dict):
-        # Se for um dicionário, extrai as chaves e valores
-        entry.update(data)
-        # Garante que a chave 'emocao' exista e seja uma string, convertendo para minúsculas
-        entry['emocao'] = str(entry.get('emocao', 'desconhecida')).lower()
-        # Fallback para outras chaves de sentimento se 'emocao' não for encontrada
-        if entry['emocao'] == 'desconhecida':
-            if 'sentimento_mensagem_usuario' in entry and isinstance(entry['sentimento_mensagem_usuario'], str):
-                entry['emocao'] = entry['sentimento_mensagem_usuario'].lower()
-            elif 'sentimento' in entry and isinstance(entry['sentimento'], str):
-                entry['emocao'] = entry['sentimento'].lower()
-    elif isinstance(data, str):
-        # Se for uma string (formato antigo), cria um dicionário padrão
-        entry['emocao'] = data.lower()
-        entry['sentimento_mensagem_usuario'] = "Não disponível"
-        entry['tipo_interacao'] = "Não disponível"
-        entry['topico_interacao'] = "Não disponível"
-        entry['dia_da_semana'] = "Não disponível"
-        entry['periodo_do_dia'] = "Não disponível"
-        entry['prompt_original'] = "Não disponível"
-        
-        # Tenta inferir dia da semana e período do dia para entradas antigas
-        try:
-            ts_obj = pd.to_datetime(timestamp, errors='coerce')
-            if pd.notna(ts_obj):
-                entry["dia_da_semana"] = ts_obj.strftime('%A').lower()
-                hora = ts_obj.hour
-                if 5 <= hora < 12: entry["periodo_do_dia"] = "manhã"
-                elif 12 <= hora < 18: entry["periodo_do_dia"] = "tarde"
-                else: entry["periodo_do_dia"] = "noite"
-        except Exception as e:
-            print(f"Erro ao inferir data/hora para timestamp {timestamp}: {e}")
-
-    normalized_emocoes_list.append(entry)
-
-# Cria o DataFrame a partir da lista normalizada de dicionários
-df = pd.DataFrame(normalized_emocoes_list)
+if not meses_com_emocoes:
+    st.info("Nenhum dado emocional registrado ainda. Interaja no chat para que eu detecte automaticamente 💙")
+    st.stop()
 
-# Converte a coluna timestamp para datetime, lidando com formatos mistos
-df["timestamp"] = pd.to_datetime(df["timestamp"], format='mixed', errors='coerce')
-df = df.dropna(subset=['timestamp']) # Remove linhas com timestamps inválidos
 
-# Garante que 'emocao' seja string e ordena por timestamp
-df['emocao'] = df['emocao'].astype(str)
-df = df.sort_values("timestamp", ascending=True)
+# Emoções em colunas (analise_emocoes.py): só os meses do painel são lidos, uma vez por
+# processo, e o chat acrescenta os eventos novos sem que o DataFrame precise ser refeito do zero.
+# Um mês cuja leitura falha não fica em cache: recarregar a página tenta de novo.
+colunas_emocoes = obter_colunas_emocoes(username)
+try:
+    df = colunas_emocoes.dataframe(meses_com_emocoes[-MESES_PAINEL:])
+except Exception as e:
+    st.error(f"{ERRO_CARREGAR_EMOCOES} ({e})")
+    st.stop()
 
 # Pega a última emoção depois da normalização e ordenação
 ultima_emocao = df.iloc[-1]["emocao"] if not df.empty and "emocao" in df.columns else None
-# --- FIM DA CORREÇÃO CIRÚRGICA: Normalização e Criação do DataFrame ---
 
 # === DIAGNÓSTICO EMOCIONAL VISUAL ===
 # Garante que 'ultimos_10' seja processado a partir do df normalizado e limpo
@@ -293,7 +262,9 @@ col1, col2 = st.columns(2)
 with col1:
     st.subheader("📊 Distribuição das Suas Emoções")
     if not df.empty:
-        emocao_counts = df["emocao"].value_counts().reset_index()
+        # Somas das contagens diárias já calculadas, sem percorrer os eventos
+        emocao_counts = colunas_emocoes.contagens(df["timestamp"].min().date(), df["timestamp"].max().date())
+        emocao_counts = emocao_counts[emocao_counts > 0].reset_index()
         emocao_counts.columns = ["emocao", "contagem"]
         fig_pie = px.pie(
             emocao_counts,
@@ -322,6 +293,16 @@ with col2:
     else:
         st.info("Nenhum dado emocional para exibir ainda.")
 
+st.subheader("🗓️ Emoções por Semana")
+if not df.empty:
+    semanal = colunas_emocoes.contagens_semanais(df["timestamp"].min().date(), df["timestamp"].max().date())
+    semanal = semanal.loc[:, semanal.sum(axis=0) > 0]
+    fig_semanal = px.bar(semanal, x=semanal.index, y=list(semanal.columns), title="Contagem semanal de emoções")
+    fig_semanal.update_layout(xaxis_title="Semana", yaxis_title="Registros", legend_title="Emoção")
+    st.plotly_chart(fig_semanal, use_container_width=True)
+else:
+    st.info("Nenhum dado emocional para exibir ainda.")
+
 
 # Feedback do Usuário
 st.subheader("✨ Sua Opinião é Importante!")
@@ -393,20 +374,33 @@ with st.expander("📜 Histórico completo e exportação"):
     with col1:
         # Garante que data_inicio e data_fim tenham valores padrão razoáveis mesmo com df vazio
         min_date = df["timestamp"].min().date() if not df.empty else datetime.now().date()
-        data_inicio = st.date_input("Data inicial", value=min_date)
+        meses_datados = [m for m in meses_com_emocoes if m != "0000-00"]
+        primeira_data = date(int(meses_datados[0][:4]), int(meses_datados[0][5:]), 1) if meses_datados else min_date
+        data_inicio = st.date_input("Data inicial", value=min_date, min_value=min(primeira_data, min_date))
     with col2:
         max_date = df["timestamp"].max().date() if not df.empty else datetime.now().date()
         data_fim = st.date_input("Data final", value=max_date)
+
+    # Meses anteriores aos já carregados só são lidos se o período escolhido os incluir.
+    df_periodo = df
+    if df.empty or data_inicio < min_date:
+        meses_periodo = [m for m in meses_com_emocoes
+                         if data_inicio.strftime("%Y-%m") <= m <= data_fim.strftime("%Y-%m")]
+        try:
+            df_periodo = colunas_emocoes.dataframe(meses_periodo)
+        except Exception as e:
+            st.error(f"{ERRO_CARREGAR_EMOCOES} ({e})")
+
     with col3:
         # Garante que as opções de filtro_emocao sejam sempre strings
-        unique_emotions = df["emocao"].astype(str).unique().tolist() if "emocao" in df.columns else []
+        unique_emotions = df_periodo["emocao"].astype(str).unique().tolist() if "emocao" in df_periodo.columns else []
         filtro_emocao = st.selectbox("Filtrar por emoção", options=["Todas"] + sorted(unique_emotions))
 
     palavra_chave = st.text_input("🔍 Filtrar por palavra-chave (opcional)")
 
     # Aplicar filtros
-    df_filtrado = df.copy()
-    if not df.empty: # Aplica filtros apenas se o DataFrame não estiver vazio
+    df_filtrado = df_periodo.copy()
+    if not df_filtrado.empty: # Aplica filtros apenas se o DataFrame não estiver vazio
         df_filtrado = df_filtrado[df_filtrado["timestamp"].dt.date.between(data_inicio, data_fim)]
 
         if filtro_emocao != "Todas":
@@ -450,7 +444,7 @@ with st.expander("📜 Histórico completo e exportação"):
     # Botão para apagar tudo
     st.markdown("---")
     if st.button("🗑️ Apagar todo o histórico emocional"):
-        salvar_emocoes({}, username)
+        excluir_emocoes(username)
         st.success("Todos os dados emocionais foram apagados com carinho.")
         st.rerun()
 
@@ -1,17 +1,30 @@
-# treinar_memoria.py - VERSÃO 2.0 com Sentence Transformers
+# treinar_memoria.py - VERSÃO 2.1 com Sentence Transformers e treinamento incremental
 
+import os
 import json
+import hashlib
 import joblib
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from armazenamento_vetores import ArmazenamentoVetores
+from armazenamento import obter_armazenamento_local
+
+NOME_MODELO = 'paraphrase-multilingual-MiniLM-L12-v2'
+CAMINHO_CONHECIMENTO = 'dados_conhecimento_v2.joblib'
+CAMINHO_VETORES = 'vetores_perguntas_v3.jvec'
+CAMINHO_VETORES_LEGADO = 'vetores_perguntas_v2.npy'  # Saída float32 dos treinamentos antigos
+# Embeddings já calculados, indexados pelo hash da pergunta (reaproveitados entre treinamentos)
+CAMINHO_CACHE_EMBEDDINGS = 'cache_embeddings_treino.joblib'
+TAMANHO_LOTE = 64
 
 print(">> INICIANDO O CENTRO DE TREINAMENTO AVANÇADO DO JARVIS <<")
 
 def carregar_dados_de_treinamento():
-    """Lê o arquivo memoria_jarvis.json e extrai as perguntas e respostas."""
+    """Lê memoria_jarvis.json (do armazenamento local) e extrai as perguntas e respostas."""
     try:
-        with open("memoria_jarvis.json", "r", encoding="utf-8") as f:
-            memoria = json.load(f)
+        conteudo = obter_armazenamento_local().get("memoria_jarvis.json")
+        if conteudo is None:
+            raise FileNotFoundError("memoria_jarvis.json")
+        memoria = json.loads(conteudo)
         
         perguntas = []
         respostas = []
@@ -35,24 +48,125 @@ def carregar_dados_de_treinamento():
         print("ERRO: O arquivo 'memoria_jarvis.json' está mal formatado.")
         return None, None
 
-perguntas_treino, respostas_associadas = carregar_dados_de_treinamento()
-
-if perguntas_treino and respostas_associadas:
-    print("Carregando o modelo de embedding multilíngue (pode levar um momento e baixar dados no primeiro uso)...")
-    modelo_embedding = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    
-    print("Vectorizando as perguntas (criando 'impressões digitais' semânticas)...")
-    vetores_de_perguntas = modelo_embedding.encode(perguntas_treino, show_progress_bar=True)
-    
-    print("Salvando os artefatos do cérebro treinado...")
-    base_de_conhecimento = {
-        "perguntas": perguntas_treino,
-        "respostas": respostas_associadas
-    }
-    joblib.dump(base_de_conhecimento, 'dados_conhecimento_v2.joblib')
-    np.save('vetores_perguntas_v2.npy', vetores_de_perguntas)
-    
-    print("\n>> TREINAMENTO AVANÇADO CONCLUÍDO COM SUCESSO! <<")
-    print("O cérebro de reflexos do Jarvis foi aprimorado e salvo nos seguintes arquivos:")
-    print("- dados_conhecimento_v2.joblib")
-    print("- vetores_perguntas_v2.npy")
\ No newline at end of file
+def hash_pergunta(pergunta):
+    """Chave do cache: muda se a pergunta ou o modelo de embedding mudarem."""
+    return hashlib.sha256(f"{NOME_MODELO}\n{pergunta}".encode('utf-8')).hexdigest()
+
+
+def _vetores_float32_anteriores(quantidade):
+    """
+    Vetores float32 do último treinamento, alinhados com `quantidade` perguntas, ou None.
+    Artefatos quantizados (o .jvec float16/int8) não servem: semeados no cache, eles
+    voltariam ao próximo .jvec com o erro de arredondamento somado a cada treinamento.
+    """
+    try:
+        armazenamento = ArmazenamentoVetores(CAMINHO_VETORES)
+        if armazenamento.tipo == "float32" and len(armazenamento) == quantidade:
+            return armazenamento.vetores_float32()
+    except Exception:
+        pass
+    try:
+        vetores = np.load(CAMINHO_VETORES_LEGADO, mmap_mode="r")
+        if vetores.dtype == np.float32 and len(vetores) == quantidade:
+            return np.asarray(vetores)
+    except Exception:
+        pass
+    return None
+
+
+def carregar_cache_embeddings():
+    """
+    Carrega o cache de embeddings. Na primeira execução (sem cache), semeia-o a partir
+    dos vetores float32 do último treinamento, cujas linhas estão alinhadas com as perguntas.
+    """
+    try:
+        if os.path.exists(CAMINHO_CACHE_EMBEDDINGS):
+            return joblib.load(CAMINHO_CACHE_EMBEDDINGS)
+    except Exception as e:
+        print(f"AVISO: Cache de embeddings ilegível, ele será recriado. Erro: {e}")
+
+    try:
+        perguntas_anteriores = joblib.load(CAMINHO_CONHECIMENTO).get("perguntas", [])
+        vetores = _vetores_float32_anteriores(len(perguntas_anteriores)) if perguntas_anteriores else None
+        if vetores is not None:
+            print(f"Cache de embeddings semeado com {len(vetores)} vetores do treinamento anterior.")
+            return {hash_pergunta(p): v for p, v in zip(perguntas_anteriores, vetores)}
+    except Exception:
+        pass  # Sem artefatos anteriores utilizáveis: tudo será codificado.
+    return {}
+
+
+def dump_atomico(objeto, caminho):
+    """Grava com joblib em um arquivo temporário e troca com os.replace (nunca deixa um arquivo pela metade)."""
+    caminho_tmp = f"{caminho}.tmp"
+    joblib.dump(objeto, caminho_tmp)
+    os.replace(caminho_tmp, caminho)
+
+
+def artefatos_atualizados(perguntas, respostas):
+    """True se os artefatos em disco já correspondem exatamente a estas perguntas e respostas."""
+    try:
+        if not os.path.exists(CAMINHO_VETORES):
+            return False
+        atual = joblib.load(CAMINHO_CONHECIMENTO)
+        return atual.get("perguntas") == perguntas and atual.get("respostas") == respostas
+    except Exception:
+        return False
+
+
+def vetorizar_incremental(perguntas):
+    """
+    Retorna a matriz de embeddings das perguntas, codificando com o modelo
+    apenas as que ainda não estão no cache (novas ou editadas), em lotes.
+    O modelo só é carregado se houver algo para codificar.
+    """
+    cache = carregar_cache_embeddings()
+    hashes = [hash_pergunta(p) for p in perguntas]
+    pendentes = list(dict.fromkeys(h for h in hashes if h not in cache))
+    print(f"{len(hashes) - sum(1 for h in hashes if h not in cache)} perguntas reaproveitadas do cache, "
+          f"{len(pendentes)} para codificar.")
+
+    if pendentes:
+        from sentence_transformers import SentenceTransformer
+        print("Carregando o modelo de embedding multilíngue (pode levar um momento e baixar dados no primeiro uso)...")
+        modelo_embedding = SentenceTransformer(NOME_MODELO)
+
+        print("Vectorizando as perguntas novas/editadas (criando 'impressões digitais' semânticas)...")
+        texto_por_hash = {h: p for h, p in zip(hashes, perguntas)}
+        novos_vetores = modelo_embedding.encode(
+            [texto_por_hash[h] for h in pendentes], batch_size=TAMANHO_LOTE, show_progress_bar=True)
+        for h, vetor in zip(pendentes, novos_vetores):
+            cache[h] = np.asarray(vetor, dtype=np.float32)
+
+    # Mantém no cache apenas as perguntas que ainda existem na memória.
+    hashes_ativos = set(hashes)
+    cache = {h: v for h, v in cache.items() if h in hashes_ativos}
+    if pendentes or len(cache) != len(hashes_ativos):
+        dump_atomico(cache, CAMINHO_CACHE_EMBEDDINGS)
+
+    return np.vstack([cache[h] for h in hashes])
+
+
+if __name__ == "__main__":
+    perguntas_treino, respostas_associadas = carregar_dados_de_treinamento()
+
+    if perguntas_treino and respostas_associadas:
+        if artefatos_atualizados(perguntas_treino, respostas_associadas):
+            print("\n>> NADA A TREINAR: os artefatos já estão atualizados com a memória. <<")
+        else:
+            vetores_de_perguntas = vetorizar_incremental(perguntas_treino)
+
+            print("Salvando os artefatos do cérebro treinado...")
+            base_de_conhecimento = {
+                "perguntas": perguntas_treino,
+                "respostas": respostas_associadas
+            }
+            # Formato memmap float16 com capacidade pré-alocada (ver armazenamento_vetores.py).
+            # Os vetores vão primeiro: o .joblib é o último a ser trocado.
+            ArmazenamentoVetores.de_array(CAMINHO_VETORES, vetores_de_perguntas, tipo='float16')
+            dump_atomico(base_de_conhecimento, CAMINHO_CONHECIMENTO)
+
+            print("\n>> TREINAMENTO AVANÇADO CONCLUÍDO COM SUCESSO! <<")
+            print("O cérebro de reflexos do Jarvis foi aprimorado e salvo nos seguintes arquivos:")
+            print(f"- {CAMINHO_CONHECIMENTO}")
+            print(f"- {CAMINHO_VETORES}")
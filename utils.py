@@ -3,12 +3,28 @@
 import streamlit as st
 import os
 import json
+import copy
+import time
+import threading
 import boto3
 import re
+import base64
+import hashlib
+import hmac
+import zlib
+import requests
+from urllib.parse import quote
 from dotenv import load_dotenv
 from pathlib import Path
+from datetime import datetime
+from collections import Counter, OrderedDict, deque
 from cryptography.fernet import Fernet
-from github import Github, UnknownObjectException
+from envelope_cripto import cifrar, decifrar, eh_envelope, envelope_para_texto, envelope_de_texto, FLAG_COMPRIMIDO
+from github import Github, GithubException, InputGitTreeElement, UnknownObjectException
+from armazenamento import ArmazenamentoGitHub, ArmazenamentoComBackup, ErroArmazenamento, criar_armazenamento
+from fila_persistencia import FilaPersistencia
+from limite_github import obter_orcamento_github, OrcamentoGitHubEsgotado
+from analise_emocoes import ColunasEmocoes, normalizar_evento
 
 # Garante que as variáveis de ambiente do .env sejam carregadas
 load_dotenv()
@@ -75,6 +91,16 @@ def encrypt_string_users(text_string):
     return text_string
 
 
+def hmac_string_users(text_string):
+    """
+    HMAC-SHA256 (hex) de uma string com a chave de usuários. Ao contrário do Fernet,
+    o resultado é sempre o mesmo para a mesma string: serve para nomes de arquivo.
+    """
+    if not ENCRYPTION_KEY_USERS_STR:
+        return None
+    return hmac.new(ENCRYPTION_KEY_USERS_STR.encode(), text_string.encode(), hashlib.sha256).hexdigest()
+
+
 def decrypt_string_users(encrypted_text_string):
     """Descriptografa uma string usando a chave Fernet de usuários."""
     if fernet_users:
@@ -89,10 +115,20 @@ def decrypt_string_users(encrypted_text_string):
 
 def decrypt_file_content_general(encrypted_data_string):
     """
-    Descriptografa uma string criptografada usando a chave Fernet geral.
-    Espera uma string de texto criptografado (base64) e retorna a string decodificada.
+    Descriptografa uma string criptografada com a chave geral.
+    Aceita o envelope novo ("JENV1:...", ver envelope_cripto.py) e, para arquivos
+    antigos, o token Fernet (base64). Retorna a string decodificada ou None.
     """
     if fernet_general:
+        if eh_envelope(encrypted_data_string):
+            try:
+                dados, flags = decifrar(envelope_de_texto(encrypted_data_string), ENCRYPTION_KEY_GENERAL_STR)
+                if flags & FLAG_COMPRIMIDO:
+                    dados = zlib.decompress(dados)
+                return dados.decode('utf-8')
+            except (ValueError, zlib.error) as e:  # Inclui base64 inválido e UnicodeDecodeError
+                print(f"ERRO: Falha ao descriptografar envelope de arquivo geral: {e}")
+                return None
         try:
             # 1. Converte a string de entrada para bytes, pois Fernet.decrypt espera bytes.
             encrypted_bytes_for_fernet = encrypted_data_string.encode()
@@ -118,125 +154,690 @@ def decrypt_file_content_general(encrypted_data_string):
     return None
 
 
+# Textos menores que isso (ex.: registros do log de alterações) quase não encolhem com zlib.
+TAMANHO_MINIMO_COMPRESSAO = 512
+NIVEL_COMPRESSAO = 6
+
+
+def serializar_json(dados):
+    """JSON compacto (sem indentação nem espaços) usado em tudo que é salvo criptografado."""
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"))
+
+
 def encrypt_file_content_general(data_json_string):
-    """Criptografa uma string JSON usando a chave Fernet geral."""
+    """
+    Criptografa uma string JSON com a chave geral no envelope AES-GCM
+    (envelope_cripto.py), na forma texto que os arquivos do repositório guardam.
+    Textos maiores são comprimidos com zlib antes de cifrar (flag no cabeçalho do envelope).
+    """
     if fernet_general:
-        return fernet_general.encrypt(data_json_string.encode()).decode()
+        dados, flags = data_json_string.encode(), 0
+        if len(dados) >= TAMANHO_MINIMO_COMPRESSAO:
+            comprimido = zlib.compress(dados, NIVEL_COMPRESSAO)
+            if len(comprimido) < len(dados):
+                dados, flags = comprimido, FLAG_COMPRIMIDO
+        return envelope_para_texto(cifrar(dados, ENCRYPTION_KEY_GENERAL_STR, flags=flags))
     return data_json_string
 
 # --- FUNÇÕES AUXILIARES PARA INTERAÇÃO COM GITHUB ---
 
 
+# Prazo que uma chamada espera por orçamento da API: leituras desistem logo (e usam o
+# cache), escritas esperam mais para que um salvamento não se perca no horário de pico.
+PRAZO_ORCAMENTO_LEITURA_SEGUNDOS = 2
+PRAZO_ORCAMENTO_ESCRITA_SEGUNDOS = 30
+
+
+@st.cache_resource
+def _get_github_cliente():
+    """Cliente PyGithub único por processo. As novas tentativas ficam a cargo do OrcamentoGitHub."""
+    try:
+        return Github(st.secrets["GITHUB_TOKEN"], retry=None)
+    except Exception as e:
+        st.error(f"Erro ao conectar com GitHub: {e}")
+        return None
+
+
 @st.cache_resource
 def _get_github_repo():
     """Inicializa e retorna o objeto do repositório GitHub."""
     try:
-        github_token = st.secrets["GITHUB_TOKEN"]
+        g = _get_github_cliente()
+        if g is None:
+            return None
         repo_nome = st.secrets["GITHUB_REPO"]
-        g = Github(github_token)
-        repo = g.get_repo(repo_nome)
+        repo = _chamar_github(lambda: g.get_repo(repo_nome))
         return repo
     except Exception as e:
         st.error(f"Erro ao conectar com GitHub: {e}")
         return None
 
 
-@st.cache_data(ttl=300)  # Cache para otimizar leituras repetidas
+def _chamar_github(funcao, escrita=False):
+    """
+    Executa uma chamada à API do GitHub dentro do orçamento compartilhado (escritas
+    têm prioridade e podem usar a reserva) e atualiza o orçamento com a cota informada
+    pelo GitHub na última resposta.
+    """
+    orcamento = obter_orcamento_github()
+    prazo = PRAZO_ORCAMENTO_ESCRITA_SEGUNDOS if escrita else PRAZO_ORCAMENTO_LEITURA_SEGUNDOS
+    cota_antes = _cota_da_ultima_resposta_pygithub()
+    try:
+        return orcamento.executar(funcao, escrita=escrita, timeout=prazo)
+    finally:
+        # Só usa a cota do PyGithub se esta chamada gerou uma resposta nova dele; chamadas
+        # HTTP diretas já atualizaram o orçamento pelos cabeçalhos da própria resposta.
+        cota_depois = _cota_da_ultima_resposta_pygithub()
+        if cota_depois is not None and cota_depois != cota_antes:
+            (restante, limite), reset_em = cota_depois
+            orcamento.atualizar(limite=limite, restante=restante, reset_em=reset_em)
+
+
+def _cota_da_ultima_resposta_pygithub():
+    """
+    ((restante, limite), reset) lidos dos cabeçalhos da última resposta recebida pelo
+    PyGithub, sem requisição extra (`Github.rate_limiting` consultaria a API se ainda
+    não houvesse resposta). None se ainda não há valores.
+    """
+    g = _get_github_cliente()
+    requester = getattr(g, "_Github__requester", None)
+    cota = getattr(requester, "rate_limiting", None)
+    if not cota or cota[0] < 0:
+        return None
+    return tuple(cota), getattr(requester, "rate_limiting_resettime", None)
+
+
+# --- CACHE POR ARQUIVO DAS LEITURAS DO GITHUB ---
+# Cada caminho guarda o conteúdo, o SHA do blob e o ETag da última resposta. Dentro de
+# TTL_CACHE_GITHUB_SEGUNDOS o conteúdo é servido sem requisição; depois disso é revalidado com
+# If-None-Match (um 304 não baixa o arquivo nem gasta a cota da API). Gravar um arquivo só
+# atualiza a entrada daquele caminho (com o ETag derivado do SHA gravado, para que a
+# revalidação seguinte também seja condicional), e o SHA guardado dispensa o get_contents; excluir
+# descarta a entrada. O cache é um LRU limitado em entradas e no tamanho total dos conteúdos.
+TTL_CACHE_GITHUB_SEGUNDOS = 300
+MAX_ENTRADAS_CACHE_GITHUB = 2000
+MAX_CARACTERES_CACHE_GITHUB = 64 * 1024 * 1024
+_AUSENTE = object()  # Marca um arquivo que sabidamente não existe
+_cache_github = OrderedDict()  # caminho -> {"conteudo", "sha", "etag", "verificado_em"}, do menos ao mais recente
+_caracteres_cache_github = 0
+_lock_cache_github = threading.Lock()
+
+
+def _tamanho_no_cache(entrada):
+    return 0 if entrada is None or entrada["conteudo"] is _AUSENTE else len(entrada["conteudo"])
+
+
+def _guardar_no_cache_github(caminho_arquivo, conteudo, sha=None, etag=None):
+    global _caracteres_cache_github
+    entrada = {"conteudo": conteudo, "sha": sha, "etag": etag, "verificado_em": time.time()}
+    with _lock_cache_github:
+        _caracteres_cache_github += _tamanho_no_cache(entrada) - _tamanho_no_cache(
+            _cache_github.pop(caminho_arquivo, None))
+        _cache_github[caminho_arquivo] = entrada
+        # Descarta as entradas usadas há mais tempo (a recém-guardada fica, mesmo se for grande).
+        while len(_cache_github) > 1 and (len(_cache_github) > MAX_ENTRADAS_CACHE_GITHUB
+                                          or _caracteres_cache_github > MAX_CARACTERES_CACHE_GITHUB):
+            _, antiga = _cache_github.popitem(last=False)
+            _caracteres_cache_github -= _tamanho_no_cache(antiga)
+
+
+def _etag_do_blob(sha):
+    """
+    ETag que a API de contents dá a um arquivo cujo blob tem este SHA (W/"<sha>"), para
+    revalidar com If-None-Match o que acabamos de gravar. Se o GitHub responder com outro
+    ETag, a revalidação só vira um GET completo e o ETag verdadeiro passa a ser guardado.
+    """
+    return f'W/"{sha}"' if sha else None
+
+
+def limpar_cache_github(caminho_arquivo=None):
+    """Descarta o cache de um caminho (ou de todos, sem argumento)."""
+    global _caracteres_cache_github
+    with _lock_cache_github:
+        if caminho_arquivo is None:
+            _cache_github.clear()
+            _caracteres_cache_github = 0
+        else:
+            _caracteres_cache_github -= _tamanho_no_cache(_cache_github.pop(caminho_arquivo, None))
+
+
+def _sha_em_cache(caminho_arquivo):
+    """SHA conhecido do arquivo; _AUSENTE se ele sabidamente não existe; None se desconhecido."""
+    with _lock_cache_github:
+        entrada = _cache_github.get(caminho_arquivo)
+    if not entrada:
+        return None
+    return _AUSENTE if entrada["conteudo"] is _AUSENTE else entrada["sha"]
+
+
 def carregar_dados_do_github(caminho_arquivo):
-    """Carrega o conteúdo bruto de um arquivo do repositório do GitHub."""
+    """Carrega o conteúdo bruto de um arquivo do repositório do GitHub; None se não existir ou se a leitura falhar."""
+    try:
+        return ler_dados_do_github(caminho_arquivo)
+    except ErroArmazenamento as e:
+        st.error(str(e))
+        return None
+
+
+def ler_dados_do_github(caminho_arquivo):
+    """
+    Conteúdo bruto de um arquivo do repositório do GitHub (com cache por arquivo), ou None
+    se ele não existir (404). Qualquer falha da leitura levanta ErroArmazenamento: quem
+    grava a partir do que leu não pode confundir um erro com um arquivo vazio.
+    """
+    with _lock_cache_github:
+        entrada = dict(_cache_github.get(caminho_arquivo) or {})
+        if entrada:
+            _cache_github.move_to_end(caminho_arquivo)
+    if entrada and time.time() - entrada["verificado_em"] < TTL_CACHE_GITHUB_SEGUNDOS:
+        return None if entrada["conteudo"] is _AUSENTE else entrada["conteudo"]
+
     repo = _get_github_repo()
     if not repo:
-        return None
+        raise ErroArmazenamento(f"Sem conexão com o GitHub para ler '{caminho_arquivo}'.")
     try:
-        arquivo = repo.get_contents(caminho_arquivo)
-        conteudo_decodificado = arquivo.decoded_content.decode("utf-8")
+        headers = {"Authorization": f"Bearer {st.secrets['GITHUB_TOKEN']}",
+                   "Accept": "application/vnd.github+json"}
+        if entrada.get("etag"):
+            headers["If-None-Match"] = entrada["etag"]
+        resposta = _chamar_github(
+            lambda: _get_http_github(f"{repo.url}/contents/{quote(caminho_arquivo)}", headers))
+
+        if resposta.status_code == 304:  # Não mudou: reaproveita o conteúdo guardado
+            _guardar_no_cache_github(caminho_arquivo, entrada["conteudo"], entrada["sha"], entrada["etag"])
+            return None if entrada["conteudo"] is _AUSENTE else entrada["conteudo"]
+        if resposta.status_code == 404:
+            _guardar_no_cache_github(caminho_arquivo, _AUSENTE, etag=resposta.headers.get("ETag"))
+            return None
+        resposta.raise_for_status()
+
+        dados = resposta.json()
+        if dados.get("encoding") == "base64" and dados.get("content"):
+            conteudo_bytes = base64.b64decode(dados["content"])
+        else:
+            # Arquivos acima de 1 MB vêm sem conteúdo na API de contents: busca o blob pelo SHA.
+            conteudo_bytes = _chamar_github(lambda: repo.get_git_blob(dados["sha"])).content
+            conteudo_bytes = base64.b64decode(conteudo_bytes)
+        conteudo_decodificado = conteudo_bytes.decode("utf-8")
+        _guardar_no_cache_github(caminho_arquivo, conteudo_decodificado, dados["sha"], resposta.headers.get("ETag"))
         return conteudo_decodificado
-    except UnknownObjectException:
-        return None
+    except OrcamentoGitHubEsgotado as e:
+        # Pouca cota sobrando (reservada às escritas): serve a cópia antiga, se houver.
+        if not entrada:
+            raise ErroArmazenamento(f"{e} Sem cópia em cache de '{caminho_arquivo}'.") from e
+        print(f"AVISO: {e} Usando o cache de '{caminho_arquivo}'.")
+        return None if entrada["conteudo"] is _AUSENTE else entrada["conteudo"]
     except Exception as e:
-        st.error(f"Erro ao carregar do GitHub ({caminho_arquivo}): {e}")
-        return None
+        raise ErroArmazenamento(f"Erro ao carregar do GitHub ({caminho_arquivo}): {e}") from e
+
+
+def _get_http_github(url, headers):
+    """GET direto na API (para usar If-None-Match); erros de cota e transitórios viram exceção."""
+    resposta = requests.get(url, headers=headers, timeout=30)
+    obter_orcamento_github().atualizar_de_cabecalhos(resposta.headers)
+    if resposta.status_code in (403, 429) or resposta.status_code >= 500:
+        resposta.raise_for_status()
+    return resposta
 
 
 def salvar_dados_no_github(caminho_arquivo, conteudo, mensagem_commit):
-    """Cria ou atualiza um arquivo no repositório do GitHub."""
+    """
+    Cria ou atualiza um arquivo no repositório do GitHub. Usa o SHA do cache quando
+    existe; só consulta o GitHub se ele estiver desatualizado (conflito 409/422).
+    """
     repo = _get_github_repo()
     if not repo:
         return False
     try:
+        sha = _sha_em_cache(caminho_arquivo)
         try:
-            arquivo_existente = repo.get_contents(caminho_arquivo)
-            repo.update_file(
-                path=caminho_arquivo,
-                message=mensagem_commit,
-                content=conteudo,
-                sha=arquivo_existente.sha
-            )
-        except UnknownObjectException:
-            repo.create_file(
-                path=caminho_arquivo,
-                message=mensagem_commit,
-                content=conteudo
-            )
-        carregar_dados_do_github.clear()  # Limpa o cache para garantir leitura fresca
+            resultado = _gravar_arquivo_github(repo, caminho_arquivo, conteudo, mensagem_commit, sha)
+        except GithubException as e:
+            if e.status not in (404, 409, 422):
+                raise
+            # SHA do cache desatualizado (outro processo gravou ou excluiu o arquivo): busca o atual e tenta de novo.
+            resultado = _gravar_arquivo_github(repo, caminho_arquivo, conteudo, mensagem_commit, None)
+        sha_novo = resultado["content"].sha
+        _guardar_no_cache_github(caminho_arquivo, conteudo, sha_novo, _etag_do_blob(sha_novo))
         return True
     except Exception as e:
+        limpar_cache_github(caminho_arquivo)
         st.error(f"Erro ao salvar no GitHub: {e}")
         return False
 
 
+def _gravar_arquivo_github(repo, caminho_arquivo, conteudo, mensagem_commit, sha):
+    """update_file com o SHA dado; sem SHA conhecido, consulta o arquivo (ou o cria)."""
+    if sha is None:
+        try:
+            sha = _chamar_github(lambda: repo.get_contents(caminho_arquivo), escrita=True).sha
+        except UnknownObjectException:
+            sha = _AUSENTE
+    if sha is _AUSENTE:
+        return _chamar_github(lambda: repo.create_file(
+            path=caminho_arquivo, message=mensagem_commit, content=conteudo), escrita=True)
+    return _chamar_github(lambda: repo.update_file(
+        path=caminho_arquivo, message=mensagem_commit, content=conteudo, sha=sha), escrita=True)
+
+
 def excluir_arquivo_do_github(caminho_arquivo, mensagem_commit):
     """Exclui um arquivo do repositório do GitHub."""
     repo = _get_github_repo()
     if not repo:
         return False
     try:
-        arquivo = repo.get_contents(caminho_arquivo)
-        repo.delete_file(
-            path=arquivo.path,
-            message=mensagem_commit,
-            sha=arquivo.sha
-        )
-        carregar_dados_do_github.clear()
+        sha = _sha_em_cache(caminho_arquivo)
+        if sha is _AUSENTE:
+            return True
+        if sha is None:
+            sha = _chamar_github(lambda: repo.get_contents(caminho_arquivo), escrita=True).sha
+        try:
+            _chamar_github(lambda: repo.delete_file(
+                path=caminho_arquivo, message=mensagem_commit, sha=sha), escrita=True)
+        except GithubException as e:
+            if e.status not in (409, 422):
+                raise
+            # SHA do cache desatualizado: busca o atual e tenta de novo.
+            arquivo = _chamar_github(lambda: repo.get_contents(caminho_arquivo), escrita=True)
+            _chamar_github(lambda: repo.delete_file(
+                path=arquivo.path, message=mensagem_commit, sha=arquivo.sha), escrita=True)
+        limpar_cache_github(caminho_arquivo)
         return True
     except UnknownObjectException:
+        limpar_cache_github(caminho_arquivo)
         return True
     except Exception as e:
+        limpar_cache_github(caminho_arquivo)
         st.error(f"Erro ao excluir do GitHub: {e}")
         return False
 
-# --- FUNÇÕES GENÉRICAS PARA CARREGAR/SALVAR JSON CRIPTOGRAFADO ---
+def _sha_blob_git(conteudo):
+    """SHA que o Git dá a um blob com este conteúdo (o mesmo que o GitHub devolve)."""
+    dados = conteudo.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(dados) + dados).hexdigest()
 
 
-def _load_encrypted_json_from_github(caminho_arquivo):
-    """Carrega, descriptografa e decodifica um JSON de um arquivo GitHub."""
-    encrypted_file_content = carregar_dados_do_github(caminho_arquivo)
-    if encrypted_file_content:
+def salvar_lote_no_github(alteracoes, mensagem_commit, prefixos_exclusao=(), tentativas=3):
+    """
+    Publica várias alterações como um único commit, pela API Git Data (árvores e commits).
+    `alteracoes` mapeia caminho -> conteúdo (ou None para excluir); `prefixos_exclusao`
+    exclui todos os arquivos existentes que começam com cada prefixo (ex: uma pasta).
+    É atômico: ou todas as alterações entram no branch, ou nenhuma. Se o branch andar
+    entre a leitura e a publicação, o lote é refeito sobre o commit novo.
+    """
+    repo = _get_github_repo()
+    if not repo:
+        return False
+    for tentativa in range(tentativas):
         try:
-            decrypted_file_content = decrypt_file_content_general(
-                encrypted_file_content)
-            if decrypted_file_content is None: # Se a descriptografia falhar, retorna None
-                return None
-            return json.loads(decrypted_file_content)
-        except json.JSONDecodeError:
-            # print(f"AVISO: Conteúdo do GitHub em '{caminho_arquivo}' não é JSON válido após descriptografia.") # Debug removido
-            return None
+            ref = _chamar_github(lambda: repo.get_git_ref(f"heads/{repo.default_branch}"), escrita=True)
+            commit_base = _chamar_github(lambda: repo.get_git_commit(ref.object.sha), escrita=True)
+
+            exclusoes = {caminho for caminho, conteudo in alteracoes.items() if conteudo is None}
+            elementos = [InputGitTreeElement(caminho, "100644", "blob", content=conteudo)
+                         for caminho, conteudo in alteracoes.items() if conteudo is not None]
+            if exclusoes or prefixos_exclusao:
+                # Excluir um caminho inexistente invalida a árvore: só exclui o que existe no commit base.
+                arvore_base = _chamar_github(
+                    lambda: repo.get_git_tree(commit_base.tree.sha, recursive=True), escrita=True)
+                existentes = {item.path for item in arvore_base.tree if item.type == "blob"}
+                exclusoes = {caminho for caminho in existentes
+                             if caminho in exclusoes or any(caminho.startswith(p) for p in prefixos_exclusao)}
+                elementos += [InputGitTreeElement(caminho, "100644", "blob", sha=None) for caminho in exclusoes]
+            if not elementos:
+                return True
+
+            arvore = _chamar_github(lambda: repo.create_git_tree(elementos, base_tree=commit_base.tree),
+                                    escrita=True)
+            commit = _chamar_github(lambda: repo.create_git_commit(mensagem_commit, arvore, [commit_base]),
+                                    escrita=True)
+            _chamar_github(lambda: ref.edit(commit.sha), escrita=True)  # Só avança se for fast-forward
+        except GithubException as e:
+            if e.status == 422 and tentativa < tentativas - 1:
+                continue  # O branch mudou no meio do caminho: refaz sobre o commit mais novo
+            st.error(f"Erro ao publicar lote no GitHub: {e}")
+            return False
         except Exception as e:
-            # print(f"ERRO: Falha ao descriptografar/decodificar JSON de '{caminho_arquivo}': {e}") # Debug removido
-            return None
-    return None
+            st.error(f"Erro ao publicar lote no GitHub: {e}")
+            return False
+
+        for caminho, conteudo in alteracoes.items():
+            if conteudo is not None:
+                sha_novo = _sha_blob_git(conteudo)
+                _guardar_no_cache_github(caminho, conteudo, sha_novo, _etag_do_blob(sha_novo))
+        for caminho in exclusoes:
+            limpar_cache_github(caminho)
+        return True
+    return False
+
+
+def listar_arquivos_do_github(prefixo=""):
+    """
+    Lista (recursivamente) os caminhos de arquivos do repositório que começam com o prefixo.
+    Uma falha (inclusive falta de orçamento) levanta ErroArmazenamento em vez de devolver uma lista parcial.
+    """
+    repo = _get_github_repo()
+    if not repo:
+        raise ErroArmazenamento(f"Sem conexão com o GitHub para listar '{prefixo}'.")
+    pastas = [prefixo.rsplit("/", 1)[0] if "/" in prefixo else ""]
+    caminhos = []
+    try:
+        while pastas:
+            try:
+                pasta = pastas.pop()
+                conteudos = _chamar_github(lambda: repo.get_contents(pasta))
+            except UnknownObjectException:
+                continue
+            for item in conteudos if isinstance(conteudos, list) else [conteudos]:
+                if item.type == "dir":
+                    pastas.append(item.path)
+                elif item.path.startswith(prefixo):
+                    caminhos.append(item.path)
+    except Exception as e:
+        raise ErroArmazenamento(f"Erro ao listar arquivos do GitHub ({prefixo}): {e}") from e
+    return caminhos
+
+
+# --- ARMAZENAMENTO DOS DADOS DOS USUÁRIOS ---
+# ARMAZENAMENTO_DADOS escolhe o driver: "github" (padrão), "local" ou "sqlite".
+# Com um driver local, BACKUP_GITHUB=1 replica cada alteração no GitHub em segundo plano.
+TIPO_ARMAZENAMENTO_DADOS = os.getenv("ARMAZENAMENTO_DADOS", "github")
+BACKUP_GITHUB = os.getenv("BACKUP_GITHUB", "0") == "1"
+
+
+@st.cache_resource
+def obter_armazenamento_dados():
+    """Armazenamento (único por processo) de preferências, emoções, reflexões, anotações e chats."""
+    github = ArmazenamentoGitHub(ler_dados_do_github, salvar_dados_no_github,
+                                 excluir_arquivo_do_github, listar_arquivos_do_github,
+                                 salvar_lote_no_github)
+    if TIPO_ARMAZENAMENTO_DADOS == "github":
+        return github
+    principal = criar_armazenamento(TIPO_ARMAZENAMENTO_DADOS)
+    if BACKUP_GITHUB:
+        return ArmazenamentoComBackup(principal, FilaPersistencia(github.put, github.delete, github.aplicar_lote))
+    return principal
+
+
+# --- FUNÇÕES GENÉRICAS PARA CARREGAR/SALVAR JSON CRIPTOGRAFADO ---
+#
+# Cada documento JSON é guardado como um snapshot criptografado (`caminho`, o mesmo formato
+# de antes) mais um log de alterações (`caminho` + ".log"): uma linha por salvamento, cada
+# uma um registro criptografado separadamente com as operações sobre as chaves de topo.
+# Salvar criptografa só o registro novo; a leitura aplica o log sobre o snapshot, e uma
+# compactação em segundo plano incorpora o log ao snapshot quando ele cresce.
+# Cada registro tem um número de sequência e o snapshot guarda o último incorporado:
+# se a compactação cair entre gravar o snapshot e apagar o log, a releitura pula os
+# registros já incorporados (um "append" reaplicado duplicaria itens).
+
+SUFIXO_LOG = ".log"
+LIMITE_REGISTROS_LOG = 50  # Acima disso o log é compactado no snapshot
+LIMITE_BYTES_LOG = 256 * 1024
+FORMATO_SNAPSHOT = "snapshot-seq-1"  # Snapshots antigos são o próprio estado, sem envelope
+ESPERA_BASE_COMPACTACAO = 30.0  # segundos; dobra a cada falha seguida
+ESPERA_MAXIMA_COMPACTACAO = 30 * 60.0
+
+_documentos_conhecidos = {}  # caminho -> {"estado": objeto, "seq": int, "linhas_log": [str]}
+_locks_documentos = {}
+_lock_locks_documentos = threading.Lock()
+_compactacoes = {}  # caminho -> {"em_andamento": bool, "falhas": int, "proxima_tentativa": epoch}
+_lock_compactacoes = threading.Lock()
+
+
+def _lock_documento(caminho_arquivo):
+    with _lock_locks_documentos:
+        return _locks_documentos.setdefault(caminho_arquivo, threading.Lock())
+
+
+def _descriptografar_json(conteudo_criptografado):
+    conteudo = decrypt_file_content_general(conteudo_criptografado)
+    return json.loads(conteudo) if conteudo is not None else None
+
+
+def _aplicar_registro(estado, registro):
+    """Aplica as operações de um registro do log ao estado do documento."""
+    for op in registro.get("ops", []):
+        tipo = op.get("op")
+        if tipo == "replace":
+            estado = op["v"]
+        elif tipo == "set":
+            estado = estado if isinstance(estado, dict) else {}
+            estado[op["k"]] = op["v"]
+        elif tipo == "del" and isinstance(estado, dict):
+            estado.pop(op["k"], None)
+        elif tipo == "append":
+            estado = estado if isinstance(estado, list) else []
+            estado.extend(op["v"])
+    return estado
+
+
+def _calcular_operacoes(anterior, novo):
+    """Diferença entre duas versões do documento como operações sobre as chaves de topo."""
+    if isinstance(anterior, dict) and isinstance(novo, dict):
+        ops = [{"op": "set", "k": k, "v": v} for k, v in novo.items()
+               if k not in anterior or anterior[k] != v]
+        ops += [{"op": "del", "k": k} for k in anterior if k not in novo]
+        return ops
+    if isinstance(anterior, list) and isinstance(novo, list) and novo[:len(anterior)] == anterior:
+        return [{"op": "append", "v": novo[len(anterior):]}] if len(novo) > len(anterior) else []
+    if anterior == novo:
+        return []
+    return [{"op": "replace", "v": novo}]
+
+
+def _ler_documento(caminho_arquivo):
+    """
+    Lê snapshot + log do GitHub e guarda o resultado como estado conhecido do documento.
+    Uma leitura que falha levanta exceção e não guarda nada: gravar o log ou compactar
+    a partir de um estado vazio (seq 0) apagaria o histórico ou esconderia os registros novos.
+    """
+    armazenamento = obter_armazenamento_dados()
+    estado, seq_snapshot = None, 0
+    snapshot = armazenamento.get(caminho_arquivo)
+    if snapshot:
+        estado = _descriptografar_json(snapshot)
+        if estado is None:
+            raise ErroArmazenamento(f"Snapshot de '{caminho_arquivo}' ilegível.")
+        if isinstance(estado, dict) and estado.get("formato") == FORMATO_SNAPSHOT:
+            estado, seq_snapshot = estado.get("estado"), estado.get("seq", 0)
+
+    seq = seq_snapshot
+    linhas_log = []
+    conteudo_log = armazenamento.get(caminho_arquivo + SUFIXO_LOG)
+    if conteudo_log:
+        linhas_log = [linha for linha in conteudo_log.split("\n") if linha.strip()]
+        for linha in linhas_log:
+            try:
+                registro = _descriptografar_json(linha)
+            except json.JSONDecodeError:
+                registro = None
+            if registro is None:
+                print(f"AVISO: Registro ilegível no log de '{caminho_arquivo}'. Ignorando.")
+                continue
+            seq_registro = registro.get("seq")  # Registros anteriores à numeração não têm "seq"
+            if seq_registro is not None:
+                if seq_registro <= seq_snapshot:
+                    continue  # Já incorporado ao snapshot por uma compactação interrompida
+                seq = max(seq, seq_registro)
+            estado = _aplicar_registro(estado, registro)
+
+    _documentos_conhecidos[caminho_arquivo] = {
+        "estado": copy.deepcopy(estado), "seq": seq, "linhas_log": linhas_log}
+    return estado
+
+
+def _carregar_documento(caminho_arquivo):
+    """Como `_load_encrypted_json_from_github`, mas uma falha de leitura levanta exceção em vez de virar None."""
+    with _lock_documento(caminho_arquivo):
+        return _ler_documento(caminho_arquivo)
+
+
+def _load_encrypted_json_from_github(caminho_arquivo):
+    """Carrega, descriptografa e decodifica um JSON do GitHub (snapshot + log de alterações)."""
+    try:
+        return _carregar_documento(caminho_arquivo)
+    except Exception as e:
+        # print(f"ERRO: Falha ao descriptografar/decodificar JSON de '{caminho_arquivo}': {e}") # Debug removido
+        return None
 
 
 def _save_json_to_github(caminho_arquivo, data, mensagem_commit):
-    """Codifica, criptografa e salva um JSON em um arquivo GitHub."""
+    """
+    Salva um JSON no GitHub acrescentando ao log um registro criptografado só com o
+    que mudou desde a versão conhecida. Retorna True também se não havia nada a salvar.
+    """
     try:
-        conteudo_json = json.dumps(data, ensure_ascii=False)
-        conteudo_criptografado = encrypt_file_content_general(conteudo_json)
-        return salvar_dados_no_github(caminho_arquivo, conteudo_criptografado, mensagem_commit)
+        novo_estado = json.loads(json.dumps(data, ensure_ascii=False))  # Cópia já normalizada para JSON
+        with _lock_documento(caminho_arquivo):
+            if caminho_arquivo not in _documentos_conhecidos:
+                _ler_documento(caminho_arquivo)
+            documento = _documentos_conhecidos[caminho_arquivo]
+
+            ops = _calcular_operacoes(documento["estado"], novo_estado)
+            if not ops:
+                return True
+            if not _gravar_registro(caminho_arquivo, documento, ops, mensagem_commit):
+                return False
+            documento["estado"] = novo_estado
+        _agendar_compactacao_se_preciso(caminho_arquivo, documento)
+        return True
     except Exception as e:
         print(f"ERRO: Falha ao salvar JSON em '{caminho_arquivo}': {e}")
         return False
 
+
+def _acrescentar_json_no_github(caminho_arquivo, chave, valor, mensagem_commit):
+    """
+    Define `chave` = `valor` num documento-dicionário, gravando só esse registro no log,
+    sem comparar com o documento inteiro: o custo não cresce com o tamanho do documento.
+    """
+    try:
+        valor = json.loads(serializar_json(valor))  # Cópia já normalizada para JSON
+        with _lock_documento(caminho_arquivo):
+            if caminho_arquivo not in _documentos_conhecidos:
+                _ler_documento(caminho_arquivo)
+            documento = _documentos_conhecidos[caminho_arquivo]
+            if not _gravar_registro(caminho_arquivo, documento, [{"op": "set", "k": chave, "v": valor}],
+                                    mensagem_commit):
+                return False
+            if not isinstance(documento["estado"], dict):
+                documento["estado"] = {}
+            documento["estado"][chave] = valor
+        _agendar_compactacao_se_preciso(caminho_arquivo, documento)
+        return True
+    except Exception as e:
+        print(f"ERRO: Falha ao acrescentar a '{caminho_arquivo}': {e}")
+        return False
+
+
+def _gravar_registro(caminho_arquivo, documento, ops, mensagem_commit):
+    """
+    Acrescenta ao log um registro criptografado com `ops`. Chamar com o lock do documento.
+    Nos drivers locais só a linha nova é escrita; o GitHub regrava o arquivo do log.
+    """
+    seq = documento["seq"] + 1
+    linha = encrypt_file_content_general(serializar_json({"seq": seq, "ts": time.time(), "ops": ops}))
+    conteudo_anterior = "".join(l + "\n" for l in documento["linhas_log"])
+    if not obter_armazenamento_dados().acrescentar(caminho_arquivo + SUFIXO_LOG, linha + "\n",
+                                                   mensagem_commit, conteudo_anterior):
+        return False
+    documento["linhas_log"].append(linha)
+    documento["seq"] = seq
+    return True
+
+
+def _agendar_compactacao_se_preciso(caminho_arquivo, documento):
+    """
+    Compacta em segundo plano quando o log passa dos limites. Uma compactação por
+    documento de cada vez e, depois de falhas, espera crescente antes de tentar de novo.
+    """
+    linhas_log = documento["linhas_log"]
+    if len(linhas_log) < LIMITE_REGISTROS_LOG and sum(len(l) for l in linhas_log) < LIMITE_BYTES_LOG:
+        return
+    with _lock_compactacoes:
+        situacao = _compactacoes.setdefault(
+            caminho_arquivo, {"em_andamento": False, "falhas": 0, "proxima_tentativa": 0.0})
+        if situacao["em_andamento"] or time.time() < situacao["proxima_tentativa"]:
+            return
+        situacao["em_andamento"] = True
+    threading.Thread(target=_compactar_em_segundo_plano, args=(caminho_arquivo,), daemon=True).start()
+
+
+def _compactar_em_segundo_plano(caminho_arquivo):
+    sucesso = False
+    try:
+        sucesso = compactar_documento(caminho_arquivo)
+    finally:
+        with _lock_compactacoes:
+            if sucesso:
+                _compactacoes.pop(caminho_arquivo, None)
+            else:
+                situacao = _compactacoes[caminho_arquivo]
+                situacao["falhas"] += 1
+                situacao["proxima_tentativa"] = time.time() + min(
+                    ESPERA_MAXIMA_COMPACTACAO, ESPERA_BASE_COMPACTACAO * 2 ** (situacao["falhas"] - 1))
+                situacao["em_andamento"] = False
+
+
+def compactar_documento(caminho_arquivo):
+    """
+    Incorpora o log de alterações ao snapshot e apaga o log. O snapshot leva o número
+    do último registro incorporado: se o processo cair antes de apagar o log, a
+    releitura pula esses registros. Retorna True também se não havia log.
+    """
+    with _lock_documento(caminho_arquivo):
+        documento = _documentos_conhecidos.get(caminho_arquivo)
+        if not documento or not documento["linhas_log"]:
+            return True
+        try:
+            snapshot = {"formato": FORMATO_SNAPSHOT, "seq": documento["seq"], "estado": documento["estado"]}
+            conteudo = encrypt_file_content_general(serializar_json(snapshot))
+            armazenamento = obter_armazenamento_dados()
+            if not armazenamento.put(caminho_arquivo, conteudo, f"Compacta {caminho_arquivo}"):
+                return False
+            if not armazenamento.delete(caminho_arquivo + SUFIXO_LOG, f"Compacta {caminho_arquivo}"):
+                return False
+            documento["linhas_log"] = []
+            return True
+        except Exception as e:
+            print(f"ERRO: Falha ao compactar '{caminho_arquivo}': {e}")
+            return False
+
+
+def excluir_json_do_github(caminho_arquivo, mensagem_commit):
+    """Exclui um JSON salvo por `_save_json_to_github` (snapshot e log)."""
+    with _lock_documento(caminho_arquivo):
+        _documentos_conhecidos.pop(caminho_arquivo, None)
+        armazenamento = obter_armazenamento_dados()
+        sucesso_log = armazenamento.delete(caminho_arquivo + SUFIXO_LOG, mensagem_commit)
+        return armazenamento.delete(caminho_arquivo, mensagem_commit) and sucesso_log
+
+def excluir_dados_do_usuario(username, mensagem_commit):
+    """
+    Exclui todos os dados de um usuário (chats, preferências, emoções, reflexões e
+    anotações, com seus logs de alterações) em uma única operação em lote
+    (um só commit no GitHub).
+    """
+    prefixos = [
+        f"dados/chats_{username}/",  # Chats (um arquivo por chat + índice)
+        f"dados/chats_historico_{username}.json",  # Arquivo único antigo de chats
+        f"preferencias/prefs_{username}.json",
+        f"emocoes/{username}/",  # Partições mensais de emoções
+        f"emocoes/emocoes_{username}.json",  # Arquivo único antigo de emoções
+        f"dados/emocoes_{username}.json",  # Caminho antigo de emoções
+        f"reflexoes/reflexoes_{username}.json",
+        f"anotacoes/anotacoes_{username}.json",
+    ]
+    # Os prefixos de arquivo também pegam o log de alterações (".json.log").
+    for caminho in list(_documentos_conhecidos):
+        if any(caminho.startswith(p) for p in prefixos):
+            _documentos_conhecidos.pop(caminho, None)
+    with _lock_meses_emocoes:
+        _meses_emocoes.pop(username, None)
+        _colunas_emocoes.pop(username, None)
+        _estados_emocionais.pop(username, None)
+    return obter_armazenamento_dados().aplicar_lote({}, mensagem_commit, prefixos_exclusao=prefixos)
+
 # --- FUNÇÕES DE PREFERÊNCIAS ---
 
 # A função normalize_preference_key está definida aqui para garantir que esteja acessível
@@ -291,32 +892,238 @@ def salvar_preferencias(data, username):
 
 
 # --- FUNÇÕES DE EMOÇÕES ---
-def carregar_emocoes(username):
+#
+# Cada emoção detectada é um evento (timestamp ISO -> registro) guardado numa partição
+# mensal, `emocoes/<usuario>/<AAAA-MM>.json` (snapshot + log, como os demais documentos).
+# Registrar uma emoção acrescenta um só registro ao log do mês corrente; a leitura pode
+# se limitar aos meses de um intervalo. O arquivo único antigo (emocoes/emocoes_<usuario>.json)
+# é dividido em partições no primeiro acesso.
+
+MESES_EMOCOES_RECENTES = 2  # Mês corrente e o anterior, carregados no início da sessão
+PARTICAO_SEM_DATA = "0000-00"  # Registros antigos com timestamp fora do formato ISO
+
+_meses_emocoes = {}  # username -> set de "AAAA-MM" com partição gravada
+_lock_meses_emocoes = threading.Lock()  # Protege só os dicionários; nunca fica preso durante I/O
+_locks_emocoes_usuarios = {}  # username -> lock da listagem/migração das partições desse usuário
+_colunas_emocoes = {}  # username -> ColunasEmocoes (cache colunar do painel, ver analise_emocoes.py)
+JANELA_ESTADO_EMOCIONAL = 20  # Eventos considerados nas contagens do estado emocional
+_estados_emocionais = {}  # username -> {"ultima_emocao", "timestamp", "recentes": deque de emoções}
+
+
+def _pasta_emocoes(username):
+    return f"emocoes/{username}/"
+
+
+def _caminho_particao_emocoes(username, mes):
+    return f"{_pasta_emocoes(username)}{mes}.json"
+
+
+def _caminho_emocoes_legado(username):
+    return f"emocoes/emocoes_{username}.json"
+
+
+def _mes_do_timestamp(timestamp):
+    return timestamp[:7] if re.match(r"\d{4}-\d{2}", str(timestamp)) else PARTICAO_SEM_DATA
+
+
+def _particionar_emocoes(emocoes):
+    particoes = {}
+    for timestamp, registro in (emocoes or {}).items():
+        particoes.setdefault(_mes_do_timestamp(timestamp), {})[timestamp] = registro
+    return particoes
+
+
+def _lock_emocoes_usuario(username):
+    with _lock_meses_emocoes:
+        return _locks_emocoes_usuarios.setdefault(username, threading.Lock())
+
+
+def listar_meses_emocoes(username):
+    """
+    Meses ("AAAA-MM", em ordem) com emoções registradas. Migra o arquivo antigo se existir.
+    Uma falha da listagem ou das leituras levanta exceção: a lista só é guardada quando completa.
     """
-    Carrega emoções do usuário do GitHub (criptografadas).
-    Retorna um dicionário ou lista de emoções.
+    with _lock_meses_emocoes:
+        if username in _meses_emocoes:
+            return sorted(_meses_emocoes[username])
+    # A listagem e a migração fazem I/O: só o lock deste usuário fica preso enquanto isso.
+    with _lock_emocoes_usuario(username):
+        with _lock_meses_emocoes:
+            if username in _meses_emocoes:
+                return sorted(_meses_emocoes[username])
+        armazenamento = obter_armazenamento_dados()
+        meses = set()
+        for chave in armazenamento.list(_pasta_emocoes(username)):
+            nome = chave.rsplit("/", 1)[-1]
+            nome = nome[:-len(SUFIXO_LOG)] if nome.endswith(SUFIXO_LOG) else nome
+            if re.fullmatch(r"\d{4}-\d{2}\.json", nome):
+                meses.add(nome[:-len(".json")])
+        legado = _carregar_documento(_caminho_emocoes_legado(username))
+        if isinstance(legado, dict) and legado:
+            for mes, registros in _particionar_emocoes(legado).items():
+                atuais = _carregar_documento(_caminho_particao_emocoes(username, mes)) or {}
+                if not _save_json_to_github(_caminho_particao_emocoes(username, mes), {**registros, **atuais},
+                                            f"Migra emoções do usuário {username} ({mes})"):
+                    return sorted(meses | set(_particionar_emocoes(legado)))  # Tenta de novo depois
+                meses.add(mes)
+            excluir_json_do_github(_caminho_emocoes_legado(username),
+                                   f"Remove arquivo único de emoções do usuário {username}")
+        with _lock_meses_emocoes:
+            publicados = _meses_emocoes.setdefault(username, set())
+            publicados.update(meses)
+            return sorted(publicados)
+
+
+def carregar_emocoes(username, inicio=None, fim=None):
     """
-    caminho = f"emocoes/emocoes_{username}.json"
-    emocoes_carregadas = _load_encrypted_json_from_github(caminho)
-    return emocoes_carregadas if emocoes_carregadas is not None else []
+    Carrega as emoções do usuário (timestamp -> registro) das partições mensais.
+    `inicio` e `fim` (date/datetime, opcionais) limitam os meses lidos; os registros
+    das pontas do intervalo não são filtrados por dia.
+    """
+    mes_inicio = inicio.strftime("%Y-%m") if inicio else None
+    mes_fim = fim.strftime("%Y-%m") if fim else None
+    emocoes = {}
+    for mes in listar_meses_emocoes(username):
+        if (mes_inicio and mes < mes_inicio) or (mes_fim and mes > mes_fim):
+            continue
+        particao = _load_encrypted_json_from_github(_caminho_particao_emocoes(username, mes))
+        if isinstance(particao, dict):
+            emocoes.update(particao)
+    return emocoes
+
+
+def obter_colunas_emocoes(username):
+    """
+    Emoções do usuário em formato colunar, com contagens diárias e semanais já calculadas.
+    Uma instância por usuário e processo, atualizada por `registrar_emocao`.
+    """
+    with _lock_meses_emocoes:
+        if username not in _colunas_emocoes:
+            _colunas_emocoes[username] = ColunasEmocoes(
+                lambda mes: _carregar_documento(_caminho_particao_emocoes(username, mes)),
+                lambda: listar_meses_emocoes(username))
+        return _colunas_emocoes[username]
+
+
+def _resumir_estado(estado):
+    return {"ultima_emocao": estado["ultima_emocao"], "timestamp": estado["timestamp"],
+            "contagens": dict(Counter(estado["recentes"]))}
+
+
+def obter_estado_emocional(username):
+    """
+    Resumo do estado emocional do usuário: última emoção, quando foi registrada e as
+    contagens das últimas JANELA_ESTADO_EMOCIONAL emoções. None se não houver emoções
+    (ou se a leitura falhar; nesse caso nada fica guardado e a próxima chamada tenta de novo).
+    Calculado uma vez por processo a partir das partições mais recentes e mantido
+    por `registrar_emocao`, sem descriptografar o histórico a cada turno.
+    """
+    with _lock_meses_emocoes:
+        estado = _estados_emocionais.get(username)
+        if estado is not None:
+            return _resumir_estado(estado) if estado["recentes"] else None
+
+    eventos = []  # (timestamp, emoção), do mais novo para o mais antigo
+    try:
+        for mes in reversed(listar_meses_emocoes(username)):
+            particao = _carregar_documento(_caminho_particao_emocoes(username, mes)) or {}
+            normalizados = [(evento[0], evento[1]) for evento in
+                            (normalizar_evento(ts, dados) for ts, dados in particao.items()) if evento]
+            eventos.extend(sorted(normalizados, reverse=True))
+            if len(eventos) >= JANELA_ESTADO_EMOCIONAL:
+                break
+    except Exception as e:
+        # Nada é guardado: a próxima chamada tenta de novo em vez de fixar um estado vazio.
+        print(f"AVISO: Não foi possível ler as emoções de '{username}': {e}")
+        return None
+    eventos = eventos[:JANELA_ESTADO_EMOCIONAL]
+
+    estado = {"ultima_emocao": eventos[0][1] if eventos else None,
+              "timestamp": eventos[0][0].isoformat() if eventos else None,
+              "recentes": deque((emocao for _, emocao in reversed(eventos)), maxlen=JANELA_ESTADO_EMOCIONAL)}
+    with _lock_meses_emocoes:
+        estado = _estados_emocionais.setdefault(username, estado)
+        return _resumir_estado(estado) if estado["recentes"] else None
+
+
+def _atualizar_estado_emocional(username, timestamp, registro):
+    evento = normalizar_evento(timestamp, registro)
+    if evento is None:
+        return
+    with _lock_meses_emocoes:
+        estado = _estados_emocionais.get(username)
+        if estado is None:
+            return  # Calculado das partições (que já têm este evento) na próxima leitura
+        if estado["timestamp"] is None or evento[0].isoformat() >= estado["timestamp"]:
+            estado["ultima_emocao"], estado["timestamp"] = evento[1], evento[0].isoformat()
+        estado["recentes"].append(evento[1])
+
+
+def carregar_emocoes_recentes(username, meses=MESES_EMOCOES_RECENTES):
+    """Emoções só dos últimos `meses` meses (inclui o corrente)."""
+    hoje = datetime.now()
+    ano, mes = divmod(hoje.year * 12 + hoje.month - 1 - (meses - 1), 12)
+    return carregar_emocoes(username, inicio=datetime(ano, mes + 1, 1))
+
+
+def registrar_emocao(username, registro, timestamp=None):
+    """
+    Acrescenta um evento de emoção à partição do mês. Só o registro novo é
+    criptografado e enviado, qualquer que seja o tamanho do histórico.
+    """
+    timestamp = timestamp or datetime.now().isoformat()
+    mes = _mes_do_timestamp(timestamp)
+    try:
+        listar_meses_emocoes(username)  # Garante a migração do arquivo antigo antes de gravar
+    except Exception as e:
+        print(f"ERRO: Falha ao listar as emoções de '{username}'; a emoção não foi registrada: {e}")
+        return False
+    if not _acrescentar_json_no_github(_caminho_particao_emocoes(username, mes), timestamp, registro,
+                                       f"Registra emoção do usuário {username}"):
+        return False
+    with _lock_meses_emocoes:
+        _meses_emocoes.setdefault(username, set()).add(mes)
+        colunas = _colunas_emocoes.get(username)
+    if colunas:
+        colunas.adicionar(timestamp, registro)
+    _atualizar_estado_emocional(username, timestamp, registro)
+    return True
 
 
 def salvar_emocoes(emocoes, username):
     """
-    Salva emoções no GitHub (criptografado), uma lista ou dicionário.
+    Regrava todas as emoções do usuário (timestamp -> registro), redistribuídas
+    nas partições mensais. Para uma emoção nova, use `registrar_emocao`.
     """
-    caminho = f"emocoes/emocoes_{username}.json"
-    mensagem_commit = f"Atualiza emoções do usuário {username}"
-    return _save_json_to_github(caminho, emocoes, mensagem_commit)
+    particoes = _particionar_emocoes(emocoes)
+    sucesso = True
+    for mes in set(listar_meses_emocoes(username)) - set(particoes):
+        sucesso = excluir_json_do_github(_caminho_particao_emocoes(username, mes),
+                                         f"Atualiza emoções do usuário {username}") and sucesso
+    for mes, registros in particoes.items():
+        sucesso = _save_json_to_github(_caminho_particao_emocoes(username, mes), registros,
+                                       f"Atualiza emoções do usuário {username}") and sucesso
+    with _lock_meses_emocoes:
+        _meses_emocoes[username] = set(particoes)
+        _colunas_emocoes.pop(username, None)
+        _estados_emocionais.pop(username, None)
+    return sucesso
 
 
 def excluir_emocoes(username):
     """
-    Exclui o arquivo de emoções de um usuário do GitHub.
+    Exclui todas as partições de emoções de um usuário (e o arquivo antigo) do GitHub.
     """
-    caminho = f"emocoes/emocoes_{username}.json"
     mensagem_commit = f"Exclui todas as emoções do usuário {username}"
-    return excluir_arquivo_do_github(caminho, mensagem_commit)
+    prefixos = [_pasta_emocoes(username), _caminho_emocoes_legado(username)]
+    with _lock_meses_emocoes:
+        _meses_emocoes.pop(username, None)
+        _colunas_emocoes.pop(username, None)
+        _estados_emocionais.pop(username, None)
+    for caminho in list(_documentos_conhecidos):
+        if any(caminho.startswith(p) for p in prefixos):
+            _documentos_conhecidos.pop(caminho, None)
+    return obter_armazenamento_dados().aplicar_lote({}, mensagem_commit, prefixos_exclusao=prefixos)
 
 # --- FUNÇÕES DE REFLEXÕES ---
 
@@ -1,32 +1,27 @@
-import json
 import os
 import smtplib
 from datetime import datetime, timedelta
 from email.message import EmailMessage
-from pathlib import Path
 
 from dotenv import load_dotenv
 
+from armazenamento import carregar_json_local, salvar_json_local
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
 # --- Configurações e Funções Auxiliares ---
 
-CAMINHO_ARQUIVO = Path("dados/assinaturas.json")
+CAMINHO_ARQUIVO = "dados/assinaturas.json"
 EMAIL_REMETENTE = os.getenv("GMAIL_USER")
 SENHA_APP = os.getenv("GMAIL_APP_PASSWORD")
 EMAIL_ADMIN = os.getenv("EMAIL_ADMIN")  # Seu e-mail para receber o resumo
 
 def carregar_assinaturas():
-    if CAMINHO_ARQUIVO.exists():
-        with open(CAMINHO_ARQUIVO, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    return carregar_json_local(CAMINHO_ARQUIVO, {})
 
 def salvar_assinaturas(data):
-    CAMINHO_ARQUIVO.parent.mkdir(parents=True, exist_ok=True)
-    with open(CAMINHO_ARQUIVO, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    salvar_json_local(CAMINHO_ARQUIVO, data, "Atualiza assinaturas")
 
 def enviar_email(destinatario, assunto, mensagem):
     if not EMAIL_REMETENTE or not SENHA_APP: